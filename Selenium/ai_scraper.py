@@ -1,264 +1,792 @@
 import json
 import time
 import os
+import shutil
+import shlex
 import asyncio
 import uvicorn
 import uuid
-from typing import List, Optional
+import unicodedata
+import re
+import contextvars
+import hashlib
+from urllib.parse import urljoin
+from typing import Callable, List, Optional, Tuple
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import InvalidSessionIdException, NoSuchWindowException, WebDriverException
+from urllib3.exceptions import MaxRetryError
 from datetime import datetime
+import scraper_js
+from scraper_queue import PRIORITIES, DeadlineExceeded, Job, JobQueue
+from scraper_cache import ResponseCache, file_fingerprint
+import scraper_metrics
+from scraper_metrics import RequestTimer, phase
+from scraper_wait import AdaptiveWait, WaitTimeout
 
 # Core Paths
 NOTES_DIR = "/home/mohit/Projects/notes"
-
-# Global variables
-driver = None
-driver_lock = asyncio.Lock()
-chatgpt_window = None
-deepseek_window = None
-perplexity_window = None
-
-def init_driver():
-    global driver, chatgpt_window, deepseek_window, perplexity_window
-    if driver is None:
-        print("🚀 Starting undetected chromedriver for ChatGPT, DeepSeek & Perplexity...")
+PROFILE_DIR = os.environ.get("SCRAPER_PROFILE_DIR", "/home/mohit/chrome-profile-ucc")
+HEADLESS = os.environ.get("SCRAPER_HEADLESS") == "1"
+# Local binaries: with SCRAPER_CHROMEDRIVER set, undetected_chromedriver patches that
+# file instead of downloading a driver (so the scraper and its benches run offline)
+CHROMEDRIVER_PATH = os.environ.get("SCRAPER_CHROMEDRIVER") or None
+CHROME_PATH = os.environ.get("SCRAPER_CHROME") or None
+# Extra browser flags, e.g. "--no-sandbox about:blank" for chrome-headless-shell as root
+# (the shell opens no page on its own, and chromedriver waits for one)
+CHROME_ARGS = shlex.split(os.environ.get("SCRAPER_CHROME_ARGS", ""))
+
+# Provider tabs (override the URLs to point the scraper at the fake pages in bench/)
+PROVIDER_URLS = {
+    "chatgpt": os.environ.get("SCRAPER_CHATGPT_URL", "https://chatgpt.com/"),
+    "deepseek": os.environ.get("SCRAPER_DEEPSEEK_URL", "https://chat.deepseek.com/"),
+    "perplexity": os.environ.get("SCRAPER_PERPLEXITY_URL", "https://www.perplexity.ai/"),
+}
+PROVIDER_NAMES = {"chatgpt": "ChatGPT", "deepseek": "DeepSeek", "perplexity": "Perplexity"}
+
+# Browser pool: one Chrome per comma separated entry, '+' separated providers per Chrome.
+# e.g. SCRAPER_WORKERS="chatgpt+deepseek+perplexity,chatgpt,chatgpt" -> 3 ChatGPT tabs, 1 of the rest
+WORKER_SPECS = [
+    [p for p in spec.split("+") if p in PROVIDER_URLS]
+    for spec in os.environ.get("SCRAPER_WORKERS", "chatgpt+deepseek+perplexity").split(",")
+]
+HEALTH_CHECK_INTERVAL = int(os.environ.get("SCRAPER_HEALTH_INTERVAL", "30"))
+# How long a tab may take to load at startup before it's used anyway
+STARTUP_TIMEOUT = int(os.environ.get("SCRAPER_STARTUP_TIMEOUT", "120"))
+
+# Response cache (SCRAPER_CACHE_TTL=0 turns it off)
+CACHE_PATH = os.environ.get("SCRAPER_CACHE_PATH", os.path.expanduser("~/.cache/ai_scraper/responses.sqlite3"))
+CACHE_TTL = float(os.environ.get("SCRAPER_CACHE_TTL", "86400"))
+CACHE_MAX_ENTRIES = int(os.environ.get("SCRAPER_CACHE_MAX_ENTRIES", "1000"))
+
+# Thread rotation: a tab starts a fresh conversation once the open one has this many
+# answers or DOM elements (0 = no limit), so lookups and page memory don't keep growing
+THREAD_MAX_ANSWERS = int(os.environ.get("SCRAPER_THREAD_MAX_ANSWERS", "25"))
+THREAD_MAX_NODES = int(os.environ.get("SCRAPER_THREAD_MAX_NODES", "40000"))
+
+# Chrome refuses to open a profile another instance holds, these files must not be copied
+PROFILE_LOCK_FILES = ("SingletonLock", "SingletonCookie", "SingletonSocket", "lockfile")
+
+def count_webdriver_calls(driver):
+    """Every WebDriver command (driver and element methods) goes through driver.execute."""
+    execute = driver.execute
+
+    def counted_execute(driver_command, params=None):
+        scraper_metrics.count_webdriver_call()
+        return execute(driver_command, params)
+
+    driver.execute = counted_execute
+
+class BrowserWorker:
+    """One Chrome instance with its own profile copy and one tab per provider it serves."""
+
+    def __init__(self, worker_id: int, providers: List[str]):
+        self.worker_id = worker_id
+        self.providers = providers
+        # Worker 0 uses the real (logged-in) profile, the others get a copy of it
+        self.profile_dir = PROFILE_DIR if worker_id == 0 else f"{PROFILE_DIR}-worker{worker_id}"
+        self.driver = None
+        self.tab_windows = {}
+        self.active_window = None
+        self.healthy = False
+        self.restarting = False
+        # driver_lock only guards short bursts of WebDriver commands (switch tab + a few calls).
+        # All the waiting happens outside of it, so other tabs get driven while one is generating.
+        self.driver_lock = asyncio.Lock()
+        # The bursts themselves run on this thread, never on the event loop: a WebDriver call
+        # blocks for a whole HTTP round trip to chromedriver (a long-poll for up to a second),
+        # and the other workers, the API and the SSE streams have to keep going meanwhile.
+        # One thread, so bursts still run one at a time and in order per browser.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"driver-{worker_id}")
+        # Job running on each provider tab (None = free), handed out by job_queue
+        self.busy = {provider: None for provider in providers}
+        # Set by the readiness probe once the tab's editor is there, jobs only go to ready tabs
+        self.ready = {provider: False for provider in providers}
+        self.logged_in = {provider: None for provider in providers}
+        self.started_at = None
+        # Tabs being rebuilt after a crash
+        self.recovering = set()
+        # Content hashes of the files already attached in each tab's current thread
+        # (thread id, or None until the first answer gives the new chat an id)
+        self.uploads = {provider: (None, set()) for provider in providers}
+
+    def __repr__(self):
+        return f"<worker {self.worker_id} {'+'.join(self.providers)}>"
+
+    def prepare_profile(self):
+        if self.profile_dir == PROFILE_DIR or os.path.exists(self.profile_dir):
+            return
+        if os.path.isdir(PROFILE_DIR):
+            print(f"📂 Copying profile for worker {self.worker_id}...")
+            # Chrome may be using the source profile, so the copy can fail halfway. Copy next to
+            # the target and move it into place only when it's complete; a half copy left at
+            # profile_dir would be reused by every later start.
+            partial = f"{self.profile_dir}.partial"
+            shutil.rmtree(partial, ignore_errors=True)
+            try:
+                shutil.copytree(PROFILE_DIR, partial, ignore=shutil.ignore_patterns(*PROFILE_LOCK_FILES))
+                os.replace(partial, self.profile_dir)
+            except BaseException:
+                shutil.rmtree(partial, ignore_errors=True)
+                raise
+
+    def start(self):
+        """Blocking: launch Chrome and start loading every provider tab.
+        Returns without waiting for the pages, WorkerPool.probe() tells when each tab is ready."""
+        print(f"🚀 Starting undetected chromedriver for worker {self.worker_id} ({', '.join(PROVIDER_NAMES[p] for p in self.providers)})...")
+        self.prepare_profile()
         options = uc.ChromeOptions()
-        options.add_argument("--user-data-dir=/home/mohit/chrome-profile-ucc")
-
-        driver = uc.Chrome(options=options)
-        
-        # 1. Open ChatGPT
-        driver.get("https://chatgpt.com/")
-        chatgpt_window = driver.current_window_handle
-        print("✅ ChatGPT Profile loaded!")
-        
-        # Wait 10 seconds before opening the next tab as requested
-        time.sleep(10)
-        
-        # 2. Open DeepSeek
-        driver.switch_to.new_window('tab')
-        deepseek_window = driver.current_window_handle
-        driver.get("https://chat.deepseek.com/")
-        print("✅ DeepSeek Profile loaded!")
-        
-        # Wait 10 seconds before opening the next tab as requested
-        time.sleep(10)
-        
-        # 3. Open Perplexity
-        driver.switch_to.new_window('tab')
-        perplexity_window = driver.current_window_handle
-        driver.get("https://www.perplexity.ai/")
-        print("✅ Perplexity Profile loaded! Server is ready.")
-        
-        # Switch back to ChatGPT just as a default
-        driver.switch_to.window(chatgpt_window)
-        time.sleep(3)
-
-# ----------------- CHATGPT LOGIC -----------------
-async def wait_for_chatgpt_response_to_complete():
-    await asyncio.sleep(3)
-    max_wait = 180 # Increased max wait
-    start_time = time.time()
-
-    while time.time() - start_time < max_wait:
+        options.add_argument(f"--user-data-dir={self.profile_dir}")
+        # Background tabs keep generating while we work on another one
+        options.add_argument("--disable-background-timer-throttling")
+        options.add_argument("--disable-backgrounding-occluded-windows")
+        options.add_argument("--disable-renderer-backgrounding")
+        if HEADLESS:
+            options.add_argument("--headless=new")
+        for arg in CHROME_ARGS:
+            options.add_argument(arg)
+
+        driver = uc.Chrome(options=options, driver_executable_path=CHROMEDRIVER_PATH, browser_executable_path=CHROME_PATH)
+        count_webdriver_calls(driver)
+        self.driver = driver
+        self.tab_windows = {}
+        self.started_at = time.time()
+
+        # driver.get() would wait for each page in turn, navigating from JS loads them all at once
+        for i, provider in enumerate(self.providers):
+            if i > 0:
+                driver.switch_to.new_window('tab')
+            self.tab_windows[provider] = driver.current_window_handle
+            driver.execute_script(scraper_js.NAVIGATE_JS, PROVIDER_URLS[provider])
+
+        # Switch back to the first tab just as a default
+        driver.switch_to.window(self.tab_windows[self.providers[0]])
+        self.active_window = self.tab_windows[self.providers[0]]
+        self.healthy = True
+
+    def quit(self):
+        self.healthy = False
+        self.ready = {provider: False for provider in self.providers}
+        self.uploads = {provider: (None, set()) for provider in self.providers}
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                print(f"⚠️ Worker {self.worker_id} quit error: {e}")
+            self.driver = None
+
+    def rebuild_tab(self, provider: str):
+        """Blocking, under driver_lock: replace the provider's (closed or crashed) tab with a
+        fresh one and start loading the provider page in it. Raises if the browser is gone too."""
+        old = self.tab_windows[provider]
+        handles = self.driver.window_handles
+        if old in handles:
+            try:
+                self.driver.switch_to.window(old)
+                self.driver.close()
+            except WebDriverException:
+                pass
+        others = [h for h in handles if h != old]
+        if not others:
+            raise Exception("No window left to open a tab from.")
+        self.driver.switch_to.window(others[0])
+        self.driver.switch_to.new_window('tab')
+        self.tab_windows[provider] = self.active_window = self.driver.current_window_handle
+        self.uploads[provider] = (None, set())
+        self.driver.execute_script(scraper_js.NAVIGATE_JS, PROVIDER_URLS[provider])
+
+    def is_alive(self):
+        """Blocking: the browser answers and every provider tab still exists."""
         try:
-            # Check for voice button (means it's idle and ready)
-            voice_btn = driver.find_elements(By.CSS_SELECTOR, "button[aria-label='Start Voice']")
-            if voice_btn:
-                await asyncio.sleep(2)
-                return True
-
-            # Check for send button being re-enabled
-            send_btn = driver.find_elements(By.CSS_SELECTOR, "button[data-testid='send-button']")
-            if send_btn and not send_btn[0].get_attribute("disabled"):
-                await asyncio.sleep(2)
-                return True
+            handles = set(self.driver.window_handles)
+            return all(handle in handles for handle in self.tab_windows.values())
         except Exception:
-            pass
-        await asyncio.sleep(2)
-    return False
-
-async def send_and_extract_chatgpt(prompt_text: str, files: Optional[List[str]] = None):
-    # Ensuring we are on the ChatGPT tab
-    driver.switch_to.window(chatgpt_window)
-    await asyncio.sleep(1) # Extra stability delay before starting
+            return False
+
+    async def on_tab(self, provider: str, burst: Callable, *args):
+        """Run burst(*args), a short burst of commands on the provider's tab, on this worker's
+        driver thread while holding the driver. Returns what burst returns.
+        Never sleep inside a burst - return so the other tabs can be polled."""
+        wait_start = time.perf_counter()
+        async with self.driver_lock:
+            waited = time.perf_counter() - wait_start
+            scraper_metrics.LOCK_WAIT_SECONDS.observe(provider, value=waited)
+            scraper_metrics.record("lock_wait", waited)
+            # Copy the context so phase() / prompt_submitted() in the burst see this request
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, context.run, self.switch_and_run, provider, burst, args
+            )
+
+    def switch_and_run(self, provider: str, burst: Callable, args: tuple):
+        handle = self.tab_windows[provider]
+        if self.active_window != handle:
+            with phase("tab_switch"):
+                self.driver.switch_to.window(handle)
+            self.active_window = handle
+        return burst(*args)
+
+class WorkerPool:
+    def __init__(self, specs: List[List[str]]):
+        self.workers = [BrowserWorker(i, providers) for i, providers in enumerate(specs) if providers]
+        self.health_task = None
+        self.start_task = None
+        self.probe_tasks = []
+        self.recovery_tasks = set()
+
+    async def start(self):
+        """Launch the browsers and probe their tabs in the background. The API serves
+        each tab as soon as its probe passes, while the rest are still loading."""
+        # Chrome launches one at a time: undetected_chromedriver patches its driver binary
+        # on start and parallel starts race on that file. Page loads all overlap.
+        for worker in self.workers:
+            worker.restarting = True  # keep the health check away until it's up
+            try:
+                await asyncio.to_thread(worker.start)
+                self.probe_tasks += [asyncio.create_task(self.probe(worker, p)) for p in worker.providers]
+            except Exception as e:
+                print(f"❌ Worker {worker.worker_id} failed to start, the health check will retry: {e}")
+            finally:
+                worker.restarting = False
+        print(f"🚀 {len(self.workers)} browser worker(s) launched, tabs are loading...")
+
+    async def wait_ready(self):
+        await asyncio.gather(*self.probe_tasks, return_exceptions=True)
+
+    async def probe(self, worker: BrowserWorker, provider: str):
+        """Wait until the tab has loaded and shows its editor (or a login page), then open it to jobs."""
+        name = PROVIDER_NAMES[provider]
+        state = await wait_for_tab(worker, provider, STARTUP_TIMEOUT)
+        if state is None:
+            print(f"⚠️ {name} tab (worker {worker.worker_id}) not ready after {STARTUP_TIMEOUT}s, using it anyway.")
+        else:
+            worker.logged_in[provider] = not state["loggedOut"]
+            if state["loggedOut"]:
+                print(f"⚠️ {name} is not logged in (worker {worker.worker_id}), log in in that window.")
+            print(f"✅ {name} ready in {time.time() - worker.started_at:.1f}s (worker {worker.worker_id})")
+        worker.ready[provider] = True
+        job_queue.schedule(provider)
+
+    def status(self):
+        return [
+            {
+                "worker": worker.worker_id,
+                "healthy": worker.healthy,
+                "restarting": worker.restarting,
+                "tabs": {
+                    provider: {
+                        "ready": worker.ready[provider],
+                        "recovering": provider in worker.recovering,
+                        "logged_in": worker.logged_in[provider],
+                        "busy": worker.busy[provider].id if worker.busy[provider] else None,
+                    }
+                    for provider in worker.providers
+                },
+            }
+            for worker in self.workers
+        ]
 
-    # --- File Upload Logic ---
-    if files:
+    def shutdown(self):
+        for task in [self.health_task, self.start_task, *self.probe_tasks, *self.recovery_tasks]:
+            if task:
+                task.cancel()
+        for worker in self.workers:
+            worker.quit()
+            worker.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def check_worker(self, worker: BrowserWorker) -> bool:
+        async with worker.driver_lock:
+            try:
+                return await asyncio.wait_for(asyncio.to_thread(worker.is_alive), timeout=15)
+            except asyncio.TimeoutError:
+                return False
+
+    async def replace(self, worker: BrowserWorker):
+        print(f"🩺 Worker {worker.worker_id} is down, restarting its browser...")
+        worker.restarting = True
+        start = time.perf_counter()
         try:
-            file_input = driver.find_element(By.CSS_SELECTOR, "input[type='file']")
-            for file_path in files:
-                if os.path.exists(file_path):
-                    file_input.send_keys(file_path)
-                    print(f"Uploading file: {file_path}")
-                    await asyncio.sleep(1.5) # Increased pause
-                else:
-                    print(f"File not found: {file_path}")
-            
-            print(f"Waiting for {len(files)} files to complete uploading...")
-            max_wait = 60
-            start = time.time()
-            while time.time() - start < max_wait:
-                remove_btns = driver.find_elements(By.CSS_SELECTOR, "button[aria-label='Remove file']")
-                if len(remove_btns) >= len(files):
-                    print("All files seemingly uploaded!")
-                    break
-                await asyncio.sleep(1)
-            await asyncio.sleep(2) # Extra buffer after upload
+            await asyncio.to_thread(worker.quit)
+            await asyncio.to_thread(worker.start)
+            await asyncio.gather(*(self.probe(worker, provider) for provider in worker.providers))
+            seconds = time.perf_counter() - start
+            scraper_metrics.RECOVERY_SECONDS.observe("browser", value=seconds)
+            scraper_metrics.RECOVERIES.inc("browser", "ok")
+            print(f"✅ Worker {worker.worker_id} is back after {seconds:.1f}s.")
         except Exception as e:
-            print(f"Error during file upload: {e}")
+            worker.healthy = False
+            scraper_metrics.RECOVERIES.inc("browser", "failed")
+            print(f"❌ Worker {worker.worker_id} restart failed, retrying on next health check: {e}")
+        finally:
+            worker.restarting = False
+
+    def supervise(self, worker: BrowserWorker, provider: str, kind: str):
+        """A job hit a crash on this tab: take it out of rotation now and rebuild it in the
+        background, instead of letting every queued job fail on it until the next health check."""
+        worker.ready[provider] = False
+        if kind == "browser":
+            worker.healthy = False
+        task = asyncio.create_task(self.recover(worker, provider, kind))
+        self.recovery_tasks.add(task)
+        task.add_done_callback(self.recovery_tasks.discard)
+
+    async def recover(self, worker: BrowserWorker, provider: str, kind: str):
+        """Rebuild just the tab if the browser still answers, else restart the whole browser."""
+        if kind == "tab" and worker.healthy and not worker.restarting:
+            if provider in worker.recovering:
+                return
+            worker.recovering.add(provider)
+            name = PROVIDER_NAMES[provider]
+            print(f"🩺 {name} tab (worker {worker.worker_id}) is gone, opening a new one...")
+            start = time.perf_counter()
+            try:
+                async with worker.driver_lock:
+                    await asyncio.wait_for(asyncio.to_thread(worker.rebuild_tab, provider), timeout=30)
+                worker.started_at = time.time()
+                await self.probe(worker, provider)
+                seconds = time.perf_counter() - start
+                scraper_metrics.RECOVERY_SECONDS.observe("tab", value=seconds)
+                scraper_metrics.RECOVERIES.inc("tab", "ok")
+                print(f"✅ {name} tab (worker {worker.worker_id}) rebuilt in {seconds:.1f}s.")
+                return
+            except Exception as e:
+                scraper_metrics.RECOVERIES.inc("tab", "failed")
+                print(f"⚠️ Could not rebuild the {name} tab, restarting the browser: {e}")
+                worker.healthy = False
+            finally:
+                worker.recovering.discard(provider)
+        if worker.restarting:
+            return  # someone is already on it
+        worker.healthy = False
+        await self.replace(worker)
+
+    async def health_check_loop(self):
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            for worker in self.workers:
+                if worker.restarting:
+                    continue
+                if not worker.healthy or not await self.check_worker(worker):
+                    worker.healthy = False
+                    worker.restarting = True
+                    asyncio.create_task(self.replace(worker))
+
+# ----------------- CRASH RECOVERY -----------------
+# WebDriver errors that mean the whole browser (or chromedriver) is gone
+BROWSER_GONE_MESSAGES = ("chrome not reachable", "disconnected", "invalid session id", "no such session", "session deleted")
+# ... and the ones where only the tab's renderer died
+TAB_CRASHED_MESSAGES = ("tab crashed", "target crashed", "target window already closed")
+
+class TabCrashed(Exception):
+    """A job failed because its tab or browser died. sent: the prompt may have reached the provider."""
+
+    def __init__(self, provider: str, kind: str, sent: bool, cause: Exception):
+        super().__init__(f"{PROVIDER_NAMES[provider]} {kind} crashed: {str(cause).strip()}")
+        self.provider = provider
+        self.kind = kind
+        self.sent = sent
+
+def crash_kind(error: BaseException) -> Optional[str]:
+    """'tab' if the error means the tab is gone, 'browser' if Chrome is, None for anything else."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, NoSuchWindowException):
+            return "tab"
+        if isinstance(error, (InvalidSessionIdException, MaxRetryError, ConnectionError)):
+            return "browser"
+        if isinstance(error, WebDriverException):
+            message = (error.msg or "").lower()
+            if any(m in message for m in TAB_CRASHED_MESSAGES):
+                return "tab"
+            if any(m in message for m in BROWSER_GONE_MESSAGES):
+                return "browser"
+        error = error.__cause__ or error.__context__
+    return None
+
+# Set by send_in_thread, flipped by the send functions right before they submit the prompt
+prompt_delivery = contextvars.ContextVar("scraper_prompt_delivery", default=None)
+
+def prompt_submitted():
+    delivery = prompt_delivery.get()
+    if delivery is not None:
+        delivery["sent"] = True
+
+pool = WorkerPool(WORKER_SPECS)
+
+# ----------------- RESPONSE WATCHER -----------------
+# What the in-page MutationObserver (scraper_js.WATCH_JS) looks at per provider:
+#   container - response containers, the newest one after sending is the answer
+#   format    - scraper_js.FORMAT_JS formatter that turns it into the answer's markdown
+#   busy/idle - generation is done when busy is gone and idle is present
+#   quietMs   - ...and the text hasn't changed for this long
+WATCH_CONFIG = {
+    "chatgpt": {
+        "container": "div[data-message-author-role='assistant']",
+        "format": "chatgpt",
+        "busy": "button[data-testid='stop-button']",
+        "idle": "button[aria-label='Start Voice'], button[data-testid='send-button']:not([disabled])",
+        "quietMs": 300,
+    },
+    "deepseek": {"container": "div.ds-markdown", "format": "deepseek", "quietMs": 500},
+    "perplexity": {"container": "div[id^='markdown-content-']", "format": "text", "quietMs": 3000},
+}
+# (container mount timeout, total timeout) in seconds
+WATCH_TIMEOUTS = {"chatgpt": (30, 180), "deepseek": (10, 120), "perplexity": (30, 120)}
+
+def arm_watch(driver, provider: str):
+    """Call inside the same on_tab burst that sends the prompt, right before Enter."""
+    driver.execute_script(scraper_js.WATCH_JS, WATCH_CONFIG[provider])
+
+async def wait_for_generation(worker: BrowserWorker, provider: str, on_delta: Optional[Callable[[str], None]] = None):
+    """Collect the armed watcher's deltas until it reports the answer is finished.
+    One execute_async_script per long-poll window instead of one .text call per tick.
+    on_delta gets every piece of the answer's formatted markdown as it streams in,
+    line by line (the line still being written can change, see scraper_js COLLECT_JS),
+    ending with the same text the extraction returns.
+    Returns the response container element."""
+    driver = worker.driver
+    mount_timeout, max_wait = WATCH_TIMEOUTS[provider]
+    name = PROVIDER_NAMES[provider]
+    start_time = time.time()
+    text = ""
+    streamed = ""
+    last_report = 0
+    mounted_at = None
 
+    while time.time() - start_time < max_wait:
+        # Long-poll for a second, but keep it short while other tabs are busy: this
+        # browser's driver can't talk to its other tabs during the poll, and with the whole
+        # pool generating, short windows keep every tab's deltas flowing at an even pace
+        busy_tabs = sum(1 for w in pool.workers for job in w.busy.values() if job)
+        window_ms = 1000 if busy_tabs <= 1 else 250
+        result = await worker.on_tab(provider, driver.execute_async_script, scraper_js.COLLECT_JS, window_ms, on_delta is not None)
+
+        if result.get("lost"):
+            raise Exception(f"{name} response watcher lost, the page was reloaded.")
+        if not result["started"] and time.time() - start_time > mount_timeout:
+            raise Exception(f"Timeout! {name} did not start generating a response.")
+
+        if result["started"] and mounted_at is None:
+            mounted_at = time.time()
+            scraper_metrics.record("mount", mounted_at - start_time)
+
+        text = result["delta"] if result["reset"] else text + result["delta"]
+        if on_delta and len(text) > len(streamed) and text.startswith(streamed):
+            on_delta(text[len(streamed):])
+            streamed = text
+        if result["done"]:
+            scraper_metrics.record("generate", time.time() - (mounted_at or start_time))
+            print(f"✅ {name} generation complete! ({len(text)} chars in {result['elapsed'] / 1000:.1f}s)")
+            return result["container"]
+        if len(text) - last_report >= 500:
+            last_report = len(text)
+            print(f"✍️ {name} is typing... (length: {len(text)})")
+
+        # Let the other tabs take the driver between polls
+        await asyncio.sleep(0)
+
+    raise Exception(f"{name} response generation timed out.")
+
+# ----------------- PROMPT INPUT -----------------
+def fill_prompt(driver, text_area, prompt_text: str):
+    """Put the whole prompt into the editor with one execute_script, however long it is.
+    Falls back to typing it when the editor doesn't take the injected text."""
     try:
-        text_area = driver.find_element(By.CSS_SELECTOR, "div#prompt-textarea")
-        driver.execute_script("arguments[0].scrollIntoView();", text_area)
-        await asyncio.sleep(1) # Extra delay
-        driver.execute_script("arguments[0].click();", text_area)
-        
-        # Clear reliably
-        text_area.send_keys(Keys.CONTROL + "a")
-        text_area.send_keys(Keys.BACKSPACE)
-        await asyncio.sleep(0.5)
+        if driver.execute_script(scraper_js.INSERT_TEXT_JS, text_area, prompt_text):
+            return
+        print("⚠️ Editor ignored the injected prompt, typing it instead.")
+    except Exception as e:
+        print(f"⚠️ Fast prompt input failed ({e}), typing it instead.")
+    type_prompt(text_area, prompt_text)
 
-        lines = prompt_text.split('\n')
-        for i, line in enumerate(lines):
-            text_area.send_keys(line)
-            if i < len(lines) - 1:
-                text_area.send_keys(Keys.SHIFT + Keys.ENTER)
+def type_prompt(text_area, prompt_text: str):
+    text_area.send_keys(Keys.CONTROL + "a")
+    text_area.send_keys(Keys.BACKSPACE)
 
-        # Better delay before sending
-        await asyncio.sleep(2.0)
+    # ChromeDriver can only type characters from the Basic Multilingual Plane
+    prompt_text = "".join(
+        ch if ord(ch) <= 0xFFFF else f":{unicodedata.name(ch, 'symbol').lower().replace(' ', '_')}:"
+        for ch in prompt_text
+    )
+    lines = prompt_text.split('\n')
+    for i, line in enumerate(lines):
+        text_area.send_keys(line)
+        if i < len(lines) - 1:
+            text_area.send_keys(Keys.SHIFT + Keys.ENTER)
 
-        # Hit Enter
-        text_area.send_keys(Keys.ENTER)
-        
-        # Wait a bit to let it register the enter
-        await asyncio.sleep(2.0)
+# ----------------- CONDITION WAITS -----------------
+EDITOR_SELECTORS = {
+    "chatgpt": "div#prompt-textarea",
+    "deepseek": "textarea[placeholder='Message DeepSeek']",
+    "perplexity": "#ask-input, textarea, [contenteditable='true']",
+}
+CHATGPT_SEND = "button[data-testid='send-button']"
+CHATGPT_STOP = "button[data-testid='stop-button']"
+CHATGPT_UPLOAD_CHIP = "button[aria-label='Remove file']"
+# Anything in a chip that means its file is still uploading
+CHATGPT_UPLOAD_BUSY = "[role='progressbar'], .animate-spin, [aria-busy='true']"
+
+# What the page has to show before the next step, instead of a fixed sleep.
+# Format: scraper_js.CONDITION_JS
+WAIT_CONDITIONS = {
+    "chatgpt": {
+        "editor": {"all": [{"sel": EDITOR_SELECTORS["chatgpt"]}]},
+        # Disabled while it's empty or files are still uploading
+        "send_ready": {"all": [{"sel": CHATGPT_SEND, "enabled": True}]},
+        # Send turned into stop, or at least the editor was cleared
+        "sent": {"any": [{"sel": CHATGPT_STOP}, {"sel": EDITOR_SELECTORS["chatgpt"], "empty": True}]},
+    },
+    "deepseek": {
+        "editor": {"all": [{"sel": EDITOR_SELECTORS["deepseek"], "enabled": True}]},
+    },
+    "perplexity": {
+        "editor": {"all": [{"sel": EDITOR_SELECTORS["perplexity"], "enabled": True}]},
+    },
+}
+# Seconds per provider and condition
+CONDITION_TIMEOUTS = {
+    "chatgpt": {"editor": 15, "uploads": 120, "send_ready": 60, "sent": 5},
+    "deepseek": {"editor": 15},
+    "perplexity": {"editor": 15},
+}
+waits = AdaptiveWait()
+
+async def wait_for(worker: BrowserWorker, provider: str, name: str, condition: Optional[dict] = None, probe=None):
+    """Poll a WAIT_CONDITIONS entry (or the given condition, or an async probe) until the page shows it.
+    Timed as the 'wait_<name>' phase; raises WaitTimeout."""
+    condition = condition or WAIT_CONDITIONS[provider].get(name)
+
+    async def check_condition():
+        return await worker.on_tab(provider, worker.driver.execute_script, scraper_js.CONDITION_JS, condition)
+
+    probe = probe or check_condition
+
+    with phase(f"wait_{name}"):
+        return await waits.until(
+            (provider, name), probe, CONDITION_TIMEOUTS[provider][name], f"{PROVIDER_NAMES[provider]} {name}"
+        )
 
-        is_done = await wait_for_chatgpt_response_to_complete()
-        if not is_done:
-            raise Exception("ChatGPT response generation timed out.")
+# ----------------- CHATGPT LOGIC -----------------
+async def send_and_extract_chatgpt(worker: BrowserWorker, prompt_text: str, attachments: Optional[List[Tuple[str, str]]] = None, on_delta=None):
+    driver = worker.driver
+    await wait_for(worker, "chatgpt", "editor")
 
-        # Give UI a bit of time to fully settle before extracting
-        await asyncio.sleep(2.0)
-        
-        messages = driver.find_elements(By.CSS_SELECTOR, "div[data-message-author-role='assistant']")
-        latest_message = messages[-1]
+    # --- File Upload Logic ---
+    if attachments:
+        with phase("upload"):
+            try:
+                await upload_chatgpt_files(worker, attachments)
+            except Exception as e:
+                print(f"Error during file upload: {e}")
+
+    def type_in():
+        text_area = driver.find_element(By.CSS_SELECTOR, EDITOR_SELECTORS["chatgpt"])
+        driver.execute_script("arguments[0].scrollIntoView(); arguments[0].click();", text_area)
+        fill_prompt(driver, text_area, prompt_text)
+        return text_area
+
+    def send(text_area):
+        arm_watch(driver, "chatgpt")
+        prompt_submitted()
+        text_area.send_keys(Keys.ENTER)
 
-        formatted_markdown = ""
-        plain_text_parts = []
-        code_blocks = {}
+    def click_send():
+        driver.execute_script("arguments[0].click();", driver.find_element(By.CSS_SELECTOR, CHATGPT_SEND))
 
-        elements = latest_message.find_elements(By.CSS_SELECTOR, "div.markdown.prose > *")
+    try:
+        with phase("input"):
+            text_area = await worker.on_tab("chatgpt", type_in)
 
-        code_idx = 0
-        for el in elements:
-            tag = el.tag_name.lower()
+        # The send button only enables once the prompt is in and the uploads are done
+        await wait_for(worker, "chatgpt", "send_ready")
 
-            if tag in ['p', 'h1', 'h2', 'h3', 'h4']:
-                text = el.text
-                formatted_markdown += text + "\n\n"
-                plain_text_parts.append(text)
-
-            elif tag in ['ul', 'ol']:
-                lis = el.find_elements(By.TAG_NAME, "li")
-                list_text = ""
-                for li in lis:
-                    list_text += "- " + li.text + "\n"
-                formatted_markdown += list_text + "\n"
-                plain_text_parts.append(list_text)
-
-            elif tag == 'pre':
-                try:
-                    lang_elem = el.find_elements(By.CSS_SELECTOR, "div.flex.items-center.text-sm")
-                    lang = lang_elem[0].text.lower() if lang_elem else "code"
-                    unique_lang_key = f"{lang}_{code_idx}"
-                    code_content = el.find_element(By.CSS_SELECTOR, "div.cm-content").text
+        # Hit Enter
+        with phase("input"):
+            await worker.on_tab("chatgpt", send, text_area)
+        try:
+            await wait_for(worker, "chatgpt", "sent")
+        except WaitTimeout:
+            print("⚠️ Enter didn't send the prompt, clicking send instead.")
+            await worker.on_tab("chatgpt", click_send)
 
-                    code_blocks[unique_lang_key] = code_content
-                    formatted_markdown += f"```{lang}\n{code_content}\n```\n\n"
-                    code_idx += 1
-                except Exception as e:
-                    continue
-            else:
-                text = el.text
-                formatted_markdown += text + "\n\n"
-                plain_text_parts.append(text)
+        await wait_for_generation(worker, "chatgpt", on_delta)
 
-        return {
-            "plain-text": "\n\n".join(plain_text_parts),
-            "code-blocks": code_blocks,
-            "formatted_markdown": formatted_markdown
-        }
+        with phase("extract"):
+            return await worker.on_tab("chatgpt", extract_chatgpt_message, driver)
 
     except Exception as e:
         print(f"ChatGPT Extraction Error: {e}")
         raise e
 
-# ----------------- DEEPSEEK LOGIC -----------------
-async def send_and_extract_deepseek(prompt_text: str, files: Optional[List[str]] = None):
-    driver.switch_to.window(deepseek_window)
-    await asyncio.sleep(0.5)
-    
-    existing_messages = driver.find_elements(By.CSS_SELECTOR, "div.ds-markdown")
-    initial_count = len(existing_messages)
+def hash_attachments(files: List[str]) -> List[Tuple[str, str]]:
+    """(absolute path, content hash) of each file to attach, missing files and duplicates dropped.
+    Reads every file, so dispatch runs it in a thread before the job gets a tab."""
+    attachments, seen = [], set()
+    for file_path in files:
+        if not os.path.exists(file_path):
+            print(f"File not found: {file_path}")
+            continue
+        digest = file_fingerprint(file_path)
+        if digest in seen:
+            continue
+        seen.add(digest)
+        attachments.append((os.path.abspath(file_path), digest))
+    return attachments
+
+def files_to_upload(worker: BrowserWorker, provider: str, attachments: List[Tuple[str, str]], thread_id: Optional[str]):
+    """The attachments the current thread doesn't have yet (set lookups only, no disk I/O)."""
+    known_thread, known = worker.uploads[provider]
+    if known_thread is not None and known_thread != thread_id:
+        known = set()
+        worker.uploads[provider] = (thread_id, known)
+    pending = []
+    for path, digest in attachments:
+        if digest in known:
+            print(f"📎 Already in this thread, not uploading again: {path}")
+            continue
+        pending.append((path, digest))
+    return pending
+
+async def upload_chatgpt_files(worker: BrowserWorker, attachments: List[Tuple[str, str]]):
+    """Attach all new files with one send_keys and wait until every chip finished uploading."""
+    driver = worker.driver
+
+    def attach():
+        thread_id = thread_id_from_url("chatgpt", driver.current_url)
+        pending = files_to_upload(worker, "chatgpt", attachments, thread_id)
+        if not pending:
+            return pending, 0
+        before = len(driver.execute_script(scraper_js.UPLOAD_STATE_JS, CHATGPT_UPLOAD_CHIP, CHATGPT_UPLOAD_BUSY))
+        # A multiple file input takes several paths at once, one per line
+        file_input = driver.find_element(By.CSS_SELECTOR, "input[type='file']")
+        file_input.send_keys("\n".join(path for path, _ in pending))
+        return pending, before
+
+    pending, before = await worker.on_tab("chatgpt", attach)
+    if not pending:
+        return
+    print(f"Uploading {len(pending)} file(s): {', '.join(os.path.basename(path) for path, _ in pending)}")
+
+    expected = before + len(pending)
+    progress = {"done": -1}
+
+    async def all_uploaded():
+        chips = await worker.on_tab("chatgpt", driver.execute_script, scraper_js.UPLOAD_STATE_JS, CHATGPT_UPLOAD_CHIP, CHATGPT_UPLOAD_BUSY)
+        done = sum(1 for chip in chips if chip["done"])
+        if done != progress["done"]:
+            progress["done"] = done
+            print(f"📎 {done}/{expected} uploaded")
+        return len(chips) >= expected and done == len(chips)
+
+    await wait_for(worker, "chatgpt", "uploads", probe=all_uploaded)
+    # Uploaded files stay in the conversation, the same content doesn't need to go up again
+    worker.uploads["chatgpt"][1].update(digest for _, digest in pending)
+    print("All files uploaded!")
+
+def extract_chatgpt_message(driver):
+    """The whole answer in one execute_script instead of several calls per element."""
+    try:
+        data = driver.execute_script(scraper_js.EXTRACT_CHATGPT_JS)
+    except Exception as e:
+        print(f"⚠️ In-page extraction failed ({e}), walking the elements instead.")
+        return extract_chatgpt_message_by_elements(driver)
+    if data is None:
+        raise Exception("No ChatGPT answer found on the page.")
+    return data
 
-    text_area = driver.find_element(By.CSS_SELECTOR, "textarea[placeholder='Message DeepSeek']")
-    driver.execute_script("arguments[0].scrollIntoView({behavior: 'instant', block: 'center'});", text_area)
-    driver.execute_script("arguments[0].focus();", text_area)
+def extract_chatgpt_message_by_elements(driver):
+    messages = driver.find_elements(By.CSS_SELECTOR, "div[data-message-author-role='assistant']")
+    latest_message = messages[-1]
 
-    text_area.send_keys(Keys.CONTROL + "a")
-    text_area.send_keys(Keys.BACKSPACE)
+    formatted_markdown = ""
+    plain_text_parts = []
+    code_blocks = {}
 
-    lines = prompt_text.split('\n')
-    for i, line in enumerate(lines):
-        text_area.send_keys(line)
-        if i < len(lines) - 1:
-            text_area.send_keys(Keys.SHIFT + Keys.ENTER)
+    elements = latest_message.find_elements(By.CSS_SELECTOR, "div.markdown.prose > *")
+
+    code_idx = 0
+    for el in elements:
+        tag = el.tag_name.lower()
+
+        if tag in ['p', 'h1', 'h2', 'h3', 'h4']:
+            text = el.text
+            formatted_markdown += text + "\n\n"
+            plain_text_parts.append(text)
+
+        elif tag in ['ul', 'ol']:
+            lis = el.find_elements(By.TAG_NAME, "li")
+            list_text = ""
+            for li in lis:
+                list_text += "- " + li.text + "\n"
+            formatted_markdown += list_text + "\n"
+            plain_text_parts.append(list_text)
+
+        elif tag == 'pre':
+            try:
+                lang_elem = el.find_elements(By.CSS_SELECTOR, "div.flex.items-center.text-sm")
+                lang = lang_elem[0].text.lower() if lang_elem else "code"
+                unique_lang_key = f"{lang}_{code_idx}"
+                code_content = el.find_element(By.CSS_SELECTOR, "div.cm-content").text
+
+                code_blocks[unique_lang_key] = code_content
+                formatted_markdown += f"```{lang}\n{code_content}\n```\n\n"
+                code_idx += 1
+            except Exception as e:
+                continue
+        else:
+            text = el.text
+            formatted_markdown += text + "\n\n"
+            plain_text_parts.append(text)
 
-    driver.execute_script("arguments[0].focus();", text_area)
-    text_area.send_keys(Keys.ENTER)
-    print("📤 Prompt sent to DeepSeek! Waiting for response...")
+    return {
+        "plain-text": "\n\n".join(plain_text_parts),
+        "code-blocks": code_blocks,
+        "formatted_markdown": formatted_markdown
+    }
 
-    new_message_container = None
-    for _ in range(100):  
-        current_messages = driver.find_elements(By.CSS_SELECTOR, "div.ds-markdown")
-        if len(current_messages) > initial_count:
-            new_message_container = current_messages[-1]
-            break
-        await asyncio.sleep(0.1)
+# ----------------- DEEPSEEK LOGIC -----------------
+async def send_and_extract_deepseek(worker: BrowserWorker, prompt_text: str, attachments: Optional[List[Tuple[str, str]]] = None, on_delta=None):
+    driver = worker.driver
+    await wait_for(worker, "deepseek", "editor")
+
+    def send():
+        text_area = driver.find_element(By.CSS_SELECTOR, EDITOR_SELECTORS["deepseek"])
+        driver.execute_script("arguments[0].scrollIntoView({behavior: 'instant', block: 'center'});", text_area)
+        fill_prompt(driver, text_area, prompt_text)
+
+        driver.execute_script("arguments[0].focus();", text_area)
+        arm_watch(driver, "deepseek")
+        prompt_submitted()
+        text_area.send_keys(Keys.ENTER)
 
-    if not new_message_container:
-        raise Exception("Timeout! DeepSeek ne naya response container start nahi kiya.")
+    with phase("input"):
+        await worker.on_tab("deepseek", send)
+    print("📤 Prompt sent to DeepSeek! Waiting for response...")
 
-    last_text = ""
-    stable_ticks = 0
-    max_ticks = 1200 
+    new_message_container = await wait_for_generation(worker, "deepseek", on_delta)
 
-    print("✍️ Tracking text generation...")
-    for _ in range(max_ticks):
-        try:
-            current_text = new_message_container.text
-            if current_text == last_text and len(current_text) > 0:
-                stable_ticks += 1
-                if stable_ticks >= 5: 
-                    print(f"✅ Generation complete! (Instant detect)")
-                    break
-            else:
-                stable_ticks = 0
-                last_text = current_text
-        except Exception:
-            pass 
+    print("⛏️ Extracting content...")
+    with phase("extract"):
+        return await worker.on_tab("deepseek", extract_deepseek_message, driver, new_message_container)
 
-        await asyncio.sleep(0.1)
+def extract_deepseek_message(driver, new_message_container):
+    """The whole answer in one execute_script instead of several calls per element."""
+    try:
+        return driver.execute_script(scraper_js.EXTRACT_DEEPSEEK_JS, new_message_container)
+    except Exception as e:
+        print(f"⚠️ In-page extraction failed ({e}), walking the elements instead.")
+        return extract_deepseek_message_by_elements(new_message_container)
 
-    print("⛏️ Extracting content...")
+def extract_deepseek_message_by_elements(new_message_container):
     formatted_markdown = ""
     plain_text_parts = []
     code_blocks = {}
@@ -300,113 +828,387 @@ async def send_and_extract_deepseek(prompt_text: str, files: Optional[List[str]]
     }
 
 # ----------------- PERPLEXITY LOGIC -----------------
-async def wait_for_perplexity_stability(new_message_container):
-    print("⏳ Waiting for Perplexity generation to stabilize...")
-    last_text = ""
-    stable_ticks = 0
-    max_ticks = 240
-    
-    for _ in range(max_ticks):
-        try:
-            current_text = new_message_container.text
-            if current_text == last_text and len(current_text) > 0:
-                stable_ticks += 1
-                if stable_ticks >= 6: 
-                    print("✅ Generation complete! (Text stabilized)")
-                    return True
-            else:
-                stable_ticks = 0
-                last_text = current_text
-                if _ % 4 == 0 and len(current_text) > 0:
-                    print(f"✍️ Perplexity is typing... (length: {len(current_text)})")
-                    
-        except Exception:
-            pass 
-            
-        await asyncio.sleep(0.5)
-        
-    print("❌ Wait timeout reached!")
-    return False
-
-async def send_and_extract_perplexity(prompt_text: str, files: Optional[List[str]] = None):
-    # Ensure we are on Perplexity tab
-    driver.switch_to.window(perplexity_window)
-    await asyncio.sleep(1)
-
-    existing_messages = driver.find_elements(By.CSS_SELECTOR, "div[id^='markdown-content-']")
-    initial_count = len(existing_messages)
-    print(f"📊 Existing messages count before send: {initial_count}")
-
-    text_area = None
-    selectors_to_try = ["#ask-input", "textarea", "[contenteditable='true']"]
-    
-    for selector in selectors_to_try:
-        try:
-            elements = driver.find_elements(By.CSS_SELECTOR, selector)
-            for el in elements:
-                if el.is_displayed() and el.is_enabled():
-                    text_area = el
+async def send_and_extract_perplexity(worker: BrowserWorker, prompt_text: str, attachments: Optional[List[Tuple[str, str]]] = None, on_delta=None):
+    driver = worker.driver
+    await wait_for(worker, "perplexity", "editor")
+
+    def send():
+        text_area = None
+        selectors_to_try = ["#ask-input", "textarea", "[contenteditable='true']"]
+
+        for selector in selectors_to_try:
+            try:
+                elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                for el in elements:
+                    if el.is_displayed() and el.is_enabled():
+                        text_area = el
+                        break
+                if text_area:
                     break
-            if text_area:
-                break
-        except Exception:
-            continue
-
-    if not text_area:
-        raise Exception("Could not find the Perplexity input box!")
+            except Exception:
+                continue
 
-    driver.execute_script("arguments[0].scrollIntoView({behavior: 'instant', block: 'center'});", text_area)
-    await asyncio.sleep(0.5)
-    driver.execute_script("arguments[0].focus();", text_area)
-    
-    text_area.send_keys(Keys.CONTROL + "a")
-    text_area.send_keys(Keys.BACKSPACE)
-    await asyncio.sleep(0.3)
+        if not text_area:
+            raise Exception("Could not find the Perplexity input box!")
 
-    lines = prompt_text.split('\n')
-    for i, line in enumerate(lines):
-        text_area.send_keys(line)
-        if i < len(lines) - 1:
-            text_area.send_keys(Keys.SHIFT + Keys.ENTER)
-            await asyncio.sleep(0.1)
+        driver.execute_script("arguments[0].scrollIntoView({behavior: 'instant', block: 'center'});", text_area)
+        fill_prompt(driver, text_area, prompt_text)
+        arm_watch(driver, "perplexity")
+        prompt_submitted()
+        text_area.send_keys(Keys.ENTER)
 
-    await asyncio.sleep(0.5)
-    text_area.send_keys(Keys.ENTER)
+    with phase("input"):
+        await worker.on_tab("perplexity", send)
     print("📤 Prompt sent to Perplexity!")
 
-    new_message_container = None
-    wait_start = time.time()
-    print("🕵️ Waiting for new response container to mount...")
-    
-    while time.time() - wait_start < 30:
-        current_messages = driver.find_elements(By.CSS_SELECTOR, "div[id^='markdown-content-']")
-        if len(current_messages) > initial_count:
-            new_message_container = current_messages[-1]
-            print(f"🎯 New container mounted! ID: {new_message_container.get_attribute('id')}")
-            break
-        await asyncio.sleep(1)
-
-    if not new_message_container:
-        raise Exception("Timeout! Perplexity did not start generating a response.")
-
-    is_done = await wait_for_perplexity_stability(new_message_container)
-    if not is_done:
-        raise Exception("Response generation didn't stabilize in time.")
+    new_message_container = await wait_for_generation(worker, "perplexity", on_delta)
 
     print("⛏️ Extracting content...")
     try:
-        final_text = new_message_container.text
+        with phase("extract"):
+            # Same text the watcher streamed, in one execute_script
+            result = await worker.on_tab("perplexity", driver.execute_script, scraper_js.EXTRACT_TEXT_JS, new_message_container)
         print("✅ Extraction successful!")
     except Exception as e:
         print(f"⚠️ Extraction error: {e}")
-        final_text = "Error extracting text."
-
-    # Return standard dictionary mimicking other bots
-    return {
-        "plain-text": final_text,
-        "formatted_markdown": final_text.strip(),
-        "code-blocks": {}
+        result = {"plain-text": "Error extracting text.", "formatted_markdown": "Error extracting text.", "code-blocks": {}}
+
+    # Standard dictionary like the other bots
+    return result
+
+# ----------------- THREADS -----------------
+# Conversation URL of a thread, relative to the provider URL
+THREAD_PATHS = {"chatgpt": "c/{id}", "deepseek": "a/chat/s/{id}", "perplexity": "search/{id}"}
+THREAD_ID_PATTERNS = {provider: re.compile("/" + path.replace("{id}", r"([^/?#]+)")) for provider, path in THREAD_PATHS.items()}
+# Shown instead of the app when the tab isn't logged in
+LOGGED_OUT_SELECTORS = {
+    "chatgpt": "button[data-testid='login-button']",
+    "deepseek": "input[type='password']",
+}
+PAGE_LOAD_TIMEOUT = 30
+
+def parse_thread_policy(thread: Optional[str]):
+    """'auto' (default) | 'new_chat' | 'continue:<thread_id>' -> (mode, thread_id)"""
+    if not thread or thread == "auto":
+        return "auto", None
+    if thread == "new_chat":
+        return "new_chat", None
+    if thread.startswith("continue:") and thread[len("continue:"):]:
+        return "continue", thread[len("continue:"):]
+    raise ValueError(f"Unknown thread policy '{thread}', use 'auto', 'new_chat' or 'continue:<thread_id>'.")
+
+def thread_id_from_url(provider: str, url: str) -> Optional[str]:
+    match = THREAD_ID_PATTERNS[provider].search(url)
+    return match.group(1) if match else None
+
+async def wait_for_tab(worker: BrowserWorker, provider: str, timeout: float):
+    """Poll the tab until its page has loaded and shows the editor or a login page.
+    Returns the TAB_STATE_JS result, or None on timeout."""
+    start = time.time()
+    while time.time() - start < timeout:
+        try:
+            state = await worker.on_tab(
+                provider, worker.driver.execute_script,
+                scraper_js.TAB_STATE_JS, EDITOR_SELECTORS[provider], LOGGED_OUT_SELECTORS.get(provider)
+            )
+            if state["loaded"] and (state["editor"] or state["loggedOut"]):
+                return state
+        except Exception:
+            pass  # page is between documents
+        await asyncio.sleep(0.25)
+    return None
+
+async def open_page(worker: BrowserWorker, provider: str, url: str):
+    """Load url in the provider's tab and wait for its editor.
+    driver.get() would hold the driver (and every other tab) for the whole page load."""
+    await worker.on_tab(provider, worker.driver.execute_script, scraper_js.NAVIGATE_JS, url)
+    worker.uploads[provider] = (None, set())
+    state = await wait_for_tab(worker, provider, PAGE_LOAD_TIMEOUT)
+    if state is None or not state["editor"]:
+        raise Exception(f"{PROVIDER_NAMES[provider]} page did not load: {url}")
+
+async def prepare_thread(worker: BrowserWorker, provider: str, thread: Optional[str]):
+    """Put the tab in the conversation the request asked for before the prompt goes in."""
+    mode, thread_id = parse_thread_policy(thread)
+    stats = await worker.on_tab(provider, worker.driver.execute_script, scraper_js.THREAD_STATS_JS, WATCH_CONFIG[provider]["container"])
+    current_id = thread_id_from_url(provider, stats["url"])
+    name = PROVIDER_NAMES[provider]
+
+    if mode == "continue":
+        if current_id != thread_id:
+            print(f"🧵 Opening {name} thread {thread_id}...")
+            await open_page(worker, provider, urljoin(PROVIDER_URLS[provider], THREAD_PATHS[provider].format(id=thread_id)))
+        return
+    if mode == "new_chat":
+        if current_id is None and stats["answers"] == 0:
+            return  # already a fresh chat
+        print(f"🧵 New {name} chat requested.")
+    elif (THREAD_MAX_ANSWERS and stats["answers"] >= THREAD_MAX_ANSWERS) or (THREAD_MAX_NODES and stats["nodes"] >= THREAD_MAX_NODES):
+        print(f"🧵 {name} thread is big ({stats['answers']} answers, {stats['nodes']} elements), starting a fresh one.")
+    else:
+        return
+    await open_page(worker, provider, PROVIDER_URLS[provider])
+
+async def send_in_thread(worker: BrowserWorker, provider: str, prompt_text: str, thread: Optional[str] = None, **kwargs):
+    """send_and_extract in the requested conversation; the result carries its thread_id.
+    Raises TabCrashed (and has the pool rebuild the tab) if the tab or browser died on the way."""
+    delivery = {"sent": False}
+    token = prompt_delivery.set(delivery)
+    try:
+        with phase("navigate"):
+            await prepare_thread(worker, provider, thread)
+        try:
+            result = await SEND_AND_EXTRACT[provider](worker, prompt_text, **kwargs)
+        except Exception:
+            # Can't tell whether the attached files made it into the thread
+            worker.uploads[provider] = (None, set())
+            raise
+        url = await worker.on_tab(provider, lambda: worker.driver.current_url)
+        result["thread_id"] = thread_id_from_url(provider, url)
+    except Exception as e:
+        kind = crash_kind(e)
+        if kind is None:
+            raise
+        pool.supervise(worker, provider, kind)
+        raise TabCrashed(provider, kind, delivery["sent"], e) from e
+    finally:
+        prompt_delivery.reset(token)
+    # A new chat only gets its id with the first answer, its uploads belong to that id now
+    worker.uploads[provider] = (result["thread_id"], worker.uploads[provider][1])
+    return result
+
+# ----------------- TAB SCHEDULER -----------------
+SEND_AND_EXTRACT = {
+    "chatgpt": send_and_extract_chatgpt,
+    "deepseek": send_and_extract_deepseek,
+    "perplexity": send_and_extract_perplexity,
+}
+
+def provider_for_model(model: str) -> str:
+    if model == 'deepseek-scraper':
+        return "deepseek"
+    if model == 'perplexity-scraper':
+        return "perplexity"
+    # Default to ChatGPT if 'gpt-scraper-mock' or anything else
+    return "chatgpt"
+
+# Best-effort stop buttons, clicked when a running job is cancelled or out of time
+STOP_SELECTORS = {"chatgpt": "button[data-testid='stop-button']"}
+
+async def stop_generation(worker: BrowserWorker, provider: str):
+    selector = STOP_SELECTORS.get(provider)
+    if not selector or not worker.healthy:
+        return
+
+    def click_stop():
+        for button in worker.driver.find_elements(By.CSS_SELECTOR, selector):
+            worker.driver.execute_script("arguments[0].click();", button)
+            print(f"🛑 Stopped abandoned {PROVIDER_NAMES[provider]} generation.")
+
+    await worker.on_tab(provider, click_stop)
+
+job_queue = JobQueue(pool.workers, on_abandon=stop_generation)
+response_cache = ResponseCache(CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES)
+
+async def dispatch(provider: str, prompt_text: str, files: Optional[List[str]] = None, on_delta=None,
+                   priority: str = "interactive", deadline: Optional[float] = None,
+                   cache_control: Optional[str] = None, thread: Optional[str] = None,
+                   timer: Optional[RequestTimer] = None):
+    """Answer from the response cache, or queue the prompt for a free provider tab and run it there.
+    Different tabs run at the same time: every step takes the worker's driver_lock only
+    briefly, so while one tab is generating the others get typed into / polled (round-robin
+    via the FIFO lock).
+    cache_control works like the HTTP header: "no-cache" skips the lookup, "no-store" also
+    doesn't save the answer.
+    thread picks the conversation, see parse_thread_policy().
+    Phase timings go into timer (pass one in to read them afterwards) and /metrics."""
+    timer = timer or RequestTimer(provider)
+    token = scraper_metrics.current_timer.set(timer)
+    status = "error"
+    job = None
+    try:
+        directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+        if parse_thread_policy(thread)[0] == "continue":
+            # The answer depends on that thread's history
+            directives.add("no-store")
+        use_cache = "no-cache" not in directives and "no-store" not in directives
+        if use_cache:
+            with phase("cache"):
+                cached = response_cache.get(provider, prompt_text, files)
+            if cached is not None:
+                print(f"⚡ Cache hit for {PROVIDER_NAMES[provider]} prompt.")
+                status = "cached"
+                return cached
+        else:
+            response_cache.stats["bypassed"] += 1
+
+        # Hashing the attachments reads them from disk: do it here, not in a driver burst
+        # where every other tab of that browser would wait for it
+        attachments = await asyncio.to_thread(hash_attachments, files) if files else None
+        replayed = False
+        while True:
+            job = Job(provider, priority=priority, deadline=deadline, label=prompt_text[:60])
+            try:
+                result = await job_queue.run(
+                    job, lambda worker: send_in_thread(worker, provider, prompt_text, thread=thread, attachments=attachments, on_delta=on_delta)
+                )
+                break
+            except TabCrashed as e:
+                # Only safe to send again if the provider never got the prompt
+                if e.sent or replayed:
+                    raise
+                replayed = True
+                if job.deadline is not None:
+                    # The replay keeps the original deadline (Job treats 0 as none, hence the floor)
+                    deadline = max(job.remaining(), 0.001)
+                timer.add("queue", job.started - job.created)
+                scraper_metrics.REPLAYS.inc(provider)
+                print(f"♻️ {e} before the prompt went out, sending it again on a healthy tab.")
+        if "no-store" not in directives:
+            with phase("cache"):
+                response_cache.put(provider, prompt_text, files, result)
+        status = "ok"
+        return result
+    except DeadlineExceeded:
+        status = "expired"
+        raise
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    finally:
+        if job is not None:
+            timer.add("queue", (job.started or job.finished or time.time()) - job.created)
+        timer.finish(status)
+        scraper_metrics.current_timer.reset(token)
+
+# ----------------- FAN-OUT MODELS -----------------
+# Virtual models that send the same prompt to every provider tab at once
+FAN_OUT_MODELS = {"race-scraper": "race", "ensemble-scraper": "ensemble"}
+
+def fan_out_providers() -> List[str]:
+    """Providers some worker has a tab for, in PROVIDER_NAMES order."""
+    return [provider for provider in PROVIDER_NAMES if any(provider in w.providers for w in pool.workers)]
+
+async def fan_out(mode: str, prompt_text: str, files: Optional[List[str]] = None, thread: Optional[str] = None, **job_options):
+    """dispatch() the prompt to every provider at once.
+    race: the first answer wins and the other jobs are cancelled (tab freed, generation stopped);
+    the result is the winner's plus "provider".
+    ensemble: wait for all of them; "answers" has each provider's content (or error) and
+    formatted_markdown puts them one after another under a heading per provider."""
+    if parse_thread_policy(thread)[0] == "continue":
+        raise ValueError("continue:<thread_id> belongs to one provider, it can't be used with a fan-out model.")
+    providers = fan_out_providers()
+    tasks = {
+        asyncio.create_task(dispatch(provider, prompt_text, files=files, thread=thread, **job_options)): provider
+        for provider in providers
     }
+    errors = {}
+
+    def failure(task):
+        if task.cancelled():
+            return asyncio.CancelledError("cancelled")
+        return task.exception()
+
+    def all_failed():
+        if all(isinstance(e, DeadlineExceeded) for e in errors.values()):
+            return DeadlineExceeded(f"No provider answered in time ({', '.join(providers)}).")
+        return Exception("Every provider failed: " + "; ".join(f"{PROVIDER_NAMES[p]}: {e}" for p, e in errors.items()))
+
+    try:
+        if mode == "race":
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = tasks[task]
+                    if failure(task) is not None:
+                        errors[provider] = failure(task)
+                        print(f"⚠️ {PROVIDER_NAMES[provider]} dropped out of the race: {errors[provider]}")
+                        continue
+                    print(f"🏁 {PROVIDER_NAMES[provider]} won the race.")
+                    return {**task.result(), "provider": provider}
+            raise all_failed()
+
+        await asyncio.wait(tasks)
+        answers, sections = {}, []
+        for task, provider in tasks.items():
+            if failure(task) is not None:
+                errors[provider] = failure(task)
+                answers[provider] = {"error": str(errors[provider])}
+                continue
+            result = task.result()
+            answers[provider] = {"content": result["formatted_markdown"], "thread_id": result.get("thread_id")}
+            sections.append(f"### {PROVIDER_NAMES[provider]}\n\n{result['formatted_markdown']}")
+        if len(errors) == len(tasks):
+            raise all_failed()
+        return {"formatted_markdown": "\n\n".join(sections), "answers": answers, "thread_id": None}
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+def answer_model(model: str, prompt_text: str, files: Optional[List[str]] = None, timer: Optional[RequestTimer] = None, **job_options):
+    """Coroutine answering prompt_text as model: a fan-out model or a single provider tab.
+    (Fan-out jobs time each provider on its own, timer only applies to single providers.)"""
+    if model in FAN_OUT_MODELS:
+        return fan_out(FAN_OUT_MODELS[model], prompt_text, files=files, **job_options)
+    return dispatch(provider_for_model(model), prompt_text, files=files, timer=timer, **job_options)
+
+def add_timing_header(request: Request, response: Response, timer: RequestTimer):
+    """Opt-in per request: send 'x-scraper-timing: 1' to get the phase breakdown back."""
+    if request.headers.get("x-scraper-timing"):
+        response.headers["x-scraper-timing"] = timer.header()
+
+async def run_for_client(request: Request, coro):
+    """Await coro, but cancel it (and free its tab) as soon as the HTTP client disconnects."""
+    task = asyncio.create_task(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=1)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                print("🔌 Client went away, cancelling its request.")
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def stream_dispatch(provider: str, prompt_text: str, files: Optional[List[str]] = None,
+                          answer: Optional[dict] = None, **job_options):
+    """dispatch() as an async generator of text pieces, yielded while the tab generates.
+    The watcher streams the answer's formatted markdown (the same formatter the
+    extraction uses), so the pieces add up to what stream=false returns; whatever of
+    the extracted answer hasn't been sent yet is yielded last.
+    answer, if given, gets dispatch()'s result once the stream is through."""
+    queue = asyncio.Queue()
+    task = asyncio.create_task(dispatch(provider, prompt_text, files=files, on_delta=queue.put_nowait, **job_options))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+
+    streamed = ""
+    try:
+        while True:
+            piece = await queue.get()
+            if piece is None:
+                break
+            streamed += piece
+            yield piece
+    finally:
+        # The client stopped reading (disconnect), don't keep the tab busy for nobody
+        if not task.done():
+            task.cancel()
+
+    if answer is not None:
+        answer.update(task.result())
+    final = task.result()["formatted_markdown"]
+    if final.startswith(streamed):
+        if len(final) > len(streamed):
+            yield final[len(streamed):]
+    else:
+        # The page rewrote a line that was already sent; can't take it back
+        scraper_metrics.STREAM_MISMATCHES.inc(provider)
+        print(f"⚠️ Streamed {PROVIDER_NAMES[provider]} text differs from the extracted answer after {len(os.path.commonprefix([final, streamed]))} chars.")
 
 
 # ----------------- FASTAPI ROUTES -----------------
@@ -420,86 +1222,330 @@ class ChatCompletionRequest(BaseModel):
     files: Optional[List[str]] = None
     temperature: Optional[float] = 1.0
     stream: Optional[bool] = False
+    # "interactive" (default) jumps ahead of "batch" jobs in the queue
+    priority: Optional[str] = "interactive"
+    # Seconds: drop the request if it hasn't finished by then
+    deadline: Optional[float] = None
+    # "no-cache" = always ask the provider, "no-store" = also don't cache the answer
+    cache_control: Optional[str] = None
+    # "auto" (rotate big threads), "new_chat" or "continue:<thread_id>"
+    thread: Optional[str] = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_driver()
+    pool.start_task = asyncio.create_task(pool.start())
+    pool.health_task = asyncio.create_task(pool.health_check_loop())
     yield
-    global driver
     print("\nShutting down gracefully...")
-    if driver is not None:
-        driver.quit()
+    pool.shutdown()
 
 app = FastAPI(lifespan=lifespan)
 
 @app.post("/v1/chat/completions")
-async def openai_mock_api(req: ChatCompletionRequest):
-    async with driver_lock:
-        try:
-            latest_msg = req.messages[-1]
-            content = latest_msg.content if isinstance(latest_msg.content, str) else str(latest_msg.content)
-            clean_prompt = content.strip()
-            
-            # ROUTING BASED ON MODEL NAME
-            if req.model == 'deepseek-scraper':
-                print(f"💅 Routing to DeepSeek tab...")
-                extracted_data = await send_and_extract_deepseek(clean_prompt, files=req.files)
-            elif req.model == 'perplexity-scraper':
-                print(f"💅 Routing to Perplexity tab...")
-                extracted_data = await send_and_extract_perplexity(clean_prompt, files=req.files)
-            else:
-                # Default to ChatGPT if 'gpt-scraper-mock' or anything else
-                print(f"💅 Routing to ChatGPT tab...")
-                extracted_data = await send_and_extract_chatgpt(clean_prompt, files=req.files)
-
-            return {
-                "id": f"chatcmpl-{uuid.uuid4().hex}",
-                "object": "chat.completion",
-                "created": int(time.time()),
-                "model": req.model,
-                "choices": [{
-                    "index": 0,
-                    "message": {
-                        "role": "assistant",
-                        "content": extracted_data["formatted_markdown"]
-                    },
-                    "finish_reason": "stop"
-                }]
-            }
-        except Exception as e:
-            print(f"❌ Server error: {e}")
-            raise HTTPException(status_code=500, detail=str(e))
+async def openai_mock_api(req: ChatCompletionRequest, request: Request, response: Response):
+    try:
+        latest_msg = req.messages[-1]
+        content = latest_msg.content if isinstance(latest_msg.content, str) else str(latest_msg.content)
+        clean_prompt = content.strip()
+        
+        # ROUTING BASED ON MODEL NAME
+        provider = provider_for_model(req.model)
+        if req.model in FAN_OUT_MODELS:
+            print(f"💅 {FAN_OUT_MODELS[req.model].capitalize()} across {', '.join(fan_out_providers())}...")
+        else:
+            print(f"💅 Routing to {provider} tab...")
+        job_options = {
+            "priority": req.priority,
+            "deadline": req.deadline,
+            "cache_control": req.cache_control or request.headers.get("cache-control"),
+            "thread": req.thread,
+        }
+        parse_thread_policy(req.thread)
+        if req.stream:
+            return StreamingResponse(openai_stream(req.model, provider, clean_prompt, req.files, **job_options), media_type="text/event-stream")
+        timer = RequestTimer(provider)
+        extracted_data = await run_for_client(request, answer_model(req.model, clean_prompt, files=req.files, timer=timer, **job_options))
+        if req.model not in FAN_OUT_MODELS:
+            add_timing_header(request, response, timer)
+
+        body = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.model,
+            "thread_id": extracted_data.get("thread_id"),
+            "choices": [{
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": extracted_data["formatted_markdown"]
+                },
+                "finish_reason": "stop"
+            }]
+        }
+        # Fan-out models: who won the race / every provider's answer
+        for key in ("provider", "answers"):
+            if key in extracted_data:
+                body[key] = extracted_data[key]
+        return body
+    except HTTPException:
+        raise
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"❌ Server error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def openai_chunk(completion_id: str, model: str, delta: dict, finish_reason: Optional[str] = None, answer: Optional[str] = None):
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    if answer is not None:
+        # Not in the OpenAI format (clients skip it): the whole formatted answer, for
+        # clients that stream for progress but want the exact stream=false text
+        chunk["answer"] = answer
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+async def openai_stream(model: str, provider: str, prompt_text: str, files: Optional[List[str]] = None, **job_options):
+    """SSE in OpenAI chat.completion.chunk format. The finish chunk also carries the
+    whole formatted answer (see openai_chunk)."""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    yield openai_chunk(completion_id, model, {"role": "assistant", "content": ""})
+    try:
+        if model in FAN_OUT_MODELS:
+            # Which answer is the one to send is only known at the end
+            result = await fan_out(FAN_OUT_MODELS[model], prompt_text, files=files, **job_options)
+            yield openai_chunk(completion_id, model, {"content": result["formatted_markdown"]})
+        else:
+            result = {}
+            async for piece in stream_dispatch(provider, prompt_text, files=files, answer=result, **job_options):
+                yield openai_chunk(completion_id, model, {"content": piece})
+        yield openai_chunk(completion_id, model, {}, finish_reason="stop", answer=result["formatted_markdown"])
+    except Exception as e:
+        print(f"❌ Stream error: {e}")
+        yield f"data: {json.dumps({'error': {'message': str(e), 'type': 'scraper_error'}})}\n\n"
+    yield "data: [DONE]\n\n"
 
 class Query(BaseModel):
     prompt: str
 
 @app.post("/ask")
-async def ask_api(query: Query):
-    async with driver_lock:
-        try:
-            return await send_and_extract_chatgpt(query.prompt)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-            
-# --- ✨ OLLAMA IMPERSONATION ROUTES (Kept for ChatGPT) ---
+async def ask_api(query: Query, request: Request, response: Response):
+    try:
+        timer = RequestTimer("chatgpt")
+        result = await run_for_client(request, dispatch("chatgpt", query.prompt, timer=timer))
+        add_timing_header(request, response, timer)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class BatchJob(BaseModel):
+    model: str
+    messages: List[ChatMessage]
+    files: Optional[List[str]] = None
+    # Echoed back so the client can match results, defaults to the job's index
+    id: Optional[str] = None
+    thread: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    jobs: List[BatchJob]
+    priority: Optional[str] = "batch"
+    # Seconds, per job
+    deadline: Optional[float] = None
+    cache_control: Optional[str] = None
+
+@app.post("/v1/batch")
+async def batch_api(req: BatchRequest, request: Request):
+    """Run many prompts at once. Every job goes into the queue right away, so they spread
+    over all matching tabs and browsers; results come back as NDJSON lines in the order
+    they finish, followed by a summary line."""
+    if req.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority '{req.priority}', use one of: {', '.join(PRIORITIES)}")
+    if not req.jobs:
+        raise HTTPException(status_code=400, detail="No jobs given.")
+    # Checked before the stream starts: once the 200 is out, a bad job could only break it
+    empty = [job.id or str(index) for index, job in enumerate(req.jobs) if not job.messages]
+    if empty:
+        raise HTTPException(status_code=422, detail=f"Jobs without messages: {', '.join(empty)}")
+    job_options = {
+        "priority": req.priority,
+        "deadline": req.deadline,
+        "cache_control": req.cache_control or request.headers.get("cache-control"),
+    }
+    print(f"📦 Batch of {len(req.jobs)} prompts queued.")
+    timing = bool(request.headers.get("x-scraper-timing"))
+    return StreamingResponse(batch_stream(req.jobs, job_options, timing), media_type="application/x-ndjson")
+
+async def batch_stream(jobs: List[BatchJob], job_options: dict, timing: bool = False):
+    start = time.time()
+    tasks = {}
+    for index, job in enumerate(jobs):
+        prompt_text = job.messages[-1].content.strip()
+        timer = RequestTimer(provider_for_model(job.model))
+        task = asyncio.create_task(answer_model(job.model, prompt_text, files=job.files, thread=job.thread, timer=timer, **job_options))
+        tasks[task] = (index, job, timer)
+
+    failed = 0
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, job, timer = tasks[task]
+                line = {"index": index, "id": job.id or str(index), "model": job.model}
+                try:
+                    result = task.result()
+                    line["content"] = result["formatted_markdown"]
+                    line["thread_id"] = result.get("thread_id")
+                    for key in ("provider", "answers"):
+                        if key in result:
+                            line[key] = result[key]
+                    line["status"] = "ok"
+                except Exception as e:
+                    failed += 1
+                    line["status"] = "expired" if isinstance(e, DeadlineExceeded) else "error"
+                    line["error"] = str(e)
+                if timing:
+                    line["timing"] = timer.to_dict()
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+    finally:
+        # Client went away: drop whatever is still queued or running
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    elapsed = time.time() - start
+    print(f"📦 Batch finished: {len(jobs) - failed}/{len(jobs)} ok in {elapsed:.1f}s.")
+    yield json.dumps({"done": True, "total": len(jobs), "ok": len(jobs) - failed, "failed": failed, "elapsed": round(elapsed, 3)}) + "\n"
+
+@app.get("/v1/queue")
+async def queue_api():
+    """Waiting / running / recently finished jobs, per provider queue depth."""
+    return job_queue.snapshot()
+
+@app.get("/v1/workers")
+async def workers_api():
+    """Browsers and their tabs: ready / logged in / running job."""
+    return pool.status()
+
+QUEUE_DEPTH = scraper_metrics.Gauge("scraper_queue_depth", "Jobs waiting for a tab.", ("model",))
+RUNNING_JOBS = scraper_metrics.Gauge("scraper_running_jobs", "Jobs running on a tab.", ("model",))
+TABS_READY = scraper_metrics.Gauge("scraper_tabs_ready", "Provider tabs that are ready and healthy.", ("model",))
+CACHE_EVENTS = scraper_metrics.Counter("scraper_cache_events_total", "Response cache lookups and writes.", ("event",))
+
+@app.get("/metrics")
+async def metrics_api():
+    """Prometheus text format."""
+    for provider in PROVIDER_URLS:
+        QUEUE_DEPTH.set(provider, value=job_queue.depth(provider))
+        RUNNING_JOBS.set(provider, value=sum(1 for job in job_queue.running.values() if job.provider == provider))
+        TABS_READY.set(provider, value=sum(1 for w in pool.workers if w.healthy and w.ready.get(provider)))
+    for event, count in response_cache.stats.items():
+        CACHE_EVENTS.set(event, value=count)
+    body = scraper_metrics.render([QUEUE_DEPTH, RUNNING_JOBS, TABS_READY, CACHE_EVENTS])
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/v1/waits")
+async def waits_api():
+    """What the condition waits learned: typical duration, poll schedule, timeouts."""
+    return waits.snapshot()
+
+@app.get("/v1/cache")
+async def cache_api():
+    return response_cache.info()
+
+@app.delete("/v1/cache")
+async def cache_clear_api():
+    response_cache.clear()
+    return response_cache.info()
+
+# ----------------- OLLAMA API -----------------
+# Ollama model name -> provider tab. Other names fall back to provider_for_model()
+OLLAMA_MODELS = {
+    "chatgpt-scraper:latest": "chatgpt",
+    "deepseek-scraper:latest": "deepseek",
+    "perplexity-scraper:latest": "perplexity",
+}
+OLLAMA_VERSION = "0.5.7"
+
+def ollama_model_name(model: str) -> str:
+    return model if ":" in model else f"{model}:latest"
+
+def ollama_provider(model: str) -> str:
+    return OLLAMA_MODELS.get(ollama_model_name(model)) or provider_for_model(model)
+
+def ollama_model_info(name: str):
+    """The fields /api/tags and /api/ps list per model."""
+    return {
+        "name": name,
+        "model": name,
+        "modified_at": datetime.now().isoformat(),
+        "size": 0,
+        "digest": hashlib.sha256(name.encode()).hexdigest(),
+        "details": {
+            "format": "browser",
+            "family": OLLAMA_MODELS[name],
+            "families": [OLLAMA_MODELS[name]],
+            "parameter_size": "unknown",
+            "quantization_level": "none"
+        }
+    }
+
+def served_ollama_models(ready_only: bool = False):
+    providers = fan_out_providers()
+    if ready_only:
+        providers = [p for p in providers if any(w.ready.get(p) for w in pool.workers)]
+    return [name for name, provider in OLLAMA_MODELS.items() if provider in providers]
+
+@app.get("/api/version")
+async def ollama_version():
+    return {"version": OLLAMA_VERSION}
+
 @app.get("/api/tags")
 async def ollama_tags():
+    """One model per provider tab the pool has."""
+    return {"models": [ollama_model_info(name) for name in served_ollama_models()]}
+
+@app.get("/api/ps")
+async def ollama_ps():
+    """'Loaded' models: providers with a ready tab right now."""
     return {
         "models": [
-            {
-                "name": "chatgpt-scraper:latest", 
-                "modified_at": datetime.now().isoformat(),
-                "size": 7000000000, 
-                "details": {
-                    "format": "gguf",
-                    "family": "custom",
-                    "parameter_size": "7B",
-                    "quantization_level": "Q4_0"
-                }
-            }
+            {**ollama_model_info(name), "expires_at": "2999-12-31T23:59:59Z", "size_vram": 0}
+            for name in served_ollama_models(ready_only=True)
         ]
     }
 
+class OllamaShowRequest(BaseModel):
+    model: Optional[str] = None
+    # Older clients send the model as "name"
+    name: Optional[str] = None
+
+@app.post("/api/show")
+async def ollama_show(req: OllamaShowRequest):
+    name = ollama_model_name(req.model or req.name or "")
+    if name not in served_ollama_models():
+        raise HTTPException(status_code=404, detail=f"model '{req.model or req.name}' not found")
+    provider = OLLAMA_MODELS[name]
+    info = ollama_model_info(name)
+    return {
+        "modelfile": f"# {PROVIDER_NAMES[provider]} in a browser tab, via ai_scraper\nFROM {name}\n",
+        "parameters": "",
+        "template": "{{ .Prompt }}",
+        "details": info["details"],
+        "model_info": {"general.architecture": provider, "general.basename": PROVIDER_NAMES[provider]},
+        "capabilities": ["completion"],
+        "modified_at": info["modified_at"],
+    }
+
 class OllamaMessage(BaseModel):
     role: str
     content: str
@@ -507,32 +1553,95 @@ class OllamaMessage(BaseModel):
 class OllamaChatRequest(BaseModel):
     model: str
     messages: List[OllamaMessage]
-    stream: Optional[bool] = False
-
-@app.post("/api/chat")
-async def ollama_chat(req: OllamaChatRequest):
-    async with driver_lock:
-        try:
-            latest_msg = req.messages[-1]
-            content = latest_msg.content if isinstance(latest_msg.content, str) else str(latest_msg.content)
-            clean_prompt = content.strip()
+    # Like Ollama: streams unless told otherwise
+    stream: Optional[bool] = True
 
-            print(f"🕵️‍♀️ Ollama Disguise: Forwarding to ChatGPT browser...")
-            extracted_data = await send_and_extract_chatgpt(clean_prompt)
+class OllamaGenerateRequest(BaseModel):
+    model: str
+    prompt: str = ""
+    system: Optional[str] = None
+    stream: Optional[bool] = True
+
+async def ollama_answer(request: Request, response: Response, model: str, prompt_text: str, kind: str):
+    """Shared by /api/chat and /api/generate; kind picks the response shape."""
+    provider = ollama_provider(model)
+    print(f"🕵️‍♀️ Ollama Disguise: Forwarding to {PROVIDER_NAMES[provider]} browser...")
+    start = time.perf_counter()
+    timer = RequestTimer(provider)
+    extracted_data = await run_for_client(request, dispatch(provider, prompt_text, timer=timer))
+    add_timing_header(request, response, timer)
+    return {
+        "model": model,
+        "created_at": datetime.now().isoformat(),
+        **ollama_content(kind, extracted_data["formatted_markdown"]),
+        "done": True,
+        "done_reason": "stop",
+        "total_duration": int((time.perf_counter() - start) * 1e9),
+    }
 
-            return {
-                "model": req.model,
+@app.post("/api/chat")
+async def ollama_chat(req: OllamaChatRequest, request: Request, response: Response):
+    try:
+        latest_msg = req.messages[-1]
+        content = latest_msg.content if isinstance(latest_msg.content, str) else str(latest_msg.content)
+        clean_prompt = content.strip()
+
+        if req.stream:
+            return StreamingResponse(ollama_stream(req.model, clean_prompt, "chat"), media_type="application/x-ndjson")
+        return await ollama_answer(request, response, req.model, clean_prompt, "chat")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Ollama endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/generate")
+async def ollama_generate(req: OllamaGenerateRequest, request: Request, response: Response):
+    clean_prompt = req.prompt.strip()
+    if not clean_prompt:
+        # Ollama answers an empty prompt by just loading the model
+        return {"model": req.model, "created_at": datetime.now().isoformat(), "response": "", "done": True, "done_reason": "load"}
+    if req.system:
+        clean_prompt = f"{req.system.strip()}\n\n{clean_prompt}"
+    try:
+        if req.stream:
+            return StreamingResponse(ollama_stream(req.model, clean_prompt, "generate"), media_type="application/x-ndjson")
+        return await ollama_answer(request, response, req.model, clean_prompt, "generate")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Ollama endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def ollama_content(kind: str, text: str):
+    if kind == "chat":
+        return {"message": {"role": "assistant", "content": text}}
+    return {"response": text}
+
+async def ollama_stream(model: str, prompt_text: str, kind: str):
+    """NDJSON in Ollama /api/chat or /api/generate format: one line per piece, then a done line."""
+    provider = ollama_provider(model)
+    print(f"🕵️‍♀️ Ollama Disguise: Streaming from {PROVIDER_NAMES[provider]} browser...")
+    start = time.perf_counter()
+    try:
+        async for piece in stream_dispatch(provider, prompt_text):
+            yield json.dumps({
+                "model": model,
                 "created_at": datetime.now().isoformat(),
-                "message": {
-                    "role": "assistant",
-                    "content": extracted_data["formatted_markdown"]
-                },
-                "done": True,
-                "done_reason": "stop"
-            }
-        except Exception as e:
-            print(f"Ollama endpoint error: {e}")
-            raise HTTPException(status_code=500, detail=str(e))
+                **ollama_content(kind, piece),
+                "done": False
+            }, ensure_ascii=False) + "\n"
+        yield json.dumps({
+            "model": model,
+            "created_at": datetime.now().isoformat(),
+            **ollama_content(kind, ""),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+        }) + "\n"
+    except Exception as e:
+        print(f"Ollama stream error: {e}")
+        yield json.dumps({"error": str(e)}) + "\n"
 
 if __name__ == "__main__":
     uvicorn.run("ai_scraper:app", host="0.0.0.0", port=8000, reload=False)
@@ -0,0 +1,95 @@
+"""
+Batch version of the auto_notes_worker in chatgpt.py.
+
+Sends the short + long version of every pending syntax to ai_scraper's
+/v1/batch in one call, so they run on all ChatGPT tabs at once instead of
+one after another with 10s sleeps, and writes each note as soon as its
+answer arrives. An item leaves pending_chatgpt.json once both notes are saved.
+
+Usage: python3 Selenium/auto_notes_batch.py   (ai_scraper.py must be running)
+"""
+import json
+import os
+import sys
+import urllib.request
+
+BATCH_URL = os.environ.get("SCRAPER_BATCH_URL", "http://localhost:8000/v1/batch")
+NOTES_DIR = "/home/mohit/Projects/notes"
+PENDING_JSON_PATH = os.path.join(NOTES_DIR, "pending_chatgpt.json")
+
+# Same instructions the worker sends as its first message. The jobs can land on any tab,
+# so every prompt carries them instead of relying on the chat history.
+MASTER_PROMPT = (
+    "Act as a strict technical syntax explainer. Don't use custom instructions, follow what I am saying exactly. "
+    "I will send queries in the format 'language concept length' (e.g., 'javascript console.log short'). "
+    "If length is 'short', provide the standard syntax structure telling how to use each inside property under 10 lines, and a concise explanation. "
+    "If length is 'long', provide extensive code snippets showing use-cases, industry do's/dont's, and deep logic."
+    "Separate all code blocks properly using standard markdown formatting."
+    "Alway write output of code, always, give flowchart if necessary only in long type explanations"
+)
+LENGTHS = ["short", "long"]
+
+def build_jobs(pending_words):
+    return [
+        {
+            "id": f"{length}:{item}",
+            "model": "gpt-scraper-mock",
+            "messages": [{"role": "user", "content": f"{MASTER_PROMPT}\n\n{item} {length}"}],
+        }
+        for item in pending_words
+        for length in LENGTHS
+    ]
+
+def save_note(item, length, markdown):
+    parts = item.split(" ")
+    lang = parts[0]
+    concept = " ".join(parts[1:])
+    with open(os.path.join(NOTES_DIR, f"{lang}-{length}.md"), "a", encoding="utf-8") as f:
+        f.write(f"@de {concept}\n{markdown}\n")
+    print(f"[Bot] ✨ Saved {length.upper()} note for '{concept}'")
+
+def main():
+    if not os.path.exists(PENDING_JSON_PATH):
+        print("[Bot] No pending file, nothing to do.")
+        return
+    with open(PENDING_JSON_PATH, "r") as f:
+        pending_words = json.load(f)
+    if not pending_words:
+        print("[Bot] Nothing pending.")
+        return
+
+    print(f"[Bot] Sending {len(pending_words)} pending syntaxes ({len(pending_words) * 2} prompts) as one batch...")
+    payload = {"jobs": build_jobs(pending_words), "priority": "batch"}
+    req = urllib.request.Request(
+        BATCH_URL,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+
+    saved = {item: set() for item in pending_words}
+    with urllib.request.urlopen(req) as response:
+        for raw in response:
+            line = json.loads(raw)
+            if line.get("done"):
+                print(f"[Bot] Batch done: {line['ok']}/{line['total']} ok in {line['elapsed']:.0f}s")
+                break
+            length, item = line["id"].split(":", 1)
+            if line["status"] != "ok":
+                print(f"[Bot] Failed {length.upper()} extraction for {item}: {line.get('error')}")
+                continue
+            save_note(item, length, line["content"])
+            saved[item].add(length)
+
+            # Both versions saved, drop it from the pending list right away
+            if saved[item] == set(LENGTHS):
+                pending_words.remove(item)
+                with open(PENDING_JSON_PATH, "w") as f:
+                    json.dump(pending_words, f, indent=2)
+
+    if pending_words:
+        print(f"[Bot] {len(pending_words)} syntaxes still pending, run again to retry.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+End-to-end throughput benchmark, fully offline.
+
+Serves the fake provider pages, starts the real ai_scraper FastAPI app on a
+free local port (headless Chrome, pointed at the fake pages) and fires
+--requests chat completions at it from --concurrency clients. Reports p50/p95
+latency, throughput, WebDriver calls per request (from /metrics) and, with
+--stream, time to the first content chunk. Every answer is checked against
+the prompt it was sent for.
+
+Every provider also gets one prompt with stream=false and the same prompt with
+stream=true, on /v1/chat/completions and on Ollama's /api/chat; the streamed
+pieces have to add up to exactly the non-stream answer
+(the fake answers have a bullet list and --code code blocks, so fences, list
+markers and code-header labels are covered).
+
+When a provider has a tab on two or more workers (e.g. --workers chatgpt,chatgpt)
+it also checks that two concurrent prompts on different workers overlap: the
+pair has to finish in well under twice the time of one prompt alone, and the
+API has to keep answering while they run (no WebDriver call may hold the
+event loop).
+
+Exits non-zero if any request failed, a streamed answer differed or the overlap check failed, so it can gate CI.
+
+Nothing is downloaded if --chromedriver (and --chrome) point at local binaries
+(or SCRAPER_CHROMEDRIVER / SCRAPER_CHROME are set); without them
+undetected_chromedriver fetches a driver matching the installed Chrome.
+
+Usage: python3 Selenium/bench/bench_e2e.py [--requests 30] [--concurrency 3] [--stream]
+       [--workers chatgpt+deepseek+perplexity,chatgpt] [--code 2] [--list 3] [--json results.json]
+       [--chromedriver /path/to/chromedriver] [--chrome /path/to/chrome] [--chrome-args "--no-sandbox"]
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+
+from bench_tabs import load_scraper, serve_fake_pages
+from bench_threads import percentile
+
+MODELS = {"chatgpt": "gpt-scraper-mock", "deepseek": "deepseek-scraper", "perplexity": "perplexity-scraper"}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def start_app(scraper, port, timeout=180):
+    """Run the app with uvicorn in a thread and wait until every tab is ready."""
+    server = uvicorn.Server(uvicorn.Config(scraper.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    start = time.time()
+    while time.time() - start < timeout:
+        if server.started:
+            tabs = [tab for worker in get_json(f"http://127.0.0.1:{port}/v1/workers") for tab in worker["tabs"].values()]
+            if tabs and all(tab["ready"] for tab in tabs):
+                print(f"✅ App ready in {time.time() - start:.1f}s")
+                return server, thread
+        time.sleep(0.2)
+    server.should_exit = True
+    raise RuntimeError(f"App not ready after {timeout}s")
+
+
+def webdriver_calls(base):
+    """(sum, count) of scraper_webdriver_calls_per_request over all models."""
+    total = count = 0
+    with urllib.request.urlopen(f"{base}/metrics", timeout=10) as response:
+        for line in response.read().decode().splitlines():
+            if line.startswith("scraper_webdriver_calls_per_request_sum"):
+                total += float(line.rsplit(" ", 1)[1])
+            elif line.startswith("scraper_webdriver_calls_per_request_count"):
+                count += int(line.rsplit(" ", 1)[1])
+    return total, count
+
+
+def stream_mismatches(base):
+    """scraper_stream_mismatches_total over all models."""
+    with urllib.request.urlopen(f"{base}/metrics", timeout=10) as response:
+        return sum(float(line.rsplit(" ", 1)[1]) for line in response.read().decode().splitlines()
+                   if line.startswith("scraper_stream_mismatches_total"))
+
+
+def ask(base, model, prompt, stream):
+    """One chat completion. Returns (answer, seconds, seconds to first chunk or None)."""
+    payload = {"model": model, "messages": [{"role": "user", "content": prompt}], "stream": stream}
+    request = urllib.request.Request(
+        f"{base}/v1/chat/completions", data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    start = time.perf_counter()
+    first_chunk = None
+    with urllib.request.urlopen(request, timeout=300) as response:
+        if not stream:
+            answer = json.loads(response.read())["choices"][0]["message"]["content"]
+        else:
+            answer = ""
+            for raw in response:
+                line = raw.decode().strip()
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                chunk = json.loads(line[len("data: "):])
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"]["message"])
+                piece = chunk["choices"][0]["delta"].get("content")
+                if piece:
+                    first_chunk = first_chunk or time.perf_counter() - start
+                    answer += piece
+    return answer, time.perf_counter() - start, first_chunk
+
+
+def run_load(base, providers, requests, concurrency, stream):
+    def one(i):
+        provider = providers[i % len(providers)]
+        prompt = f"e2e request {i} for {provider}"
+        try:
+            answer, seconds, first_chunk = ask(base, MODELS[provider], prompt, stream)
+        except Exception as e:
+            return {"provider": provider, "error": str(e)}
+        if f"Answer to: {prompt}" not in answer:
+            return {"provider": provider, "error": f"wrong answer: {answer[:80]!r}"}
+        return {"provider": provider, "seconds": seconds, "first_chunk": first_chunk}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    return results, time.perf_counter() - start
+
+
+def ask_ollama(base, provider, prompt, stream):
+    """One Ollama /api/chat call, returns the answer text."""
+    payload = {"model": f"{provider}-scraper", "messages": [{"role": "user", "content": prompt}], "stream": stream}
+    request = urllib.request.Request(
+        f"{base}/api/chat", data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}, method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=300) as response:
+        if not stream:
+            return json.loads(response.read())["message"]["content"]
+        answer = ""
+        for raw in response:
+            line = json.loads(raw)
+            if "error" in line:
+                raise RuntimeError(line["error"])
+            answer += line["message"]["content"]
+        return answer
+
+
+def check_stream_matches(base, providers):
+    """Same prompt with stream=false and stream=true per provider and API -> {"api provider": error or None}"""
+    apis = {
+        "openai": lambda provider, prompt, stream: ask(base, MODELS[provider], prompt, stream)[0],
+        "ollama": lambda provider, prompt, stream: ask_ollama(base, provider, prompt, stream),
+    }
+    mismatches = {}
+    for api, call in apis.items():
+        for provider in providers:
+            prompt = f"{api} stream vs non-stream for {provider}"
+            whole = call(provider, prompt, False)
+            streamed = call(provider, prompt, True)
+            problem = None
+            if streamed != whole:
+                common = len(os.path.commonprefix([whole, streamed]))
+                problem = f"differs at char {common}: stream {streamed[common:common + 40]!r}, non-stream {whole[common:common + 40]!r}"
+            mismatches[f"{api} {provider}"] = problem
+    return mismatches
+
+
+def check_overlap(base, provider, stream, max_stall=0.5):
+    """One prompt alone, then two at once. With the browsers really running in parallel
+    the pair takes about as long as one, if they're serialized it takes twice as long.
+    Meanwhile /v1/queue is polled: its slowest answer is how long the event loop stalled."""
+    _, alone, _ = ask(base, MODELS[provider], f"overlap solo for {provider}", stream)
+    done = threading.Event()
+    stalls = [0.0]
+
+    def poll_api():
+        while not done.is_set():
+            start = time.perf_counter()
+            get_json(f"{base}/v1/queue")
+            stalls.append(time.perf_counter() - start)
+            time.sleep(0.05)
+
+    poller = threading.Thread(target=poll_api, daemon=True)
+    poller.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(lambda i: ask(base, MODELS[provider], f"overlap pair {i} for {provider}", stream), range(2)))
+    pair = time.perf_counter() - start
+    done.set()
+    poller.join()
+    stall = max(stalls)
+    return {"provider": provider, "alone": round(alone, 3), "pair": round(pair, 3), "ratio": round(pair / alone, 2),
+            "api_stall": round(stall, 3), "ok": pair < 1.5 * alone and stall < max_stall}
+
+
+def summarize(results, wall, calls):
+    ok = [r for r in results if "seconds" in r]
+    latencies = [r["seconds"] for r in ok]
+    first_chunks = [r["first_chunk"] for r in ok if r["first_chunk"] is not None]
+    summary = {
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": [r["error"] for r in results if "error" in r],
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 3) if wall else None,
+        "p50": round(percentile(latencies, 0.5), 3) if latencies else None,
+        "p95": round(percentile(latencies, 0.95), 3) if latencies else None,
+        "first_chunk_p50": round(percentile(first_chunks, 0.5), 3) if first_chunks else None,
+        "webdriver_calls_per_request": round(calls, 1) if calls is not None else None,
+        "per_provider": {},
+    }
+    for provider in sorted({r["provider"] for r in ok}):
+        mine = [r["seconds"] for r in ok if r["provider"] == provider]
+        summary["per_provider"][provider] = {
+            "requests": len(mine), "p50": round(percentile(mine, 0.5), 3), "p95": round(percentile(mine, 0.95), 3),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--stream", action="store_true", help="use stream=true (SSE)")
+    parser.add_argument("--workers", default="chatgpt+deepseek+perplexity", help="SCRAPER_WORKERS for the app")
+    parser.add_argument("--interval", type=int, default=20, help="ms between streamed chunks")
+    parser.add_argument("--chunk", type=int, default=16, help="chars per streamed chunk")
+    parser.add_argument("--length", type=int, default=200, help="first paragraph length in chars")
+    parser.add_argument("--code", type=int, default=1, help="code blocks per answer")
+    parser.add_argument("--list", type=int, default=3, help="bullet list items per answer")
+    parser.add_argument("--json", help="also write the summary to this file")
+    parser.add_argument("--chromedriver", default=os.environ.get("SCRAPER_CHROMEDRIVER"), help="local chromedriver binary")
+    parser.add_argument("--chrome", default=os.environ.get("SCRAPER_CHROME"), help="local Chrome binary")
+    parser.add_argument("--chrome-args", default=os.environ.get("SCRAPER_CHROME_ARGS"), help="extra Chrome flags")
+    args = parser.parse_args()
+
+    os.environ["SCRAPER_WORKERS"] = args.workers
+    # Read by ai_scraper at import
+    if args.chromedriver:
+        os.environ["SCRAPER_CHROMEDRIVER"] = args.chromedriver
+    if args.chrome:
+        os.environ["SCRAPER_CHROME"] = args.chrome
+    if args.chrome_args:
+        os.environ["SCRAPER_CHROME_ARGS"] = args.chrome_args
+    providers = list(dict.fromkeys(p for spec in args.workers.split(",") for p in spec.split("+") if p in MODELS))
+    pages = serve_fake_pages()
+    scraper = load_scraper(pages, f"interval={args.interval}&chunk={args.chunk}&length={args.length}&code={args.code}&list={args.list}")
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    server, thread = start_app(scraper, port)
+    try:
+        calls_before = webdriver_calls(base)
+        results, wall = run_load(base, providers, args.requests, args.concurrency, args.stream)
+        calls_after = webdriver_calls(base)
+        mismatched = stream_mismatches(base)
+        stream_matches = check_stream_matches(base, providers)
+        # A provider served by two or more browsers
+        specs = [[p for p in spec.split("+") if p in MODELS] for spec in args.workers.split(",")]
+        shared = [p for p in providers if sum(p in spec for spec in specs) >= 2]
+        overlap = check_overlap(base, shared[0], args.stream) if shared else None
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+
+    counted = calls_after[1] - calls_before[1]
+    calls = (calls_after[0] - calls_before[0]) / counted if counted else None
+    summary = summarize(results, wall, calls)
+    summary["overlap"] = overlap
+    summary["stream_matches"] = stream_matches
+    summary["stream_mismatches"] = int(mismatched)
+
+    print(f"\n{summary['ok']}/{summary['requests']} ok, {args.concurrency} clients, "
+          f"{'stream' if args.stream else 'non-stream'}, workers={args.workers}")
+    print(f"  throughput   : {summary['throughput_rps']} req/s ({summary['wall_seconds']}s wall)")
+    print(f"  latency      : p50 {summary['p50']}s  p95 {summary['p95']}s")
+    if args.stream:
+        print(f"  first chunk  : p50 {summary['first_chunk_p50']}s")
+    print(f"  webdriver    : {summary['webdriver_calls_per_request']} calls/request")
+    for provider, stats in summary["per_provider"].items():
+        print(f"  {provider:<12} : {stats['requests']} requests, p50 {stats['p50']}s  p95 {stats['p95']}s")
+    if args.stream:
+        print(f"  mismatches   : {summary['stream_mismatches']} streamed answers differed from the extracted one")
+    for provider, problem in stream_matches.items():
+        print(f"  stream=true  : {provider:<18} {'❌ ' + problem if problem else '✅ same text as stream=false'}")
+    if overlap:
+        print(f"  overlap      : 2 {overlap['provider']} prompts on 2 workers {overlap['pair']}s, "
+              f"1 alone {overlap['alone']}s (x{overlap['ratio']}), API stalled at most {overlap['api_stall']}s "
+              f"{'✅' if overlap['ok'] else '❌'}")
+    for error in summary["errors"][:5]:
+        print(f"  ❌ {error}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    failed = summary["errors"] or mismatched or any(stream_matches.values()) or (overlap and not overlap["ok"])
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
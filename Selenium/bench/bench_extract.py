@@ -0,0 +1,102 @@
+"""
+Extraction benchmark on saved answer snapshots.
+
+Loads every bench/snapshots/chatgpt*.html and deepseek*.html page (save a real
+answer page there to add your own) and runs both extractors on it:
+  - elements: the per-element find_elements / .text walk
+  - in-page:  one execute_script (scraper_js.EXTRACT_*_JS)
+Prints WebDriver round trips and time per extraction and checks that both
+return exactly the same dict.
+
+Usage: python3 Selenium/bench/bench_extract.py [--repeat 5]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOTS_DIR = os.path.join(BENCH_DIR, "snapshots")
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import undetected_chromedriver as uc
+from selenium.webdriver.common.by import By
+import ai_scraper
+
+
+def count_calls(driver):
+    """Every WebDriver command (driver and element methods) goes through driver.execute."""
+    counter = {"calls": 0}
+    original = driver.execute
+
+    def execute(driver_command, params=None):
+        counter["calls"] += 1
+        return original(driver_command, params)
+
+    driver.execute = execute
+    return counter
+
+
+def extractors(driver, provider):
+    if provider == "chatgpt":
+        return (
+            lambda: ai_scraper.extract_chatgpt_message_by_elements(driver),
+            lambda: ai_scraper.extract_chatgpt_message(driver),
+        )
+    container = driver.find_element(By.CSS_SELECTOR, "div.ds-markdown")
+    return (
+        lambda: ai_scraper.extract_deepseek_message_by_elements(container),
+        lambda: ai_scraper.extract_deepseek_message(driver, container),
+    )
+
+
+def measure(fn, counter, repeat):
+    result = None
+    start_calls = counter["calls"]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    return result, (counter["calls"] - start_calls) / repeat, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    options = uc.ChromeOptions()
+    options.add_argument("--headless=new")
+    for arg in ai_scraper.CHROME_ARGS:
+        options.add_argument(arg)
+    # Same local binaries as the scraper (SCRAPER_CHROMEDRIVER / SCRAPER_CHROME), if set
+    driver = uc.Chrome(options=options, driver_executable_path=ai_scraper.CHROMEDRIVER_PATH,
+                       browser_executable_path=ai_scraper.CHROME_PATH)
+    counter = count_calls(driver)
+
+    print(f"{'snapshot':<28}{'extractor':<10}{'calls':>8}{'ms':>10}")
+    try:
+        for path in sorted(glob.glob(os.path.join(SNAPSHOTS_DIR, "*.html"))):
+            name = os.path.basename(path)
+            provider = "chatgpt" if name.startswith("chatgpt") else "deepseek" if name.startswith("deepseek") else None
+            if provider is None:
+                continue
+            driver.get(f"file://{path}")
+            by_elements, in_page = extractors(driver, provider)
+
+            old, old_calls, old_time = measure(by_elements, counter, args.repeat)
+            new, new_calls, new_time = measure(in_page, counter, args.repeat)
+            print(f"{name:<28}{'elements':<10}{old_calls:>8.0f}{old_time * 1000:>10.1f}")
+            print(f"{'':<28}{'in-page':<10}{new_calls:>8.0f}{new_time * 1000:>10.1f}"
+                  f"   {old_time / new_time:.0f}x faster, output {'identical' if old == new else 'DIFFERENT'}")
+            if old != new:
+                for key in old:
+                    if old[key] != new.get(key):
+                        print(f"    {key!r} differs:\n      elements: {old[key]!r:.200}\n      in-page:  {new.get(key)!r:.200}")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Per-request overhead benchmark on short answers.
+
+Sends --prompts short prompts to each fake provider page one after another and
+splits every request into generation (mount + generate, what the page itself
+takes) and overhead (everything else: waiting for the editor, typing,
+waiting for send, extraction...), using the request's phase timer. The fixed
+sleeps the condition waits replaced are printed next to it for comparison.
+
+Usage: python3 Selenium/bench/bench_overhead.py [--prompts 20] [--files 0]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+from collections import defaultdict
+
+from bench_tabs import PROVIDERS, load_scraper, serve_fake_pages
+
+# Seconds of asyncio.sleep per request in send_and_extract_* before the condition waits
+# (ChatGPT: 1 + 1 + 2, plus 1.5 per file and 2 after uploading)
+FIXED_SLEEPS = {"chatgpt": 4.0, "deepseek": 0.5, "perplexity": 2.0}
+FIXED_SLEEPS_PER_FILE = 1.5
+FIXED_SLEEPS_AFTER_UPLOAD = 2.0
+
+
+async def run(scraper, provider, prompts, files):
+    timers = []
+    for i in range(prompts):
+        timer = scraper.RequestTimer(provider)
+        await scraper.dispatch(
+            provider, f"short {provider} prompt {i}", files=files if provider == "chatgpt" else None,
+            timer=timer, thread="new_chat" if i % 20 == 0 else None,
+        )
+        timers.append(timer)
+    return timers
+
+
+async def bench(scraper, prompts, files):
+    await scraper.pool.start()
+    await scraper.pool.wait_ready()
+    return {provider: await run(scraper, provider, prompts, files) for provider in PROVIDERS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=20)
+    parser.add_argument("--files", type=int, default=0, help="files uploaded with every ChatGPT prompt")
+    parser.add_argument("--upload", type=int, default=300, help="ms a fake upload takes")
+    args = parser.parse_args()
+
+    files = []
+    for i in range(args.files):
+        handle, path = tempfile.mkstemp(prefix=f"bench-upload-{i}-", suffix=".txt")
+        os.write(handle, b"bench upload\n")
+        os.close(handle)
+        files.append(path)
+
+    base_url = serve_fake_pages()
+    scraper = load_scraper(base_url, f"interval=10&chunk=8&length=40&upload={args.upload}")
+    try:
+        results = asyncio.run(bench(scraper, args.prompts, files))
+    finally:
+        scraper.pool.shutdown()
+        for path in files:
+            os.remove(path)
+
+    print(f"\n{args.prompts} short prompts per provider ({args.files} file(s) per ChatGPT prompt)")
+    print(f"{'provider':<12}{'total':>8}{'generation':>12}{'overhead':>10}{'old sleeps':>12}   (s, mean)")
+    for provider, timers in results.items():
+        n = len(timers)
+        total = sum(t.total for t in timers) / n
+        generation = sum(t.phases.get("mount", 0) + t.phases.get("generate", 0) for t in timers) / n
+        old = FIXED_SLEEPS[provider]
+        if provider == "chatgpt" and files:
+            old += FIXED_SLEEPS_PER_FILE * len(files) + FIXED_SLEEPS_AFTER_UPLOAD
+        print(f"{provider:<12}{total:>8.3f}{generation:>12.3f}{total - generation:>10.3f}{old:>12.1f}")
+
+        phases = defaultdict(float)
+        for timer in timers:
+            for name, seconds in timer.phases.items():
+                phases[name] += seconds / n
+        print("    " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in sorted(phases.items(), key=lambda p: -p[1])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Tab concurrency benchmark.
+
+Serves the fake provider pages from bench/fake_pages, points ai_scraper at them
+and sends one prompt to each of ChatGPT, DeepSeek and Perplexity:
+  - serial:      one after another (what the old global driver_lock did)
+  - interleaved: all three at once through ai_scraper.dispatch()
+
+Usage: python3 Selenium/bench/bench_tabs.py [--rounds 3] [--interval 50] [--length 400]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(BENCH_DIR, "fake_pages")
+PROVIDERS = ["chatgpt", "deepseek", "perplexity"]
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def translate_path(self, path):
+        # /chatgpt/ and its thread URLs (/chatgpt/c/<id>, ...) all serve chatgpt.html
+        first = urlsplit(path).path.strip("/").split("/")[0]
+        if first in PROVIDERS:
+            return os.path.join(PAGES_DIR, f"{first}.html")
+        return super().translate_path(path)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_fake_pages(port=0):
+    """Start a static server for the fake pages in a daemon thread, return the base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), partial(QuietHandler, directory=PAGES_DIR))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def load_scraper(base_url, query):
+    for provider in PROVIDERS:
+        os.environ[f"SCRAPER_{provider.upper()}_URL"] = f"{base_url}/{provider}/?{query}"
+    os.environ.setdefault("SCRAPER_PROFILE_DIR", tempfile.mkdtemp(prefix="scraper-bench-"))
+    os.environ.setdefault("SCRAPER_HEADLESS", "1")
+    os.environ.setdefault("SCRAPER_CACHE_TTL", "0")  # measure the tabs, not the cache
+    sys.path.insert(0, os.path.dirname(BENCH_DIR))
+    import ai_scraper
+    return ai_scraper
+
+
+async def run_serial(scraper, round_no):
+    start = time.perf_counter()
+    for provider in PROVIDERS:
+        await scraper.dispatch(provider, f"serial round {round_no} for {provider}")
+    return time.perf_counter() - start
+
+
+async def run_interleaved(scraper, round_no):
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        scraper.dispatch(provider, f"interleaved round {round_no} for {provider}")
+        for provider in PROVIDERS
+    ))
+    return time.perf_counter() - start
+
+
+async def bench(scraper, rounds):
+    await scraper.pool.start()
+    await scraper.pool.wait_ready()
+    serial, interleaved = [], []
+    for round_no in range(rounds):
+        serial.append(await run_serial(scraper, round_no))
+        interleaved.append(await run_interleaved(scraper, round_no))
+    return serial, interleaved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--interval", type=int, default=50, help="ms between streamed chunks")
+    parser.add_argument("--length", type=int, default=400, help="answer length in chars")
+    args = parser.parse_args()
+
+    base_url = serve_fake_pages()
+    scraper = load_scraper(base_url, f"interval={args.interval}&length={args.length}")
+    try:
+        serial, interleaved = asyncio.run(bench(scraper, args.rounds))
+    finally:
+        scraper.pool.shutdown()
+
+    avg_serial = sum(serial) / len(serial)
+    avg_interleaved = sum(interleaved) / len(interleaved)
+    print(f"\n3 prompts x {args.rounds} rounds (interval={args.interval}ms, length={args.length})")
+    print(f"  serial      : {avg_serial:6.2f}s per round  {[round(t, 2) for t in serial]}")
+    print(f"  interleaved : {avg_interleaved:6.2f}s per round  {[round(t, 2) for t in interleaved]}")
+    print(f"  speedup     : {avg_serial / avg_interleaved:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Thread rotation benchmark.
+
+Sends the same long run of sequential prompts to one fake provider tab twice:
+  - grow:   everything goes into one thread, the DOM keeps growing
+  - rotate: the default 'auto' thread policy, a fresh chat every --max-answers
+Prints the average / p95 latency per bucket of prompts, so you can see whether
+it stays flat. --nodes adds elements per answer like the buttons and toolbars
+of a real thread.
+
+--provider picks the tab. None of the provider paths waits on fixed sleeps
+any more, so any of them shows the difference.
+
+Usage: python3 Selenium/bench/bench_threads.py [--prompts 500] [--provider deepseek] [--nodes 300]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from bench_tabs import load_scraper, serve_fake_pages
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run(scraper, provider, prompts, label):
+    worker = scraper.pool.workers[0]
+    await scraper.open_page(worker, provider, scraper.PROVIDER_URLS[provider])
+    latencies = []
+    for i in range(prompts):
+        start = time.perf_counter()
+        await scraper.dispatch(provider, f"{label} prompt {i}")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def bench(scraper, args):
+    await scraper.pool.start()
+    await scraper.pool.wait_ready()
+    scraper.THREAD_MAX_ANSWERS, scraper.THREAD_MAX_NODES = 0, 0
+    grow = await run(scraper, args.provider, args.prompts, "grow")
+    scraper.THREAD_MAX_ANSWERS = args.max_answers
+    rotate = await run(scraper, args.provider, args.prompts, "rotate")
+    return grow, rotate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=500)
+    parser.add_argument("--provider", default="deepseek", choices=["chatgpt", "deepseek", "perplexity"])
+    parser.add_argument("--max-answers", type=int, default=25, help="rotate after this many answers")
+    parser.add_argument("--nodes", type=int, default=300, help="extra elements per answer")
+    parser.add_argument("--interval", type=int, default=5, help="ms between streamed chunks")
+    parser.add_argument("--length", type=int, default=300, help="answer length in chars")
+    parser.add_argument("--bucket", type=int, default=50, help="prompts per row of the report")
+    args = parser.parse_args()
+
+    os.environ["SCRAPER_WORKERS"] = args.provider
+    base_url = serve_fake_pages()
+    scraper = load_scraper(base_url, f"interval={args.interval}&chunk=50&length={args.length}&nodes={args.nodes}")
+    try:
+        grow, rotate = asyncio.run(bench(scraper, args))
+    finally:
+        scraper.pool.shutdown()
+
+    print(f"\n{args.prompts} sequential {args.provider} prompts, {args.nodes} extra elements per answer")
+    print(f"{'prompts':<12}{'grow avg':>10}{'p95':>8}{'rotate avg':>12}{'p95':>8}   (ms)")
+    for start in range(0, args.prompts, args.bucket):
+        g, r = grow[start:start + args.bucket], rotate[start:start + args.bucket]
+        print(f"{start:>4}-{start + len(g) - 1:<7}"
+              f"{sum(g) / len(g) * 1000:>10.0f}{percentile(g, 0.95) * 1000:>8.0f}"
+              f"{sum(r) / len(r) * 1000:>12.0f}{percentile(r, 0.95) * 1000:>8.0f}")
+    first, last = slice(0, args.bucket), slice(-args.bucket, None)
+    for label, latencies in (("grow", grow), ("rotate", rotate)):
+        ratio = (sum(latencies[last]) / len(latencies[last])) / (sum(latencies[first]) / len(latencies[first]))
+        print(f"  {label:<7}: last bucket is {ratio:.2f}x the first")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+// Shared by the fake provider pages: streams a canned answer into the page
+// at the speed given in the query string
+// (?interval=ms&chunk=chars&length=chars&code=blocks&list=items&nodes=n&upload=ms).
+// The settings are kept in sessionStorage, so thread URLs (/chatgpt/c/<id>) without
+// a query string load with the same ones.
+(function () {
+  let params = new URLSearchParams(location.search);
+  if (params.toString()) sessionStorage.setItem("fakeStream", params.toString());
+  else params = new URLSearchParams(sessionStorage.getItem("fakeStream") || "");
+  const FILLER = "lorem ipsum dolor sit amet consectetur adipiscing elit ";
+
+  window.FakeStream = {
+    interval: Number(params.get("interval") || 50),
+    chunk: Number(params.get("chunk") || 8),
+    length: Number(params.get("length") || 400),
+    // Code blocks after the first paragraph, each followed by another paragraph
+    code: Number(params.get("code") || 0),
+    // Items of a bullet list right after the first paragraph (0 = no list)
+    list: Number(params.get("list") || 0),
+    // Extra elements per answer (buttons, toolbars...), so the DOM grows like a real thread
+    nodes: Number(params.get("nodes") || 0),
+    // ms a file upload takes (fake ChatGPT only)
+    upload: Number(params.get("upload") || 500),
+
+    answer(prompt) {
+      let text = `Answer to: ${prompt.trim()}. `;
+      while (text.length < this.length) text += FILLER;
+      return text.slice(0, Math.max(this.length, prompt.length + 12));
+    },
+
+    // [{type: "p" | "list" | "code", lang, text}], the first paragraph is answer(prompt).
+    // A list's text has one item per line.
+    blocks(prompt) {
+      const blocks = [{ type: "p", text: this.answer(prompt) }];
+      if (this.list) {
+        const items = Array.from({ length: this.list }, (_, i) => `item ${i + 1} of the list`);
+        blocks.push({ type: "list", text: items.join("\n") });
+      }
+      const langs = ["python", "javascript", "bash"];
+      for (let i = 0; i < this.code; i++) {
+        const lang = langs[i % langs.length];
+        blocks.push({ type: "code", lang, text: `def block_${i}(x):\n    return x * ${i}  # ${lang}` });
+        blocks.push({ type: "p", text: `Step ${i + 1}: the scraper walks every block of the answer.` });
+      }
+      return blocks;
+    },
+
+    // Streams the blocks one after another. make(block) adds the block's element
+    // to the page and returns a function that sets its text.
+    streamBlocks(blocks, make, onDone) {
+      const next = (i) => {
+        if (i >= blocks.length) return onDone();
+        const setText = make(blocks[i]);
+        this.stream(blocks[i].text, setText, () => next(i + 1));
+      };
+      next(0);
+    },
+
+    // After the first answer the URL becomes the thread's, e.g. /chatgpt/ -> /chatgpt/c/<id>
+    enterThread(segment) {
+      if (location.pathname.includes("/" + segment)) return;
+      const id = Math.random().toString(36).slice(2, 10);
+      history.replaceState(null, "", location.pathname.replace(/[^/]*$/, "") + segment + id);
+    },
+
+    pad(thread) {
+      if (!this.nodes) return;
+      const toolbar = document.createElement("div");
+      toolbar.className = "fake-toolbar";
+      toolbar.innerHTML = "<span></span>".repeat(this.nodes);
+      thread.appendChild(toolbar);
+    },
+
+    // Renders a streamed list text into ul: one li per line
+    setItems(ul, text) {
+      ul.textContent = "";
+      for (const line of text.split("\n")) ul.appendChild(document.createElement("li")).textContent = line;
+    },
+
+    stream(text, onChunk, onDone) {
+      let pos = 0;
+      const timer = setInterval(() => {
+        pos = Math.min(text.length, pos + this.chunk);
+        onChunk(text.slice(0, pos));
+        if (pos >= text.length) {
+          clearInterval(timer);
+          onDone();
+        }
+      }, this.interval);
+    },
+  };
+})();
@@ -0,0 +1,338 @@
+"""
+Shared MCP stdio server for chatgpt_mcp.py, deepseek_mcp.py and perplexity_mcp.py.
+
+JSON-RPC messages are read from stdin on an asyncio loop. Every tools/call runs
+as its own task, so several calls can be in flight at once and each response is
+written as soon as it is ready (in whatever order, matched by id). A
+notifications/cancelled for a running call aborts its HTTP request; the
+scraper sees the client disconnect and drops the job. Requests reuse
+keep-alive connections to the scraper from a small pool instead of opening a
+new TCP connection per call.
+
+When a call carries a progressToken, the answer is streamed from the scraper
+and the partial text goes out as notifications/progress while it grows.
+"""
+import asyncio
+import http.client
+import json
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+PROTOCOL_VERSION = "2024-11-05"
+# Longest JSON-RPC line we accept on stdin (prompts can be big)
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to the scraper. Blocking, used from worker threads."""
+
+    def __init__(self, url: str, size: int = 8, timeout: float = 300):
+        parts = urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.host = parts.netloc
+        self.path = parts.path or "/"
+        self.size = size
+        self.timeout = timeout
+        self.idle = []
+
+    def get(self):
+        try:
+            return self.idle.pop(), True
+        except IndexError:
+            return self.connection_class(self.host, timeout=self.timeout), False
+
+    def put(self, conn):
+        if len(self.idle) < self.size:
+            self.idle.append(conn)
+        else:
+            conn.close()
+
+    def post_json(self, payload: dict, handle: dict, on_line=None):
+        """POST payload, return (status, body text). handle["conn"] is the connection
+        in use so another thread can abort() it. With on_line, a successful response
+        body is passed to it line by line as it arrives instead (body text is then "")."""
+        body = json.dumps(payload).encode("utf-8")
+        for attempt in range(2):
+            conn, reused = self.get()
+            handle["conn"] = conn
+            try:
+                conn.request("POST", self.path, body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                if on_line is not None and response.status < 400:
+                    for raw in response:
+                        on_line(raw.decode("utf-8"))
+                    data = ""
+                else:
+                    data = response.read().decode("utf-8")
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # The server closed an idle keep-alive connection, try a fresh one
+                if reused and attempt == 0 and not handle.get("aborted"):
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if response.will_close or handle.get("aborted"):
+                conn.close()
+            else:
+                self.put(conn)
+            return response.status, data
+
+    @staticmethod
+    def abort(handle: dict):
+        """Unblock a post_json running in another thread by shutting its socket down."""
+        handle["aborted"] = True
+        conn = handle.get("conn")
+        if conn is not None and conn.sock is not None:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+class ScraperClient:
+    """Async front of the pool: one worker thread per in-flight request."""
+
+    def __init__(self, url: str, size: int = 8, timeout: float = 300):
+        self.pool = ConnectionPool(url, size, timeout)
+        self.executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="scraper-http")
+
+    async def post_json(self, payload: dict, on_line=None):
+        handle = {}
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, self.pool.post_json, payload, handle, on_line)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self.pool.abort(handle)
+            # The thread fails once its socket is shut down, nobody needs that error
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise
+
+    async def chat(self, model: str, prompt: str, files=None, on_delta=None):
+        """Ask the scraper, return the answer text. Raises RuntimeError on HTTP errors.
+        With on_delta the answer is streamed and on_delta(piece) runs on the loop per chunk;
+        the text returned is still the formatted answer from the stream's finish chunk,
+        the same as without on_delta."""
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "files": files or [],
+            "temperature": 0.7,
+        }
+        if on_delta is None:
+            status, body = await self.post_json(payload)
+            if status >= 400:
+                raise RuntimeError(f"Scraper returned HTTP {status}: {body}")
+            return json.loads(body)["choices"][0]["message"]["content"]
+
+        loop = asyncio.get_running_loop()
+        pieces, errors, answer = [], [], []
+
+        def on_line(line):
+            # Runs in the HTTP thread: OpenAI style SSE from /v1/chat/completions
+            line = line.strip()
+            if not line.startswith("data: ") or line == "data: [DONE]":
+                return
+            chunk = json.loads(line[len("data: "):])
+            if "error" in chunk:
+                errors.append(chunk["error"]["message"])
+                return
+            if "answer" in chunk:
+                answer.append(chunk["answer"])
+            piece = chunk["choices"][0]["delta"].get("content")
+            if piece:
+                pieces.append(piece)
+                loop.call_soon_threadsafe(on_delta, piece)
+
+        payload["stream"] = True
+        status, body = await self.post_json(payload, on_line)
+        if status >= 400:
+            raise RuntimeError(f"Scraper returned HTTP {status}: {body}")
+        if errors:
+            raise RuntimeError(f"Scraper error: {errors[0]}")
+        # The pieces are only for progress; a server without the finish chunk's answer
+        # (or a fan-out model, sent as one piece) still gets the streamed text
+        return answer[-1] if answer else "".join(pieces)
+
+def prompt_tool(name: str, provider: str):
+    """inputSchema'd tool description for a prompt (+ files) tool."""
+    return {
+        "name": name,
+        "description": f"Send a prompt to {provider} via the local scraper proxy.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "prompt": {
+                    "type": "string",
+                    "description": f"The message to send to {provider}."
+                },
+                "files": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Optional list of absolute paths to files to upload."
+                }
+            },
+            "required": ["prompt"]
+        }
+    }
+
+def text_result(text: str, is_error: bool = False):
+    result = {"content": [{"type": "text", "text": text}]}
+    if is_error:
+        result["isError"] = True
+    return result
+
+class Progress:
+    """notifications/progress for one tools/call, at most one per interval seconds.
+    progress is the number of characters received so far, message the partial text."""
+
+    def __init__(self, server, token, interval: float = 0.25):
+        self.server = server
+        self.token = token
+        self.interval = interval
+        self.last = 0.0
+
+    def update(self, progress: int, message: str):
+        now = time.monotonic()
+        if now - self.last < self.interval:
+            return
+        self.last = now
+        self.server.write_message({
+            "jsonrpc": "2.0",
+            "method": "notifications/progress",
+            "params": {"progressToken": self.token, "progress": progress, "message": message},
+        })
+
+class McpServer:
+    """tools: name -> (tool description, async handler(arguments, progress) -> tools/call result).
+    progress is a Progress, or None when the client didn't ask for any."""
+
+    def __init__(self, name: str, tools: dict, log_name: str = None):
+        self.name = name
+        self.tools = tools
+        self.log_name = log_name or name
+        self.in_flight = {}
+
+    def log(self, msg):
+        sys.stderr.write(f"[{self.log_name}] {msg}\n")
+        sys.stderr.flush()
+
+    def write_message(self, msg):
+        # Only ever called from the loop thread, so lines never interleave
+        sys.stdout.write(json.dumps(msg) + "\n")
+        sys.stdout.flush()
+
+    def reply(self, msg_id, result=None, error=None):
+        msg = {"jsonrpc": "2.0", "id": msg_id}
+        if error is not None:
+            msg["error"] = error
+        else:
+            msg["result"] = result
+        self.write_message(msg)
+
+    async def run_tool(self, msg_id, name, arguments, progress_token=None):
+        progress = Progress(self, progress_token) if progress_token is not None else None
+        try:
+            result = await self.tools[name][1](arguments, progress)
+        except asyncio.CancelledError:
+            # Cancelled requests get no response
+            self.log(f"Call {msg_id} ({name}) cancelled")
+            return
+        except Exception as e:
+            self.log(f"Call {msg_id} ({name}) failed: {e}")
+            result = text_result(f"Error: {e}", is_error=True)
+        self.reply(msg_id, result)
+
+    def handle(self, msg):
+        msg_id = msg.get("id")
+        method = msg.get("method")
+
+        if method == "initialize":
+            self.reply(msg_id, {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": {"name": self.name, "version": "1.1.0"},
+            })
+        elif method == "ping":
+            self.reply(msg_id, {})
+        elif method == "tools/list":
+            self.reply(msg_id, {"tools": [spec for spec, _ in self.tools.values()]})
+        elif method == "tools/call":
+            params = msg.get("params", {})
+            name = params.get("name")
+            if name not in self.tools:
+                self.reply(msg_id, error={"code": -32601, "message": f"Tool not found: {name}"})
+                return
+            progress_token = (params.get("_meta") or {}).get("progressToken")
+            task = asyncio.create_task(self.run_tool(msg_id, name, params.get("arguments", {}), progress_token))
+            self.in_flight[msg_id] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(msg_id, None))
+        elif method == "notifications/cancelled":
+            task = self.in_flight.get(msg.get("params", {}).get("requestId"))
+            if task is not None:
+                task.cancel()
+        elif method is not None and method.startswith("notifications/"):
+            pass
+        elif msg_id is not None:
+            self.reply(msg_id, error={"code": -32601, "message": f"Method not found: {method}"})
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_MESSAGE_BYTES)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        self.log("Server started")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                msg = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(msg, dict):
+                self.handle(msg)
+        # stdin closed: the client is gone, nobody is waiting for the answers
+        for task in list(self.in_flight.values()):
+            task.cancel()
+        await asyncio.gather(*self.in_flight.values(), return_exceptions=True)
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+# What a failed scraper call can raise (HTTP status, connection, bad JSON)
+SCRAPER_ERRORS = (RuntimeError, OSError, ValueError, KeyError, http.client.HTTPException)
+
+def ask_handler(server: McpServer, client: ScraperClient, provider: str, model: str):
+    """tools/call handler that sends the prompt (+ files) to model and returns its answer."""
+
+    async def ask(arguments, progress):
+        prompt = arguments.get("prompt", "")
+        if not prompt:
+            return text_result("Error: Prompt is required.", is_error=True)
+        server.log(f"Sending request to {provider} scraper: {prompt[:20]}...")
+        partial = []
+
+        def report(piece):
+            partial.append(piece)
+            text = "".join(partial)
+            progress.update(len(text), text)
+        try:
+            return text_result(await client.chat(model, prompt, arguments.get("files", []),
+                                                 report if progress is not None else None))
+        except SCRAPER_ERRORS as e:
+            server.log(f"Error calling API: {e}")
+            return text_result(f"Error communicating with {provider} Scraper: {e}", is_error=True)
+
+    return ask
+
+def bridge(server_name: str, log_name: str, tool_name: str, provider: str, model: str, api_url: str):
+    """One-tool server that forwards prompts for model to the scraper at api_url."""
+    server = McpServer(server_name, {}, log_name)
+    server.tools[tool_name] = (prompt_tool(tool_name, provider), ask_handler(server, ScraperClient(api_url), provider, model))
+    return server
@@ -0,0 +1,118 @@
+"""
+On-disk response cache for ai_scraper.py.
+
+Answers are stored in SQLite keyed by (provider, prompt, uploaded file
+hashes). A lookup tries the exact prompt first, then a normalized form
+(case and whitespace folded), so a retried or slightly re-typed prompt is
+answered without touching the browser. Entries expire after a TTL and the
+least recently used ones are evicted past the size limit.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split()).casefold()
+
+def file_fingerprint(path: str) -> str:
+    if not os.path.exists(path):
+        return f"missing:{path}"
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ResponseCache:
+    def __init__(self, path: str, ttl: float = 86400, max_entries: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "normalized_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bypassed": 0}
+        self.db = None
+        if self.enabled:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, norm_key TEXT, provider TEXT, response TEXT,"
+                " created REAL, last_used REAL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS responses_norm ON responses (norm_key)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+            self.db.commit()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, provider: str, prompt: str, files=None):
+        """Cached response dict, or None."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        files_key = [file_fingerprint(p) for p in files or []]
+        for column, key, stat in (
+            ("key", self._key(provider, prompt, files_key), "hits"),
+            ("norm_key", self._key(provider, normalize_prompt(prompt), files_key), "normalized_hits"),
+        ):
+            row = self.db.execute(
+                f"SELECT key, response FROM responses WHERE {column} = ? AND created > ? "
+                "ORDER BY last_used DESC LIMIT 1",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row:
+                self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, row[0]))
+                self.db.commit()
+                self.stats[stat] += 1
+                return json.loads(row[1])
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, provider: str, prompt: str, files, response: dict):
+        if not self.enabled:
+            return
+        now = time.time()
+        files_key = [file_fingerprint(p) for p in files or []]
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses (key, norm_key, provider, response, created, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (self._key(provider, prompt, files_key), self._key(provider, normalize_prompt(prompt), files_key),
+             provider, json.dumps(response, ensure_ascii=False), now, now),
+        )
+        self.stats["stores"] += 1
+        self._evict(now)
+        self.db.commit()
+
+    def _key(self, provider, prompt, files_key):
+        payload = json.dumps([provider, prompt, files_key])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _evict(self, now):
+        expired = self.db.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,)).rowcount
+        overflow = self.db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        self.stats["evictions"] += expired + overflow
+
+    def clear(self):
+        if self.enabled:
+            self.db.execute("DELETE FROM responses")
+            self.db.commit()
+
+    def info(self):
+        entries = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self.enabled else 0
+        lookups = self.stats["hits"] + self.stats["normalized_hits"] + self.stats["misses"]
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "ttl": self.ttl,
+            "max_entries": self.max_entries,
+            "entries": entries,
+            "hit_rate": round((lookups - self.stats["misses"]) / lookups, 3) if lookups else None,
+            **self.stats,
+        }
@@ -0,0 +1,371 @@
+"""
+JavaScript injected into the provider tabs by ai_scraper.py.
+
+Kept here so ai_scraper.py stays readable; every snippet is plain
+execute_script / execute_async_script source.
+"""
+
+# Same text WebElement.text gives: a port of WebDriver's own visible text walk
+# (bot.dom.getVisibleText). innerText differs on <p> margins, <br> in blocks, and
+# trailing spaces in code. Rendered text only: each line trimmed except in preformatted
+# text (kept as nbsp until the end), nbsp as space, table cells separated by a space.
+# Checked against WebElement.text with bench/bench_extract.py on bench/snapshots.
+VISIBLE_TEXT_JS = r"""
+const INLINE_DISPLAYS = ["inline", "inline-block", "inline-table", "none", "table-cell", "table-column", "table-column-group"];
+const trimLine = (line) => line.replace(/^[^\S\u00a0]+|[^\S\u00a0]+$/g, "");
+
+function isShown(el) {
+  if (el.checkVisibility) return el.checkVisibility({ opacityProperty: true, visibilityProperty: true });
+  return el.getClientRects().length > 0;
+}
+
+function appendTextLines(node, lines, style) {
+  let text = node.nodeValue.replace(/[\u200b\u200e\u200f]/g, "").replace(/\r\n|\r/g, "\n");
+  const whiteSpace = style.whiteSpace;
+  if (whiteSpace === "normal" || whiteSpace === "nowrap") text = text.replace(/\n/g, " ");
+  if (whiteSpace === "pre" || whiteSpace === "pre-wrap" || whiteSpace === "break-spaces") {
+    text = text.replace(/[ \f\t\v\u2028\u2029]/g, "\u00a0");
+  } else {
+    text = text.replace(/[ \f\t\v\u2028\u2029]+/g, " ");
+  }
+  if (style.textTransform === "capitalize") text = text.replace(/(^|\s)(\S)/g, (m, space, ch) => space + ch.toUpperCase());
+  else if (style.textTransform === "uppercase") text = text.toUpperCase();
+  else if (style.textTransform === "lowercase") text = text.toLowerCase();
+  const current = lines.pop() || "";
+  if (current.endsWith(" ") && text.startsWith(" ")) text = text.slice(1);
+  lines.push(...(current + text).split("\n"));
+}
+
+function appendElementLines(el, lines) {
+  if (el.tagName === "BR") {
+    lines.push("");
+    return;
+  }
+  const style = getComputedStyle(el);
+  const isCell = el.tagName === "TD" || style.display === "table-cell";
+  const isBlock = el.tagName !== "TD" && !INLINE_DISPLAYS.includes(style.display);
+  const lineIsBlank = () => /^[\s\u00a0]*$/.test(lines[lines.length - 1] || "");
+  if (isBlock && !lineIsBlank()) lines.push("");
+  const shown = isShown(el);
+  for (const node of el.childNodes) {
+    if (node.nodeType === Node.TEXT_NODE && shown) appendTextLines(node, lines, style);
+    else if (node.nodeType === Node.ELEMENT_NODE) appendElementLines(node, lines);
+  }
+  const line = lines[lines.length - 1] || "";
+  if (isCell && line && !line.endsWith(" ")) lines[lines.length - 1] += " ";
+  if (isBlock && !lineIsBlank()) lines.push("");
+}
+
+function visibleText(el) {
+  if (!el || !el.getClientRects().length) return "";
+  const lines = [];
+  appendElementLines(el, lines);
+  return trimLine(lines.map(trimLine).join("\n")).replace(/\u00a0/g, " ");
+}
+"""
+
+# Answer container -> {"plain-text", "code-blocks", "formatted_markdown"}, per provider.
+# Shared by the extractors and the response watcher, so a streamed answer is the same
+# markdown the extraction returns at the end.
+FORMAT_JS = VISIBLE_TEXT_JS + r"""
+// Same walk as extract_chatgpt_message_by_elements(), message = assistant message
+function formatChatgpt(message) {
+  let formatted = "";
+  const plain = [];
+  const code = {};
+  let codeIdx = 0;
+
+  for (const el of message.querySelectorAll("div.markdown.prose > *")) {
+    const tag = el.tagName.toLowerCase();
+    if (["p", "h1", "h2", "h3", "h4"].includes(tag)) {
+      const text = visibleText(el);
+      formatted += text + "\n\n";
+      plain.push(text);
+    } else if (tag === "ul" || tag === "ol") {
+      let listText = "";
+      for (const li of el.querySelectorAll("li")) listText += "- " + visibleText(li) + "\n";
+      formatted += listText + "\n";
+      plain.push(listText);
+    } else if (tag === "pre") {
+      const langEl = el.querySelector("div.flex.items-center.text-sm");
+      const lang = langEl ? visibleText(langEl).toLowerCase() : "code";
+      const content = el.querySelector("div.cm-content");
+      if (!content) continue;
+      const codeText = visibleText(content);
+      code[`${lang}_${codeIdx}`] = codeText;
+      formatted += "```" + lang + "\n" + codeText + "\n```\n\n";
+      codeIdx++;
+    } else {
+      const text = visibleText(el);
+      formatted += text + "\n\n";
+      plain.push(text);
+    }
+  }
+  return { "plain-text": plain.join("\n\n"), "code-blocks": code, "formatted_markdown": formatted };
+}
+
+// Same walk as extract_deepseek_message_by_elements(), container = div.ds-markdown
+function formatDeepseek(container) {
+  let formatted = "";
+  let plain = [];
+  const code = {};
+  let codeIdx = 0;
+
+  for (const el of container.children) {
+    const className = el.getAttribute("class") || "";
+    if (className.includes("md-code-block")) {
+      const langEl = el.querySelector("span.d813de27");
+      const lang = langEl ? visibleText(langEl).toLowerCase() : "code";
+      const pre = el.querySelector("pre");
+      if (!pre) continue;
+      const codeText = visibleText(pre);
+      code[`${lang}_${codeIdx}`] = codeText;
+      formatted += "```" + lang + "\n" + codeText + "\n```\n\n";
+      codeIdx++;
+    } else {
+      const text = visibleText(el);
+      if (text.trim()) {
+        formatted += text + "\n\n";
+        plain.push(text);
+      }
+    }
+  }
+  return { "plain-text": plain.join("\n\n"), "code-blocks": code, "formatted_markdown": formatted.trim() };
+}
+
+// Perplexity: the container's text as is
+function formatText(container) {
+  const text = visibleText(container);
+  return { "plain-text": text, "code-blocks": {}, "formatted_markdown": text };
+}
+
+const FORMATTERS = { chatgpt: formatChatgpt, deepseek: formatDeepseek, text: formatText };
+"""
+
+# Whole ChatGPT answer in one call. Returns null when there is no assistant message on the page.
+EXTRACT_CHATGPT_JS = FORMAT_JS + r"""
+const messages = document.querySelectorAll("div[data-message-author-role='assistant']");
+if (!messages.length) return null;
+return formatChatgpt(messages[messages.length - 1]);
+"""
+
+# Whole DeepSeek answer in one call. arguments[0] = the div.ds-markdown response container
+EXTRACT_DEEPSEEK_JS = FORMAT_JS + r"""
+return formatDeepseek(arguments[0]);
+"""
+
+# Whole Perplexity answer in one call. arguments[0] = the response container
+EXTRACT_TEXT_JS = FORMAT_JS + r"""
+return formatText(arguments[0]);
+"""
+
+# Installs window.__scraperWatch (once per page) and arms it for the next answer.
+# A MutationObserver follows the newest response container and keeps its text (the
+# provider's formatted markdown, FORMAT_JS), and decides when generation is finished,
+# so Python doesn't have to poll .text.
+# arguments[0] = watch config (see WATCH_CONFIG in ai_scraper.py)
+WATCH_JS = FORMAT_JS + r"""
+const config = arguments[0];
+if (!window.__scraperWatch) {
+  const w = window.__scraperWatch = {};
+
+  w.arm = function (config) {
+    w.config = config;
+    w.baseline = document.querySelectorAll(config.container).length;
+    w.state = {
+      started: false, busySeen: false, container: null,
+      text: "", emitted: "", lastChange: Date.now(), armedAt: Date.now(),
+    };
+    w.refresh();
+  };
+
+  w.readText = function (container) {
+    return FORMATTERS[w.config.format](container).formatted_markdown;
+  };
+
+  // The part of an unfinished answer that won't change any more: everything up to the
+  // last line break before the line still being written. That line may still turn into
+  // something else (a list, a code fence, bold text). In a code block still being
+  // written that's the line before the closing fence, which only stays at the end once
+  // the block is done. Blank lines before the cut may be a new block's empty first
+  // line, so only one line break of those goes out.
+  w.stableText = function (text) {
+    const open = text.replace(/\s+$/, "").replace(/\n```$/, "").replace(/\s+$/, "");
+    return open.slice(0, open.lastIndexOf("\n") + 1).replace(/\n+$/, "\n");
+  };
+
+  w.refresh = function () {
+    const s = w.state;
+    if (!s) return;
+    const c = w.config;
+    if (c.busy && document.querySelector(c.busy)) s.busySeen = true;
+    const containers = document.querySelectorAll(c.container);
+    if (containers.length > w.baseline) {
+      s.container = containers[containers.length - 1];
+      s.started = true;
+    }
+    if (s.container) {
+      const text = w.readText(s.container);
+      if (text !== s.text) {
+        s.text = text;
+        s.lastChange = Date.now();
+      }
+    }
+  };
+
+  w.isDone = function () {
+    const s = w.state, c = w.config;
+    if (!s || !s.started || !s.text.length) return false;
+    if (Date.now() - s.lastChange < c.quietMs) return false;
+    if (c.busy && document.querySelector(c.busy)) return false;
+    if (c.idle && !document.querySelector(c.idle)) return false;
+    return true;
+  };
+
+  // Mutations come in bursts while tokens stream in; re-read the text at most every 50ms
+  let scheduled = false;
+  new MutationObserver(() => {
+    if (scheduled) return;
+    scheduled = true;
+    setTimeout(() => { scheduled = false; w.refresh(); }, 50);
+  }).observe(document.body, { childList: true, subtree: true, characterData: true, attributes: true });
+}
+window.__scraperWatch.arm(config);
+"""
+
+# Long-polls the watcher for up to arguments[0] ms. Resolves early once generation is done,
+# or (arguments[1] = eager, used when streaming) as soon as there is new stable text.
+# Returns the text appended since the previous collect (or the whole text with reset=true
+# when the page rewrote earlier text), plus the container element once done. Until then
+# only the stable part of the answer (w.stableText) is handed out.
+COLLECT_JS = r"""
+const windowMs = arguments[0];
+const eager = arguments[1];
+const resolve = arguments[arguments.length - 1];
+const w = window.__scraperWatch;
+if (!w || !w.state) { resolve({ lost: true }); return; }
+
+const until = Date.now() + windowMs;
+(function check() {
+  w.refresh();
+  const done = w.isDone();
+  const s = w.state;
+  const text = done ? s.text : w.stableText(s.text);
+  const fresh = eager && text !== s.emitted;
+  if (!done && !fresh && Date.now() < until) { setTimeout(check, 50); return; }
+
+  const reset = !text.startsWith(s.emitted);
+  const delta = reset ? text : text.slice(s.emitted.length);
+  s.emitted = text;
+  resolve({
+    started: s.started, done: done, reset: reset, delta: delta,
+    length: s.text.length, elapsed: Date.now() - s.armedAt,
+    container: done ? s.container : null,
+  });
+})();
+"""
+
+# Puts the whole prompt into an editor in one call, replacing what's there.
+# textarea/input: native value setter + input event (what React listens to).
+# contenteditable (ProseMirror, Lexical): synthetic paste, then execCommand('insertText').
+# arguments[0] = editor element, arguments[1] = text
+# Returns the method that worked, or false so the caller can type it instead.
+INSERT_TEXT_JS = r"""
+const el = arguments[0];
+const text = arguments[1];
+const squash = (s) => (s || "").replace(/\s+/g, "");
+el.focus();
+
+if (el.tagName === "TEXTAREA" || el.tagName === "INPUT") {
+  const proto = el.tagName === "TEXTAREA" ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+  Object.getOwnPropertyDescriptor(proto, "value").set.call(el, text);
+  el.dispatchEvent(new InputEvent("input", { bubbles: true, inputType: "insertText", data: text }));
+  return el.value === text ? "value" : false;
+}
+
+const selectAll = () => {
+  const range = document.createRange();
+  range.selectNodeContents(el);
+  const selection = window.getSelection();
+  selection.removeAllRanges();
+  selection.addRange(range);
+};
+const took = () => squash(el.innerText) === squash(text);
+
+selectAll();
+const data = new DataTransfer();
+data.setData("text/plain", text);
+el.dispatchEvent(new ClipboardEvent("paste", { clipboardData: data, bubbles: true, cancelable: true }));
+if (took()) return "paste";
+
+selectAll();
+document.execCommand("insertText", false, text);
+if (took()) return "insertText";
+return false;
+"""
+
+# How big the open conversation is, to decide when to start a fresh one.
+# arguments[0] = response container selector
+# Returns {url, answers, nodes}
+THREAD_STATS_JS = r"""
+return {
+  url: location.href,
+  answers: document.querySelectorAll(arguments[0]).length,
+  nodes: document.getElementsByTagName("*").length,
+};
+"""
+
+# Starts loading arguments[0] without blocking execute_script until the page is loaded.
+# The marker disappears with the old document, so TAB_STATE_JS can't see the old page.
+NAVIGATE_JS = r"""
+window.__scraperLeaving = true;
+window.location.href = arguments[0];
+"""
+
+# Readiness probe for a provider tab.
+# arguments[0] = editor selector, arguments[1] = logged-out marker selector (or null)
+# Returns {loaded, editor, loggedOut}
+TAB_STATE_JS = r"""
+return {
+  loaded: !window.__scraperLeaving && document.readyState === "complete",
+  editor: !!document.querySelector(arguments[0]),
+  loggedOut: !!(arguments[1] && document.querySelector(arguments[1])),
+};
+"""
+
+# One poll of a wait condition (see WAIT_CONDITIONS in ai_scraper.py).
+# arguments[0] = {all: [checks]} or {any: [checks]}, a check being
+#   {sel, min (default 1), enabled (not disabled), empty (no text/value)}
+# Only visible elements count.
+CONDITION_JS = r"""
+const cond = arguments[0];
+const visible = (el) => el.getClientRects().length > 0;
+const enabled = (el) => !el.disabled && el.getAttribute("aria-disabled") !== "true";
+const empty = (el) => !(el.value !== undefined ? el.value : el.innerText).trim();
+
+function check(c) {
+  let els = Array.from(document.querySelectorAll(c.sel)).filter(visible);
+  if (c.enabled) els = els.filter(enabled);
+  if (c.empty) els = els.filter(empty);
+  return els.length >= (c.min || 1);
+}
+return cond.any ? cond.any.some(check) : cond.all.every(check);
+"""
+
+# Upload chips in the composer: [{name, done}] per remove button. A chip is the
+# outermost ancestor holding only that one remove button (and not the editor);
+# it is still uploading while it, or anything in it, matches the busy selector
+# (progress ring, spinner).
+# args: remove button selector, busy selector
+UPLOAD_STATE_JS = r"""
+const [removeSel, busySel] = arguments;
+return Array.from(document.querySelectorAll(removeSel)).map((button) => {
+  let chip = button;
+  for (let up = chip.parentElement; up && up.querySelectorAll(removeSel).length === 1
+       && !up.querySelector("[contenteditable='true'], textarea"); up = up.parentElement) {
+    chip = up;
+  }
+  const busy = chip.matches(busySel) || chip.querySelector(busySel) !== null;
+  return {name: (chip.innerText || "").trim(), done: !busy};
+});
+"""
@@ -0,0 +1,88 @@
+"""
+One MCP server for all scraper providers: ask_chatgpt, ask_deepseek,
+ask_perplexity, and ask_all, which sends the same prompt to several of them at
+once and returns every answer. One process and one keep-alive connection pool
+instead of a bridge per provider. Calls that carry a progressToken get the
+partial answer(s) as notifications/progress while the scraper streams.
+"""
+import asyncio
+
+from mcp_bridge import McpServer, ScraperClient, SCRAPER_ERRORS, ask_handler, prompt_tool, text_result
+
+# Configuration - Combined scraper port 8000 pe chal raha hai
+API_URL = "http://localhost:8000/v1/chat/completions"
+
+# tool suffix -> (display name, scraper model)
+PROVIDERS = {
+    "chatgpt": ("ChatGPT", "gpt-scraper-mock"),
+    "deepseek": ("DeepSeek", "deepseek-scraper"),
+    "perplexity": ("Perplexity", "perplexity-scraper"),
+}
+
+def ask_all_tool():
+    spec = prompt_tool("ask_all", "every provider")
+    spec["description"] = "Send the same prompt to ChatGPT, DeepSeek and Perplexity at once and get all answers."
+    spec["inputSchema"]["properties"]["prompt"]["description"] = "The message to send to every provider."
+    spec["inputSchema"]["properties"]["providers"] = {
+        "type": "array",
+        "items": {"type": "string", "enum": list(PROVIDERS)},
+        "description": "Optional subset of providers to ask (default: all).",
+    }
+    return spec
+
+def ask_all_handler(server: McpServer, client: ScraperClient):
+    async def ask_all(arguments, progress):
+        prompt = arguments.get("prompt", "")
+        if not prompt:
+            return text_result("Error: Prompt is required.", is_error=True)
+        providers = arguments.get("providers") or list(PROVIDERS)
+        unknown = [p for p in providers if p not in PROVIDERS]
+        if unknown:
+            return text_result(f"Error: Unknown provider(s): {', '.join(unknown)}", is_error=True)
+        server.log(f"Sending request to {', '.join(providers)}: {prompt[:20]}...")
+
+        partial = {provider: [] for provider in providers}
+
+        def on_delta_for(provider):
+            if progress is None:
+                return None
+
+            def on_delta(piece):
+                partial[provider].append(piece)
+                texts = {p: "".join(pieces) for p, pieces in partial.items() if pieces}
+                message = "\n\n".join(f"[{PROVIDERS[p][0]}] {text}" for p, text in texts.items())
+                progress.update(sum(len(text) for text in texts.values()), message)
+            return on_delta
+
+        answers = await asyncio.gather(
+            *(client.chat(PROVIDERS[p][1], prompt, arguments.get("files", []), on_delta_for(p)) for p in providers),
+            return_exceptions=True,
+        )
+        content, failed = [], 0
+        for provider, answer in zip(providers, answers):
+            name = PROVIDERS[provider][0]
+            if isinstance(answer, BaseException):
+                if not isinstance(answer, SCRAPER_ERRORS):
+                    raise answer
+                server.log(f"{name} failed: {answer}")
+                failed += 1
+                answer = f"Error communicating with {name} Scraper: {answer}"
+            content.append({"type": "text", "text": f"### {name}\n{answer}"})
+        result = {"content": content}
+        if failed == len(providers):
+            result["isError"] = True
+        return result
+
+    return ask_all
+
+def main():
+    client = ScraperClient(API_URL)
+    server = McpServer("scraper-mcp", {}, "scraper-mcp")
+    for provider, (name, model) in PROVIDERS.items():
+        tool = f"ask_{provider}"
+        server.tools[tool] = (prompt_tool(tool, name), ask_handler(server, client, name, model))
+    server.tools["ask_all"] = (ask_all_tool(), ask_all_handler(server, client))
+    server.run()
+
+if __name__ == "__main__":
+    main()
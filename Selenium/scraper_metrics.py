@@ -0,0 +1,168 @@
+"""
+Request timing and Prometheus metrics for ai_scraper.py.
+
+Every dispatched prompt gets a RequestTimer. Code anywhere below dispatch()
+records into it through phase() / count_webdriver_call() without passing it
+around (it lives in a ContextVar, which asyncio copies into child tasks).
+When the request ends the timer is folded into the histograms below, and
+render() produces the text format Prometheus scrapes from /metrics.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds. Phases range from a few ms (tab switch) to minutes (generation).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CALL_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# WebDriver calls are counted on the browsers' driver threads, everything else on the loop
+_lock = threading.Lock()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.label_names = name, help_text, tuple(labels)
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set(self, *labels, value):
+        """Mirror a count that is kept somewhere else (e.g. the cache stats)."""
+        self.values[labels] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+class Gauge(Counter):
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.label_names = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (+Inf last), sum, count]
+        self.series = {}
+
+    def observe(self, *labels, value):
+        with _lock:
+            series = self.series.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+REQUEST_SECONDS = Histogram(
+    "scraper_request_phase_seconds", "Time per request spent in each phase (total = whole request).", ("model", "phase")
+)
+REQUESTS = Counter("scraper_requests_total", "Finished requests by outcome.", ("model", "status"))
+LOCK_WAIT_SECONDS = Histogram("scraper_lock_wait_seconds", "Time waiting for a browser's driver_lock.", ("model",))
+WEBDRIVER_CALLS = Histogram(
+    "scraper_webdriver_calls_per_request", "WebDriver commands sent per request.", ("model",), buckets=CALL_BUCKETS
+)
+WEBDRIVER_CALLS_TOTAL = Counter("scraper_webdriver_calls_total", "All WebDriver commands, in or outside requests.")
+RECOVERY_SECONDS = Histogram(
+    "scraper_recovery_seconds", "Time from a crashed tab / browser being noticed to it serving again.", ("scope",)
+)
+RECOVERIES = Counter("scraper_recoveries_total", "Tab and browser rebuilds by outcome.", ("scope", "outcome"))
+REPLAYS = Counter("scraper_replays_total", "Requests sent again after a crash before the prompt reached the provider.", ("model",))
+STREAM_MISMATCHES = Counter(
+    "scraper_stream_mismatches_total", "Streamed answers that turned out not to be a prefix of the extracted one.", ("model",)
+)
+REGISTRY = [
+    REQUEST_SECONDS, REQUESTS, LOCK_WAIT_SECONDS, WEBDRIVER_CALLS, WEBDRIVER_CALLS_TOTAL,
+    RECOVERY_SECONDS, RECOVERIES, REPLAYS, STREAM_MISMATCHES,
+]
+
+class RequestTimer:
+    """Phase durations of one request. Phases may nest (lock_wait happens inside input,
+    generate, ...), so they don't have to add up to total."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.webdriver_calls = 0
+        self.total = None
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def finish(self, status: str):
+        self.total = time.perf_counter() - self.start
+        for phase, seconds in self.phases.items():
+            REQUEST_SECONDS.observe(self.model, phase, value=seconds)
+        REQUEST_SECONDS.observe(self.model, "total", value=self.total)
+        REQUESTS.inc(self.model, status)
+        if status != "cached":
+            WEBDRIVER_CALLS.observe(self.model, value=self.webdriver_calls)
+
+    def header(self):
+        """x-scraper-timing value, Server-Timing style: 'queue;dur=12.0, input;dur=310.4, ...' (ms)"""
+        parts = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.phases.items()]
+        if self.total is not None:
+            parts.append(f"total;dur={self.total * 1000:.1f}")
+        parts.append(f"webdriver;calls={self.webdriver_calls}")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        return {
+            **{phase: round(seconds, 4) for phase, seconds in self.phases.items()},
+            "total": round(self.total, 4) if self.total is not None else None,
+            "webdriver_calls": self.webdriver_calls,
+        }
+
+current_timer = contextvars.ContextVar("scraper_request_timer", default=None)
+
+@contextmanager
+def phase(name: str):
+    """Add the block's duration to the current request's phase (no-op outside a request)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer = current_timer.get()
+        if timer is not None:
+            timer.add(name, time.perf_counter() - start)
+
+def record(name: str, seconds: float):
+    timer = current_timer.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+def count_webdriver_call():
+    WEBDRIVER_CALLS_TOTAL.inc()
+    timer = current_timer.get()
+    if timer is not None:
+        timer.webdriver_calls += 1
+
+def render(extra=()):
+    lines = []
+    for metric in [*REGISTRY, *extra]:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,173 @@
+"""
+Job queue for ai_scraper.py.
+
+Every prompt becomes a Job that waits here for a free provider tab on one of
+the browser workers. Waiting jobs are served by priority class first
+(interactive before batch), then first come first served. Jobs can carry a
+deadline and are dropped (or stopped) when it passes or when the caller is
+cancelled, e.g. because the HTTP client went away.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+import uuid
+from collections import deque
+
+# Lower runs first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+class DeadlineExceeded(Exception):
+    pass
+
+class Job:
+    def __init__(self, provider: str, priority: str = "interactive", deadline=None, label: str = ""):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', use one of: {', '.join(PRIORITIES)}")
+        self.id = f"job-{uuid.uuid4().hex[:12]}"
+        self.provider = provider
+        self.priority = priority
+        self.label = label
+        self.created = time.time()
+        # deadline is given in seconds from now
+        self.deadline = self.created + deadline if deadline else None
+        self.state = "queued"
+        self.worker = None
+        self.started = None
+        self.finished = None
+        self.future = None
+
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.time())
+
+    def to_dict(self):
+        now = time.time()
+        return {
+            "id": self.id,
+            "provider": self.provider,
+            "priority": self.priority,
+            "state": self.state,
+            "label": self.label,
+            "worker": self.worker.worker_id if self.worker else None,
+            "waited": round((self.started or self.finished or now) - self.created, 3),
+            "ran": round((self.finished or now) - self.started, 3) if self.started else None,
+            "deadline_in": round(self.deadline - now, 3) if self.deadline else None,
+        }
+
+class JobQueue:
+    """Hands provider tabs (worker.busy[provider]) to waiting jobs.
+
+    on_abandon(worker, provider) is awaited when a running job is cancelled or
+    runs out of time, so the tab can be stopped before the next job gets it."""
+
+    def __init__(self, workers, on_abandon=None):
+        self.workers = workers
+        self.on_abandon = on_abandon
+        self.waiting = {}
+        self.seq = itertools.count()
+        self.running = {}
+        self.finished = deque(maxlen=50)
+
+    def providers(self):
+        return {provider for worker in self.workers for provider in worker.providers}
+
+    def depth(self, provider=None):
+        if provider is not None:
+            return sum(1 for *_, job in self.waiting.get(provider, []) if job.state == "queued")
+        return sum(self.depth(p) for p in self.waiting)
+
+    async def run(self, job: Job, fn):
+        """Wait for a tab, then run fn(worker) on it within the job's deadline."""
+        worker = await self.acquire(job)
+        job.state = "running"
+        job.started = time.time()
+        self.running[job.id] = job
+        try:
+            if job.deadline is None:
+                result = await fn(worker)
+            else:
+                result = await asyncio.wait_for(fn(worker), job.remaining())
+            job.state = "done"
+            return result
+        except asyncio.TimeoutError:
+            job.state = "expired"
+            await self.abandon(job)
+            raise DeadlineExceeded(f"Deadline passed after {time.time() - job.created:.1f}s, request dropped.")
+        except asyncio.CancelledError:
+            job.state = "cancelled"
+            await self.abandon(job)
+            raise
+        except Exception:
+            job.state = "failed"
+            raise
+        finally:
+            self.release(job)
+
+    async def acquire(self, job: Job):
+        if job.provider not in self.providers():
+            raise Exception(f"No browser worker has a {job.provider} tab.")
+        job.future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiting.setdefault(job.provider, []), (PRIORITIES[job.priority], next(self.seq), job))
+        self.schedule(job.provider)
+        try:
+            return await asyncio.wait_for(asyncio.shield(job.future), job.remaining())
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            job.state = "expired" if isinstance(e, asyncio.TimeoutError) else "cancelled"
+            if job.future.done() and not job.future.cancelled():
+                # A tab was handed over just as we gave up, give it back
+                self.release(job)
+            else:
+                job.future.cancel()
+                job.finished = time.time()
+                self.finished.append(job)
+            if isinstance(e, asyncio.TimeoutError):
+                raise DeadlineExceeded(f"Deadline passed after {job.finished - job.created:.1f}s in the queue.")
+            raise
+
+    async def abandon(self, job: Job):
+        if self.on_abandon is None:
+            return
+        try:
+            await self.on_abandon(job.worker, job.provider)
+        except Exception as e:
+            print(f"⚠️ Could not stop abandoned {job.provider} job {job.id}: {e}")
+
+    def release(self, job: Job):
+        if job.worker is not None and job.worker.busy.get(job.provider) is job:
+            job.worker.busy[job.provider] = None
+        self.running.pop(job.id, None)
+        if job.finished is None:
+            job.finished = time.time()
+            self.finished.append(job)
+        self.schedule(job.provider)
+
+    def schedule(self, provider: str):
+        waiting = self.waiting.get(provider, [])
+        while waiting:
+            free = [
+                w for w in self.workers
+                if w.healthy and provider in w.providers and w.ready[provider] and w.busy[provider] is None
+            ]
+            if not free:
+                return
+            *_, job = heapq.heappop(waiting)
+            if job.future.done():
+                continue  # cancelled or expired while waiting
+            worker = min(free, key=lambda w: sum(1 for busy in w.busy.values() if busy))
+            worker.busy[provider] = job
+            job.worker = worker
+            job.future.set_result(worker)
+
+    def schedule_all(self):
+        for provider in list(self.waiting):
+            self.schedule(provider)
+
+    def snapshot(self):
+        return {
+            "depth": {provider: self.depth(provider) for provider in sorted(self.providers())},
+            "waiting": [job.to_dict() for provider in self.waiting for *_, job in sorted(self.waiting[provider]) if job.state == "queued"],
+            "running": [job.to_dict() for job in self.running.values()],
+            "recent": [job.to_dict() for job in reversed(self.finished)],
+        }
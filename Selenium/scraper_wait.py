@@ -0,0 +1,77 @@
+"""
+Adaptive condition waits for ai_scraper.py.
+
+Instead of sleeping a fixed time and hoping the page caught up, the scraper
+polls a condition (editor enabled, upload chips there, send button turned
+into a stop button...) until it holds. How soon and how often it polls is
+learned per (provider, condition) from how long that condition took the
+last few times: no point checking a 2s upload every 20ms, or a 30ms editor
+every 500ms. Timeouts are not learned, they come from the caller.
+"""
+import asyncio
+import time
+from collections import deque
+
+class WaitTimeout(Exception):
+    pass
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+class AdaptiveWait:
+    def __init__(self, floor: float = 0.02, ceiling: float = 0.5, history: int = 50, min_samples: int = 5):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+        self.history = history
+        self.samples = {}
+        self.timeouts = {}
+
+    def schedule(self, key):
+        """(delay before the first check, first poll interval) for this condition."""
+        samples = self.samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return 0.0, self.floor
+        # Skip the part of the wait that has (almost) never been enough, then poll
+        # at a fraction of the typical duration
+        delay = percentile(samples, 0.1) * 0.8
+        interval = min(self.ceiling, max(self.floor, percentile(samples, 0.5) / 4))
+        return delay, interval
+
+    def observe(self, key, seconds: float):
+        self.samples.setdefault(key, deque(maxlen=self.history)).append(seconds)
+
+    async def until(self, key, probe, timeout: float, description: str = ""):
+        """Await probe() (an async callable) until it returns something truthy and return that.
+        Raises WaitTimeout after timeout seconds."""
+        start = time.perf_counter()
+        delay, interval = self.schedule(key)
+        if delay:
+            await asyncio.sleep(delay)
+        while True:
+            value = await probe()
+            elapsed = time.perf_counter() - start
+            if value:
+                self.observe(key, elapsed)
+                return value
+            if elapsed >= timeout:
+                self.timeouts[key] = self.timeouts.get(key, 0) + 1
+                raise WaitTimeout(f"Timed out after {timeout}s waiting for {description or key}.")
+            await asyncio.sleep(min(interval, max(0.0, timeout - elapsed)))
+            interval = min(self.ceiling, interval * 1.3)
+
+    def snapshot(self):
+        report = {}
+        for key in {**self.samples, **self.timeouts}:
+            samples = self.samples.get(key, [])
+            delay, interval = self.schedule(key)
+            report["/".join(key)] = {
+                "samples": len(samples),
+                "p50": round(percentile(samples, 0.5), 4) if samples else None,
+                "p90": round(percentile(samples, 0.9), 4) if samples else None,
+                "first_check_after": round(delay, 4),
+                "poll_interval": round(interval, 4),
+                "timeouts": self.timeouts.get(key, 0),
+            }
+        return report
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# bench_policy.py - whitelist lookup: old line-by-line file scan vs compiled PolicyFile
+#
+# Writes whitelists of growing size (half exact commands, half "prefix*" patterns),
+# then times check_whitelist-style lookups both ways. The compiled one should stay
+# flat as the list grows, the scan grows with it.
+#
+# Usage: python3 bench_policy.py [--patterns 100000] [--lookups 2000]
+
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+from command_policy import PolicyFile
+
+def scan_file(path, command_str):
+    """The old check_whitelist: reopen the file and test every line."""
+    with open(path, "r") as f:
+        for line in f:
+            pattern = line.strip()
+            if not pattern:
+                continue
+            if pattern.endswith("*"):
+                if command_str.startswith(pattern[:-1]):
+                    return True
+            elif command_str == pattern:
+                return True
+    return False
+
+def random_command(rng):
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 8))) for _ in range(rng.randint(1, 4))]
+    return " ".join(words)
+
+def write_patterns(path, n, rng):
+    with open(path, "w") as f:
+        for i in range(n):
+            # Digits in front keep random lookups from hitting short prefixes by luck
+            pattern = f"{i} {random_command(rng)}"
+            f.write(pattern + ("*" if i % 2 else "") + "\n")
+
+def time_lookups(check, commands):
+    start = time.perf_counter()
+    for command in commands:
+        check(command)
+    return (time.perf_counter() - start) / len(commands)
+
+def main():
+    parser = argparse.ArgumentParser(description="Whitelist lookup benchmark")
+    parser.add_argument("--patterns", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--scan-lookups", type=int, default=50, help="lookups for the (slow) file scan")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    sizes = [n for n in (100, 1000, 10000, 100000, 1000000) if n < args.patterns] + [args.patterns]
+    # Misses are the worst case for the scan (it reads every line)
+    commands = [random_command(rng) for _ in range(args.lookups)]
+
+    print(f"{'patterns':>10}{'load':>10}{'compiled':>12}{'file scan':>12}{'speedup':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = os.path.join(tmp, f"whitelist-{n}.txt")
+            write_patterns(path, n, rng)
+
+            policy = PolicyFile(path)
+            start = time.perf_counter()
+            policy.current()
+            load = time.perf_counter() - start
+
+            compiled = time_lookups(policy.match, commands)
+            scan = time_lookups(lambda c: scan_file(path, c), commands[:args.scan_lookups])
+            print(f"{n:>10}{load * 1000:>8.0f}ms{compiled * 1e6:>10.1f}us{scan * 1e6:>10.0f}us{scan / compiled:>9.0f}x")
+
+            # Sanity: same answers, including hits on both kinds of pattern
+            with open(path) as f:
+                hits = [line.strip().rstrip("*") + (" --flag" if line.strip().endswith("*") else "") for _, line in zip(range(20), f)]
+            for command in hits + commands[:20]:
+                assert (policy.match(command) is not None) == scan_file(path, command), command
+
+    print(f"\nA lookup after the first one costs one os.stat plus a walk of the command ({policy.reloads} load(s)).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# bench_shell.py - per-command latency: fresh zsh per command vs the ShellPool
+#
+# The old /execute path spawned `zsh -c "source ~/.zshrc && source venv && cd && <cmd>"`
+# for every command; the pool's shells sourced all of that once.
+#
+# Usage: python3 bench_shell.py [--runs 50] [--command "ls"] [--shell /usr/bin/zsh]
+
+import argparse
+import statistics
+import subprocess
+import time
+
+from command_server import PROJECT_DIR, SHELL, SHELL_INIT
+from shell_pool import ShellPool
+
+def fresh_shell(shell, command):
+    subprocess.run(f"{SHELL_INIT.replace('; ', ' && ')} && {command}", shell=True, executable=shell,
+                   capture_output=True, text=True, timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description="Shell startup vs pooled shells")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--command", default="ls")
+    parser.add_argument("--shell", default=SHELL)
+    args = parser.parse_args()
+
+    pool = ShellPool(1, args.shell, SHELL_INIT, PROJECT_DIR)
+    pool.warm_up()
+    timings = {"fresh shell": [], "pool": []}
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        fresh_shell(args.shell, args.command)
+        timings["fresh shell"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        pool.run(args.command)
+        timings["pool"].append(time.perf_counter() - start)
+    pool.shutdown()
+
+    print(f"{args.runs} x {args.command!r} with {args.shell}")
+    for name, values in timings.items():
+        print(f"  {name:<12}: median {statistics.median(values) * 1000:.1f}ms, max {max(values) * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main()
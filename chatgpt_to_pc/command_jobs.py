@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# command_jobs.py - /execute with "async": true, for the command server
+#
+# Blocking /execute request ke andar command chalata hai: a slow command holds the
+# HTTP call (and the client) until it's done, and the client can only wait on one
+# at a time. A job instead gets an id right away and runs on its own thread + shell:
+#
+#   POST /execute {"command": ..., "async": true, "timeout": 120}  -> 202 {"job_id": ...}
+#   GET  /jobs/<id>                                                -> state, exit code, sizes
+#   GET  /jobs/<id>/output?stdout_offset=N&stderr_offset=M         -> output after those byte offsets
+#
+# Up to `workers` jobs run at once (the rest stay "queued"), each with its own
+# timeout. Finished jobs are kept for the last `history` submissions. Output goes
+# through the same OutputCapture as blocking /execute: only head + tail stay in
+# memory, a bigger output is read back from its spill file (one read returns at
+# most READ_LIMIT bytes per stream, `*_bytes` says how much there is).
+
+import collections
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, TIMED_OUT, FAILED = "queued", "running", "done", "timed_out", "failed"
+FINISHED = (DONE, TIMED_OUT, FAILED)
+READ_LIMIT = 1024 * 1024  # bytes per stream one /jobs/<id>/output call returns at most
+
+class Job:
+    def __init__(self, command, timeout, capture):
+        self.id = uuid.uuid4().hex[:12]
+        self.command = command
+        self.timeout = timeout
+        self.state = QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.exit_code = None
+        self.error = None
+        self.capture = capture
+        self.lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.state in FINISHED
+
+    def append(self, stream, data):
+        with self.lock:
+            self.capture.write(stream, data)
+
+    def close(self):
+        with self.lock:
+            self.capture.close()
+
+    def status(self):
+        with self.lock:
+            sizes = {f"{name}_bytes": size for name, size in self.capture.sizes().items()}
+            truncated = self.capture.truncated
+        now = self.finished or time.time()
+        return {
+            "job_id": self.id,
+            "command": self.command,
+            "state": self.state,
+            "done": self.done,
+            "exit_code": self.exit_code,
+            "error": self.error,
+            "timeout": self.timeout,
+            "created": self.created,
+            "duration": round(now - self.started, 3) if self.started else None,
+            "truncated": truncated,  # spilled: GET /outputs/<output_id>/<stream> has the whole file
+            "output_id": self.capture.id if truncated else None,
+            **sizes,
+        }
+
+    def read(self, stdout_offset=0, stderr_offset=0, limit=READ_LIMIT):
+        """Output after the given byte offsets, plus the offsets to ask for next time.
+
+        A reader is done once the job is and its offsets reached the `*_bytes` sizes.
+        `*_skipped` says how many bytes were jumped over because the spill file expired.
+        """
+        # Read done before the output, so a reader that sees done=True also has the last bytes
+        done = self.done
+        result = {"job_id": self.id, "state": self.state, "done": done, "exit_code": self.exit_code,
+                  "error": self.error}
+        with self.lock:
+            for name, offset in (("stdout", stdout_offset), ("stderr", stderr_offset)):
+                stream = self.capture.streams[name]
+                start, data = stream.read(offset, limit)
+                result[name] = data.decode(errors="replace")
+                result[f"{name}_offset"] = start + len(data)
+                result[f"{name}_bytes"] = stream.size
+                if start > offset:
+                    result[f"{name}_skipped"] = start - offset
+        return result
+
+class JobRunner:
+    """Runs commands from a ShellPool as background jobs, `workers` at a time."""
+
+    def __init__(self, pool, workers, spill, history=200):
+        self.pool = pool
+        self.spill = spill
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.jobs = collections.OrderedDict()
+        self.history = history
+        self.lock = threading.Lock()
+
+    def submit(self, command, timeout):
+        job = Job(command, timeout, self.spill.capture())
+        with self.lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _prune(self):
+        """Forget the oldest finished jobs past `history`. Call with the lock held."""
+        extra = len(self.jobs) - self.history
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done][:max(extra, 0)]:
+            del self.jobs[job_id]
+
+    def _run(self, job):
+        job.state, job.started = RUNNING, time.time()
+        print(f"🧵 Job {job.id} started: {job.command}")
+        try:
+            result = self.pool.run(job.command, timeout=job.timeout, on_output=job.append)
+        except Exception as e:
+            result = None
+            job.error = str(e)
+        job.close()  # before the state changes, so a reader that sees done=True gets every byte
+        if result is None:
+            job.state = FAILED
+        else:
+            job.exit_code = result.returncode
+            if result.timed_out:
+                job.error = f"Command timed out after {job.timeout:g} seconds"
+                job.state = TIMED_OUT
+            elif result.returncode == -1:
+                job.error = "Shell worker died."
+                job.state = FAILED
+            else:
+                job.state = DONE
+        job.finished = time.time()
+        print(f"🏁 Job {job.id} {job.state} ({job.finished - job.started:.1f}s)")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# command_policy.py - whitelist / blacklist matching for the command servers
+#
+# Pehle har /execute pe whitelist.txt aur blacklist.txt line by line scan hote the.
+# Ab dono files ek baar compile hoti hain:
+#   - exact lines  -> set (one hash lookup)
+#   - "prefix*"    -> prefix trie (walk the command once, char by char)
+# so a lookup costs O(len(command)) no matter how long the lists get.
+# The file is reloaded only when its mtime/size changes (one os.stat per lookup),
+# so hand edits still apply on the next command without a restart.
+
+import os
+import threading
+
+_END = None  # trie key marking "a pattern ends here"
+
+class PatternSet:
+    """Compiled patterns: exact lines in a set, lines ending in '*' in a prefix trie."""
+
+    def __init__(self, patterns=()):
+        self.exact = set()
+        self.trie = {}
+        self.size = 0
+        for pattern in patterns:
+            self.add(pattern)
+
+    def __contains__(self, pattern):
+        if pattern.endswith("*"):
+            node = self._node(pattern[:-1])
+            return node is not None and _END in node
+        return pattern in self.exact
+
+    def __len__(self):
+        return self.size
+
+    def _node(self, prefix):
+        node = self.trie
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def add(self, pattern):
+        """Add one pattern, False if it was already there."""
+        if pattern in self:
+            return False
+        if pattern.endswith("*"):
+            node = self.trie
+            for ch in pattern[:-1]:
+                node = node.setdefault(ch, {})
+            node[_END] = pattern
+        else:
+            self.exact.add(pattern)
+        self.size += 1
+        return True
+
+    def match(self, command):
+        """The pattern that allows/blocks command (exact first, then the shortest prefix), or None."""
+        if command in self.exact:
+            return command
+        node = self.trie
+        if _END in node:
+            return node[_END]  # a bare "*"
+        for ch in command:
+            node = node.get(ch)
+            if node is None:
+                return None
+            if _END in node:
+                return node[_END]
+        return None
+
+class PolicyFile:
+    """A whitelist/blacklist file (one pattern per line) kept compiled in memory."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.patterns = PatternSet()
+        self.stamp = None
+        self.reloads = 0
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self):
+        """Re-read the file if it changed since the last load. Call with the lock held."""
+        stamp = self._file_stamp()
+        if stamp == self.stamp:
+            return
+        patterns = PatternSet()
+        if stamp is not None:
+            with open(self.path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        patterns.add(line.strip())
+        self.patterns, self.stamp = patterns, stamp
+        self.reloads += 1
+
+    def current(self):
+        with self.lock:
+            self._load()
+            return self.patterns
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def match(self, command):
+        return self.current().match(command)
+
+    def add(self, pattern):
+        """Append pattern to the file unless it's already in the list. Returns True if added."""
+        pattern = pattern.strip()
+        with self.lock:
+            self._load()
+            if not pattern or pattern in self.patterns:
+                return False
+            with open(self.path, "ab+") as f:
+                # Don't glue the new pattern onto a last line without a newline
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                f.write(pattern.encode() + b"\n")
+            self.patterns.add(pattern)
+            # Our own append doesn't need a reload
+            self.stamp = self._file_stamp()
+            return True
@@ -2,12 +2,19 @@
 # server.py (V3.5 - Medha's COMMAND Server - VEnv Fix)
 # Ensures all commands run INSIDE the virtual environment.
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import subprocess
 import os
+import shlex
 import time
+import tempfile
 import atexit
+from command_jobs import JobRunner
+from command_policy import PolicyFile
+from command_stream import OutputStream
+from output_capture import SpillDir
+from shell_pool import ShellPool
 
 app = Flask(__name__)
 CORS(app)
@@ -22,60 +29,108 @@ VENV_PYTHON = f"{PROJECT_DIR}/myenv/bin/python3"
 VENV_ACTIVATE = f"{PROJECT_DIR}/myenv/bin/activate"
 # --- (END FIX) ---
 SERVER_PORT = 5001  # Command server port
+SHELL = "/usr/bin/zsh"
+# Blocking commands run in these long-lived shells (rc + venv already sourced)
+SHELL_WORKERS = int(os.environ.get("MEDHA_SHELL_WORKERS", "2"))
+COMMAND_TIMEOUT = float(os.environ.get("MEDHA_COMMAND_TIMEOUT", "10"))
+SHELL_INIT = f"source ~/.zshrc; source {shlex.quote(VENV_ACTIVATE)}; cd {shlex.quote(PROJECT_DIR)}"
+# "async": true commands run as jobs, on their own shells so they can't starve blocking ones
+JOB_WORKERS = int(os.environ.get("MEDHA_JOB_WORKERS", "4"))
+JOB_TIMEOUT = float(os.environ.get("MEDHA_JOB_TIMEOUT", "120"))
+MAX_TIMEOUT = float(os.environ.get("MEDHA_MAX_TIMEOUT", "600"))  # cap for a per-request "timeout"
+# /execute/stream: output past the cap is dropped, a client that stops reading this long is cut off
+STREAM_MAX_BYTES = int(os.environ.get("MEDHA_STREAM_MAX_BYTES", str(1024 * 1024)))
+STREAM_QUEUE_SIZE = int(os.environ.get("MEDHA_STREAM_QUEUE", "256"))
+STREAM_STALL_TIMEOUT = float(os.environ.get("MEDHA_STREAM_STALL_TIMEOUT", "30"))
+# Blocking /execute keeps this many bytes from the start + end of each stream inline;
+# bigger outputs are spilled whole to SPILL_DIR (kept SPILL_TTL seconds) for GET /outputs/...
+CAPTURE_HEAD = int(os.environ.get("MEDHA_CAPTURE_HEAD", "8192"))
+CAPTURE_TAIL = int(os.environ.get("MEDHA_CAPTURE_TAIL", "8192"))
+SPILL_DIR = os.environ.get("MEDHA_SPILL_DIR", os.path.join(tempfile.gettempdir(), "medha_outputs"))
+SPILL_TTL = float(os.environ.get("MEDHA_SPILL_TTL", "3600"))
+
+shell_pool = ShellPool(SHELL_WORKERS, SHELL, SHELL_INIT, PROJECT_DIR)
+job_pool = ShellPool(JOB_WORKERS, SHELL, SHELL_INIT, PROJECT_DIR)
+spill = SpillDir(SPILL_DIR, CAPTURE_HEAD, CAPTURE_TAIL, SPILL_TTL)
+jobs = JobRunner(job_pool, JOB_WORKERS, spill)
 
 # ---------------- CLEANUP ----------------
 @atexit.register
 def cleanup_on_exit():
     print("\n[Medha-Core] Command Server shutting down...")
+    jobs.shutdown()
+    shell_pool.shutdown()
+    job_pool.shutdown()
     print("[Medha-Core] Offline.")
 
-# ---------------- FILE HELPERS ----------------
-def load_patterns(file_path):
-    """Load non-empty lines from a text file."""
-    if not os.path.exists(file_path):
-        return []
-    with open(file_path, "r") as f:
-        return [line.strip() for line in f if line.strip()]
+# ---------------- POLICY FILES ----------------
+# Compiled once, reloaded only when the file changes (see command_policy.py)
+whitelist = PolicyFile(WHITELIST_FILE)
+blacklist = PolicyFile(BLACKLIST_FILE)
 
 # ---------------- WHITELIST ----------------
 def check_whitelist(command_str):
-    whitelist = load_patterns(WHITELIST_FILE)
-    if not whitelist:
+    patterns = whitelist.current()
+    if not patterns:
         print(f"⚠️ Whitelist missing or empty: {WHITELIST_FILE}")
         return False
 
-    for pattern in whitelist:
-        if pattern.endswith("*"):
-            if command_str.startswith(pattern[:-1]):
-                print(f"✅ Whitelist match (pattern): {pattern}")
-                return True
-        elif command_str == pattern:
-            print(f"✅ Whitelist match (exact): {pattern}")
-            return True
+    pattern = patterns.match(command_str)
+    if pattern is not None:
+        print(f"✅ Whitelist match: {pattern}")
+        return True
     return False
 
 def add_to_whitelist(command):
-    with open(WHITELIST_FILE, "a") as f:
-        f.write(command.strip() + "\n")
-    print(f"Added to whitelist: {command}")
+    if whitelist.add(command):
+        print(f"Added to whitelist: {command}")
+    else:
+        print(f"Already in whitelist: {command}")
 
 # ---------------- BLACKLIST ----------------
 def check_blacklist(command_str):
-    blacklist = load_patterns(BLACKLIST_FILE)
-    for pattern in blacklist:
-        if pattern.endswith("*"):
-            if command_str.startswith(pattern[:-1]):
-                print(f"🚫 Blacklist match (pattern): {pattern}")
-                return True
-        elif command_str == pattern:
-            print(f"🚫 Blacklist match (exact): {pattern}")
-            return True
+    pattern = blacklist.match(command_str)
+    if pattern is not None:
+        print(f"🚫 Blacklist match: {pattern}")
+        return True
     return False
 
 def add_to_blacklist(command):
-    with open(BLACKLIST_FILE, "a") as f:
-        f.write(command.strip() + "\n")
-    print(f"Added to blacklist: {command}")
+    if blacklist.add(command):
+        print(f"Added to blacklist: {command}")
+    else:
+        print(f"Already in blacklist: {command}")
+
+def is_background_command(command_str):
+    """GUI/media commands are launched detached instead of waited for."""
+    return any(
+        command_str.startswith(x)
+        for x in ["python3 emotion_overlay.py", "mpv", "kate", "kwriter", "mpg123"]
+    )
+
+def check_policy(command_str, force_execute):
+    """The 403 response for a blacklisted / not whitelisted command, None if it may run."""
+    # Step 1: Check blacklist first
+    if not force_execute and check_blacklist(command_str):
+        print("🚫 Command blocked (Blacklisted).")
+        return jsonify({"status": "blocked", "message": "Command is blacklisted"}), 403
+
+    # Step 2: Check whitelist unless force_execute=True
+    if not (check_whitelist(command_str) or force_execute):
+        print("⚠️ Command not in whitelist.")
+        return jsonify({"status": "confirmation_required", "message": "Command not whitelisted"}), 403
+    return None
+
+def request_timeout(data, default):
+    """The request's "timeout" (capped at MAX_TIMEOUT), default if it has none, None if it's invalid."""
+    try:
+        timeout = float(data.get("timeout") or default)
+    except (TypeError, ValueError):
+        return None
+    return min(max(timeout, 0.1), MAX_TIMEOUT)
+
+def output_url(output_id, stream):
+    return f"{request.host_url}outputs/{output_id}/{stream}"
 
 # ---------------- ROUTES ----------------
 @app.route("/healthcheck", methods=["GET"])
@@ -88,29 +143,25 @@ def execute_command():
     data = request.json
     command_str_original = data.get("command")
     force_execute = data.get("force", False)
+    run_async = data.get("async", False)
 
     if not command_str_original:
         return jsonify({"status": "error", "message": "No command provided"}), 400
+    timeout = request_timeout(data, JOB_TIMEOUT if run_async else COMMAND_TIMEOUT)
+    if timeout is None:
+        return jsonify({"status": "error", "message": "timeout must be a number of seconds"}), 400
 
     command_str = command_str_original.strip()
     print(f"\n🟣 Incoming command: {command_str}")
 
-    # Step 1: Check blacklist first
-    if not force_execute and check_blacklist(command_str):
-        print("🚫 Command blocked (Blacklisted).")
-        return jsonify({"status": "blocked", "message": "Command is blacklisted"}), 403
-
-    # Step 2: Check whitelist unless force_execute=True
-    if not (check_whitelist(command_str) or force_execute):
-        print("⚠️ Command not in whitelist.")
-        return jsonify({"status": "confirmation_required", "message": "Command not whitelisted"}), 403
+    # Step 1 + 2: blacklist, then whitelist (unless force_execute=True)
+    refused = check_policy(command_str, force_execute)
+    if refused:
+        return refused
 
     # Step 3: Execute command
     print(f"🚀 Executing command (inside VEnv): {command_str}")
-    is_background = any(
-        command_str.startswith(x)
-        for x in ["python3 emotion_overlay.py", "mpv", "kate", "kwriter", "mpg123"]
-    )
+    is_background = is_background_command(command_str)
 
     try:
         if is_background:
@@ -134,34 +185,45 @@ def execute_command():
             print("✅ Background command launched.")
             return jsonify({"status": "success", "message": "Command triggered"}), 200
 
+        elif run_async:
+            # --- Job: answer right away, client polls /jobs/<id> ---
+            job = jobs.submit(command_str, timeout)
+            print(f"📨 Queued as job {job.id} (timeout {timeout:g}s).")
+            return jsonify({"status": "accepted", "job_id": job.id, "state": job.state, "timeout": timeout}), 202
+
         else:
             # --- Blocking execution (for terminal commands) ---
 
-            # --- (MEDHA'S V3.5 FIX) ---
-            # VEnv (activate), Zshrc (say), aur CWD (ls) teeno ko source karo
-            shell_cmd = f"source ~/.zshrc && source {VENV_ACTIVATE} && cd {PROJECT_DIR} && {command_str}"
+            # VEnv (activate), Zshrc (say), aur CWD (ls) - the pool's shells sourced them once already
+            # Output is captured head + tail only, the full thing spills to a file (see output_capture.py)
+            capture = spill.capture()
+            try:
+                result = shell_pool.run(command_str, timeout=timeout, on_output=capture.write)
+            finally:
+                capture.close()
+            stdout = capture.text("stdout", output_url(capture.id, "stdout")).strip()
+            stderr = capture.text("stderr", output_url(capture.id, "stderr")).strip()
+            sizes = {"size": capture.sizes(), "truncated": capture.truncated}
+            if capture.truncated:
+                sizes["output_id"] = capture.id
+                print(f"✂️ Output trimmed to head/tail ({capture.sizes()} bytes), full copy in {SPILL_DIR}")
 
-            result = subprocess.run(
-                shell_cmd,
-                shell=True,
-                executable="/usr/bin/zsh",
-                capture_output=True,
-                text=True,
-                timeout=10,
-            )
-            # --- (END FIX) ---
+            if result.timed_out:
+                print(f"⏱️ Command timed out after {timeout:g}s, its shell was restarted.")
+                return jsonify({"status": "error", "message": f"Command timed out after {timeout:g} seconds",
+                                "output": stdout, **sizes}), 500
 
-            output = result.stdout.strip()
-            if result.stderr:
-                output += f"\nSTDERR: {result.stderr.strip()}"
+            output = stdout
+            if stderr:
+                output += f"\nSTDERR: {stderr}"
 
-            # Check if subprocess.run itself failed (e.g., non-zero exit code)
+            # Non-zero exit code and nothing printed at all
             if result.returncode != 0 and not output:
-                 print(f"❌ Execution error (Return Code {result.returncode}): {result.stderr.strip()}")
-                 return jsonify({"status": "error", "output": result.stderr.strip()}), 500
+                 print(f"❌ Execution error (Return Code {result.returncode}): {stderr}")
+                 return jsonify({"status": "error", "output": stderr, **sizes}), 500
 
-            print("✅ Command executed successfully.")
-            return jsonify({"status": "success", "output": output}), 200
+            print(f"✅ Command executed successfully ({result.duration * 1000:.0f}ms).")
+            return jsonify({"status": "success", "output": output, "exit_code": result.returncode, **sizes}), 200
 
     except subprocess.CalledProcessError as e:
         err = (e.stderr or e.stdout or str(e)).strip()
@@ -171,6 +233,59 @@ def execute_command():
         print(f"🔥 Unexpected error: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route("/execute/stream", methods=["POST"])
+def execute_stream():
+    data = request.json
+    command_str = (data.get("command") or "").strip()
+    if not command_str:
+        return jsonify({"status": "error", "message": "No command provided"}), 400
+    timeout = request_timeout(data, JOB_TIMEOUT)
+    if timeout is None:
+        return jsonify({"status": "error", "message": "timeout must be a number of seconds"}), 400
+
+    if is_background_command(command_str):
+        # Nothing to stream, /execute launches it detached and answers with plain JSON
+        return execute_command()
+
+    print(f"\n🟣 Incoming command (stream): {command_str}")
+    refused = check_policy(command_str, data.get("force", False))
+    if refused:
+        return refused
+
+    # Streams share the job shells, so they count against MEDHA_JOB_WORKERS
+    print(f"📡 Streaming command output: {command_str}")
+    stream = OutputStream(job_pool, command_str, timeout, STREAM_MAX_BYTES,
+                          STREAM_QUEUE_SIZE, STREAM_STALL_TIMEOUT).start()
+    return Response(stream_with_context(iter(stream)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/outputs/<output_id>/<stream>", methods=["GET"])
+def spilled_output(output_id, stream):
+    """Full stdout/stderr of a trimmed /execute response or job (Range requests work too)."""
+    path = spill.file(output_id, stream)
+    if path is None:
+        return jsonify({"status": "error", "message": "No such output (or it expired)"}), 404
+    return send_file(path, mimetype="text/plain", conditional=True)
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job id"}), 404
+    return jsonify({"status": "success", **job.status()}), 200
+
+@app.route("/jobs/<job_id>/output", methods=["GET"])
+def job_output(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job id"}), 404
+    try:
+        stdout_offset = int(request.args.get("stdout_offset", 0))
+        stderr_offset = int(request.args.get("stderr_offset", 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Offsets must be integers"}), 400
+    return jsonify({"status": "success", **job.read(stdout_offset, stderr_offset)}), 200
+
 @app.route("/whitelist", methods=["POST"])
 def add_whitelist_route():
     data = request.json
@@ -194,5 +309,10 @@ if __name__ == "__main__":
     print("--- Starting Medha-Core Server (V3.5 - VEnv Fix) ---")
     print(f"Whitelist file: {WHITELIST_FILE}")
     print(f"Blacklist file: {BLACKLIST_FILE}")
+    try:
+        shell_pool.warm_up()
+        print(f"🐚 {SHELL_WORKERS} shell worker(s) ready, up to {JOB_WORKERS} job(s) at once")
+    except Exception as e:
+        print(f"⚠️ Shell workers not ready, will retry on first command: {e}")
     print(f"🚀 Listening on http://127.0.0.1:{SERVER_PORT}")
-    app.run(host="127.0.0.1", port=SERVER_PORT)
+    app.run(host="127.0.0.1", port=SERVER_PORT, threaded=True)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# command_stream.py - POST /execute/stream: command output as Server-Sent Events
+#
+# /execute sirf command khatam hone ke baad output deta hai, so a slow `find` or a
+# build shows nothing for a minute and then everything at once. A stream runs the
+# command on a pool shell and pushes every stdout/stderr line as soon as it's read:
+#
+#   event: stdout            event: stderr            event: exit
+#   data: {"text": "..."}    data: {"text": "..."}    data: {"exit_code": 0, "timed_out": false, ...}
+#
+# Nothing is collected: lines go through a small bounded queue straight to the
+# socket. If the client reads slowly the queue fills, the shell reader waits, the
+# pipe fills and the command itself blocks on write (backpressure all the way down).
+# A client that stops reading for `stall_timeout`, or disconnects, gets its command
+# killed. After `max_bytes` of output the rest is dropped (only counted) while the
+# command keeps running to its exit / timeout.
+
+import codecs
+import json
+import queue
+import threading
+import time
+
+class StreamClosed(Exception):
+    """The client went away (or stopped reading); the command gets killed."""
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+class OutputStream:
+    LINE_LIMIT = 4096  # a "line" longer than this (no newline yet) is sent in pieces
+    HEARTBEAT = 15     # seconds between keep-alive comments while the command is quiet
+
+    def __init__(self, pool, command, timeout, max_bytes, queue_size=256, stall_timeout=30):
+        self.pool = pool
+        self.command = command
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.stall_timeout = stall_timeout
+        self.events = queue.Queue(maxsize=queue_size)
+        self.closed = threading.Event()
+        self.decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in ("stdout", "stderr")}
+        self.partial = {"stdout": "", "stderr": ""}
+        self.sent_bytes = 0
+        self.dropped_bytes = 0
+
+    def _put(self, event, data):
+        """Queue an event, waiting while the queue is full (that's the backpressure)."""
+        waited = 0.0
+        while True:
+            if self.closed.is_set():
+                raise StreamClosed()
+            try:
+                self.events.put((event, data), timeout=0.5)
+                return
+            except queue.Full:
+                waited += 0.5
+                if waited >= self.stall_timeout:
+                    raise StreamClosed(f"client stopped reading for {self.stall_timeout:g}s")
+
+    def _flush(self, stream, final=False):
+        text = self.partial[stream]
+        if final:
+            text += self.decoders[stream].decode(b"", final=True)
+        lines = text.split("\n")
+        rest = lines.pop()  # after the last newline, "" if text ended with one
+        for line in lines:
+            self._put(stream, {"text": line})
+        if final and rest:
+            self._put(stream, {"text": rest})
+            rest = ""
+        while len(rest) > self.LINE_LIMIT:
+            self._put(stream, {"text": rest[:self.LINE_LIMIT], "partial": True})
+            rest = rest[self.LINE_LIMIT:]
+        self.partial[stream] = rest
+
+    def _on_output(self, stream, data):
+        room = self.max_bytes - self.sent_bytes
+        if room <= 0:
+            self.dropped_bytes += len(data)
+            return
+        if len(data) > room:
+            self.dropped_bytes += len(data) - room
+            data = data[:room]
+        self.sent_bytes += len(data)
+        self.partial[stream] += self.decoders[stream].decode(data)
+        self._flush(stream)
+        if self.sent_bytes >= self.max_bytes:
+            self._put("truncated", {"max_bytes": self.max_bytes})
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            result = self.pool.run(self.command, timeout=self.timeout, on_output=self._on_output)
+            for stream in self.partial:
+                self._flush(stream, final=True)
+            self._put("exit", {
+                "exit_code": result.returncode,
+                "timed_out": result.timed_out,
+                "duration": round(result.duration, 3),
+                "bytes": self.sent_bytes + self.dropped_bytes,
+                "dropped_bytes": self.dropped_bytes,
+            })
+        except StreamClosed as e:
+            # pool.run already killed (and replaced) the shell running it
+            print(f"✂️ Stream closed, command killed after {time.perf_counter() - start:.1f}s {e}".rstrip())
+        except Exception as e:
+            try:
+                self._put("error", {"message": str(e)})
+            except StreamClosed:
+                pass
+
+    def start(self):
+        threading.Thread(target=self._run, name="stream", daemon=True).start()
+        return self
+
+    def __iter__(self):
+        """SSE text for the response body; ends after the exit/error event."""
+        try:
+            while True:
+                try:
+                    event, data = self.events.get(timeout=self.HEARTBEAT)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse(event, data)
+                if event in ("exit", "error"):
+                    return
+        finally:
+            # Normal end, or the client disconnected (GeneratorExit): stop the producer
+            self.closed.set()
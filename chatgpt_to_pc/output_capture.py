@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# output_capture.py - bounded stdout/stderr capture for blocking /execute
+#
+# `cat` on a bada log used to come back whole: megabytes in the server, in the JSON,
+# in the chat client's conversation and in the LLM prompt. An OutputCapture keeps
+# at most head + tail bytes in memory. Small outputs stay fully inline; once a
+# stream grows past head + tail, everything (from the first byte) goes to a spill
+# file instead, and only the first `head` and last `tail` bytes are kept for the
+# response. The spill files are served by GET /outputs/<id>/<stream> and deleted
+# after `ttl` seconds. Jobs read their output by offset: offsets in the tail come
+# from memory, older ones from the spill file.
+
+import os
+import secrets
+import time
+
+STREAMS = ("stdout", "stderr")
+
+def _utf8_start(buf):
+    """Skip continuation bytes a cut left at the start of buf."""
+    i = 0
+    while i < len(buf) and i < 3 and (buf[i] & 0xC0) == 0x80:
+        i += 1
+    return buf[i:]
+
+def _utf8_head(buf):
+    """Drop a character the cut split at the end of buf."""
+    for back in range(1, min(4, len(buf)) + 1):
+        byte = buf[-back]
+        if byte & 0xC0 == 0xC0:  # lead byte of a multi-byte character
+            need = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return buf[:-back] if back < need else buf
+        if byte & 0x80 == 0:
+            return buf
+    return buf
+
+class StreamCapture:
+    """One stream (stdout or stderr): inline up to head + tail bytes, then spilled."""
+
+    def __init__(self, path, head, tail):
+        self.path = path
+        self.head_bytes = head
+        self.tail_bytes = tail
+        self.buf = bytearray()   # whole output while it's small, then just the tail
+        self.head = None         # set once spilled
+        self.file = None
+        self.size = 0
+        self.closed = False
+
+    @property
+    def spilled(self):
+        return self.head is not None
+
+    def write(self, data):
+        self.size += len(data)
+        self.buf += data
+        if self.file is None:
+            if self.size <= self.head_bytes + self.tail_bytes:
+                return
+            # Too big to keep: everything so far goes to the spill file, we keep head + tail
+            self.file = open(self.path, "w+b")  # + : jobs read it back while it grows
+            self.file.write(self.buf)
+            self.head = bytes(self.buf[:self.head_bytes])
+        else:
+            self.file.write(data)
+        del self.buf[:max(len(self.buf) - self.tail_bytes, 0)]
+
+    def close(self):
+        self.closed = True
+        if self.file is not None:
+            self.file.close()
+
+    def read(self, offset, limit):
+        """Up to limit bytes from offset on, as (where they start, bytes).
+
+        Only a closed stream's last read may end in the middle of a UTF-8 character.
+        If the spill file already expired, the read skips ahead to the tail we kept.
+        """
+        offset = min(max(offset, 0), self.size)
+        window = self.size - len(self.buf)  # where the bytes in memory start
+        if offset >= window:
+            data = bytes(self.buf[offset - window:offset - window + limit])
+        else:
+            try:
+                if not self.file.closed:
+                    self.file.flush()
+                    data = os.pread(self.file.fileno(), limit, offset)
+                else:
+                    with open(self.path, "rb") as f:
+                        f.seek(offset)
+                        data = f.read(limit)
+            except FileNotFoundError:
+                data = bytes(self.buf[:limit])
+                kept = _utf8_start(data)
+                offset = window + len(data) - len(kept)
+                data = kept
+        if not (self.closed and offset + len(data) == self.size):
+            data = _utf8_head(data)
+        return offset, data
+
+    def text(self, url):
+        if not self.spilled:
+            return bytes(self.buf).decode(errors="replace")
+        omitted = self.size - len(self.head) - len(self.buf)
+        return (_utf8_head(self.head).decode(errors="replace")
+                + f"\n… [{omitted} bytes cut, full output: {url}] …\n"
+                + _utf8_start(bytes(self.buf)).decode(errors="replace"))
+
+class OutputCapture:
+    """stdout + stderr of one command; pass capture.write as ShellPool.run's on_output."""
+
+    def __init__(self, spill_dir, head, tail):
+        self.id = secrets.token_hex(8)
+        self.streams = {name: StreamCapture(os.path.join(spill_dir, f"{self.id}.{name}"), head, tail)
+                        for name in STREAMS}
+
+    def write(self, stream, data):
+        self.streams[stream].write(data)
+
+    def close(self):
+        for capture in self.streams.values():
+            capture.close()
+
+    @property
+    def truncated(self):
+        return any(capture.spilled for capture in self.streams.values())
+
+    def sizes(self):
+        return {name: capture.size for name, capture in self.streams.items()}
+
+    def text(self, stream, url):
+        return self.streams[stream].text(url)
+
+class SpillDir:
+    """Where OutputCaptures spill; old files are removed as new captures come in."""
+
+    def __init__(self, path, head, tail, ttl=3600):
+        self.path = path
+        self.head = head
+        self.tail = tail
+        self.ttl = ttl
+        os.makedirs(path, exist_ok=True)
+
+    def capture(self):
+        self.prune()
+        return OutputCapture(self.path, self.head, self.tail)
+
+    def file(self, output_id, stream):
+        """Path of a spilled stream, None if there's no such file (any more)."""
+        if stream not in STREAMS or not output_id.isalnum():
+            return None
+        path = os.path.join(self.path, f"{output_id}.{stream}")
+        return path if os.path.exists(path) else None
+
+    def prune(self):
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.path):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# shell_pool.py - long-lived, pre-initialized shells for the command server
+#
+# Har /execute pe naya zsh + `source ~/.zshrc` + venv activate = sau-do sau ms,
+# even for a 5ms `ls`. Here every worker shell sources all of that ONCE at start,
+# then runs commands sent over its stdin:
+#
+#   __medha_run <token> '<command, shell-quoted>' <stdout fifo> <stderr fifo>
+#
+# The command runs in a subshell (fork, no exec, rc already loaded), so a `cd`,
+# `export` or `exit` doesn't leak into the next command, with stdin from /dev/null
+# so it can't eat the protocol. Its stdout/stderr go to a fresh pair of FIFOs made
+# for that one command, not to the worker's pipes: a `foo &` or `nohup ... &` left
+# running keeps only those FIFOs, which we close once the command is done, so its
+# later output can't end up in the next command's result. When the subshell exits
+# the worker prints "<token> <exit code>" on its own stdout; we read the FIFOs until
+# then and drain what's left in them. A command that runs past its timeout gets the
+# whole worker (process group) killed and a fresh one spawned.
+# run(on_output=...) hands out the output as it arrives instead of collecting it,
+# for jobs and streams that are watched while they run.
+
+import os
+import queue
+import selectors
+import re
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+RUNNER = r"""
+__medha_run() {
+  ( eval "$2" ) < /dev/null > "$3" 2> "$4"
+  printf '%s %s\n' "$1" "$?"
+}
+"""
+
+class CommandResult:
+    def __init__(self, stdout="", stderr="", returncode=None, timed_out=False, duration=0.0):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = returncode
+        self.timed_out = timed_out
+        self.duration = duration
+
+class ShellWorker:
+    """One shell process that already ran init_script."""
+
+    def __init__(self, shell, init_script, cwd):
+        self.shell = shell
+        self.init_script = init_script
+        self.cwd = cwd
+        self.proc = None
+        self.fifo_dir = None
+        self.commands_run = 0
+
+    def start(self, timeout=30):
+        self.fifo_dir = tempfile.mkdtemp(prefix="medha-shell-")
+        self.proc = subprocess.Popen(
+            [self.shell],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.cwd,
+            start_new_session=True,  # own process group, so a timeout can kill everything it started
+        )
+        self.proc.stdin.write((self.init_script + "\n" + RUNNER + "\n").encode())
+        self.proc.stdin.flush()
+        # Swallow whatever the rc files print
+        result = self.run(":", timeout)
+        if result.timed_out or result.returncode != 0:
+            self.kill()
+            raise RuntimeError(f"Shell worker failed to start: {result.stderr.strip()}")
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def kill(self):
+        if self.proc is None:
+            return
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.proc.wait()
+        for pipe in (self.proc.stdin, self.proc.stdout, self.proc.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+        self.proc = None
+        shutil.rmtree(self.fifo_dir, ignore_errors=True)
+
+    def _open_fifos(self):
+        """A new stdout/stderr FIFO pair for one command: {name: (path, read fd, write fd)}.
+
+        We hold a write end too, so the read end doesn't see EOF before the command
+        opens it (and select doesn't spin on that).
+        """
+        fifos = {}
+        for name in ("stdout", "stderr"):
+            path = os.path.join(self.fifo_dir, name)
+            os.mkfifo(path)
+            read_fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+            fifos[name] = (path, read_fd, os.open(path, os.O_WRONLY | os.O_NONBLOCK))
+        return fifos
+
+    def run(self, command, timeout, on_output=None):
+        """Run one command. On timeout (or if the shell died) the worker is killed.
+
+        on_output(stream, data) is called with "stdout"/"stderr" bytes as they come in;
+        the result then has no stdout/stderr of its own.
+        """
+        start = time.perf_counter()
+        token = f"__medha_{uuid.uuid4().hex}"
+        done_line = re.compile(rb"(?:^|\n)" + token.encode() + rb" (\d+)\n")
+        fifos = self._open_fifos()
+        output = {"stdout": bytearray(), "stderr": bytearray()}
+        shell_out, shell_err = bytearray(), bytearray()  # the worker's own pipes: rc noise, then our exit line
+
+        def take(name, chunk):
+            if on_output is None:
+                output[name] += chunk
+            else:
+                on_output(name, chunk)
+
+        def result(returncode, timed_out=False, error=""):
+            stderr = bytes(output["stderr"]).decode(errors="replace")
+            if error:
+                stderr += error
+            return CommandResult(bytes(output["stdout"]).decode(errors="replace"), stderr,
+                                 returncode, timed_out, time.perf_counter() - start)
+
+        selector = selectors.DefaultSelector()
+        try:
+            try:
+                self.proc.stdin.write(f"__medha_run {token} {shlex.quote(command)} "
+                                      f"{shlex.quote(fifos['stdout'][0])} {shlex.quote(fifos['stderr'][0])}\n".encode())
+                self.proc.stdin.flush()
+            except (BrokenPipeError, OSError):
+                self.kill()
+                return result(-1, error="Shell worker died.")
+
+            for name, (_, read_fd, _) in fifos.items():
+                selector.register(read_fd, selectors.EVENT_READ, name)
+            selector.register(self.proc.stdout, selectors.EVENT_READ, "shell_out")
+            selector.register(self.proc.stderr, selectors.EVENT_READ, "shell_err")
+            deadline = time.monotonic() + timeout
+            returncode = None
+            while returncode is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.kill()
+                    self._drain(fifos, take)
+                    return result(None, timed_out=True)
+                for key, _ in selector.select(remaining):
+                    if key.data in fifos:
+                        try:
+                            take(key.data, os.read(key.fd, 65536))
+                        except BlockingIOError:
+                            pass
+                        continue
+                    chunk = os.read(key.fd, 65536)
+                    if not chunk:
+                        # EOF: the shell itself is gone
+                        self.kill()
+                        self._drain(fifos, take)
+                        return result(-1, error=bytes(shell_err).decode(errors="replace"))
+                    if key.data == "shell_err":
+                        shell_err += chunk
+                        continue
+                    shell_out += chunk
+                    match = done_line.search(shell_out)
+                    if match:
+                        returncode = int(match.group(1))
+            # The subshell has exited, so everything it wrote is already in the FIFOs
+            self._drain(fifos, take)
+        finally:
+            selector.close()
+            for path, read_fd, write_fd in fifos.values():
+                os.close(read_fd)
+                os.close(write_fd)
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+        self.commands_run += 1
+        return result(returncode)
+
+    @staticmethod
+    def _drain(fifos, take):
+        """Hand out what's still buffered in the FIFOs, without waiting for more."""
+        for name, (_, read_fd, _) in fifos.items():
+            while True:
+                try:
+                    chunk = os.read(read_fd, 65536)
+                except BlockingIOError:
+                    break
+                if not chunk:
+                    break
+                take(name, chunk)
+
+class ShellPool:
+    """size pre-initialized ShellWorkers; run() borrows one per command."""
+
+    WAIT_RECHECK = 0.5  # seconds between checks for a free slot while every shell is busy
+
+    def __init__(self, size, shell, init_script, cwd):
+        self.size = size
+        self.shell = shell
+        self.init_script = init_script
+        self.cwd = cwd
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.spawned = 0
+        self.respawns = 0
+
+    def _spawn(self):
+        worker = ShellWorker(self.shell, self.init_script, self.cwd)
+        worker.start()
+        return worker
+
+    def warm_up(self):
+        """Start every worker now instead of on first use."""
+        workers = [self._acquire() for _ in range(self.size)]
+        for worker in workers:
+            self.idle.put(worker)
+
+    def _acquire(self):
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self.lock:
+                spawn = self.spawned < self.size
+                if spawn:
+                    self.spawned += 1
+            if spawn:
+                try:
+                    return self._spawn()
+                except Exception:
+                    with self.lock:
+                        self.spawned -= 1
+                    raise
+            # All shells busy. Wait for one, but look again now and then: a busy shell that
+            # died and couldn't be respawned leaves room to spawn instead of coming back.
+            try:
+                return self.idle.get(timeout=self.WAIT_RECHECK)
+            except queue.Empty:
+                pass
+
+    def run(self, command, timeout=10, on_output=None):
+        worker = self._acquire()
+        try:
+            result = worker.run(command, timeout, on_output)
+        except Exception:
+            worker.kill()
+            raise
+        finally:
+            if not worker.alive():
+                # Killed on timeout / died: replace it so the pool stays at size
+                self.respawns += 1
+                try:
+                    worker = self._spawn()
+                except Exception as e:
+                    print(f"⚠️ Could not respawn shell worker: {e}")
+                    with self.lock:
+                        self.spawned -= 1
+                    worker = None
+            if worker is not None:
+                self.idle.put(worker)
+        return result
+
+    def shutdown(self):
+        while True:
+            try:
+                self.idle.get_nowait().kill()
+            except queue.Empty:
+                return
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# command_client.py - command server calls shared by the chat clients
+#
+# deepseekv2.py aur gemini-version.py dono commands isi se chalate hain:
+#   stream_command_from_server  -> /execute/stream, output line by line (falls back to jobs)
+#   send_command_to_server      -> /execute as a job, polled via /jobs/<id>/output
+# Both return the dict /execute would have answered: {"status", "output", "exit_code"}.
+
+import aiohttp
+import asyncio
+import json
+import time
+from colorama import Fore, Style
+
+COMMAND_SERVER_URL = "http://127.0.0.1:5001/execute"
+COMMAND_JOBS_URL = "http://127.0.0.1:5001/jobs"
+COMMAND_JOB_TIMEOUT = 120  # seconds the server lets one command run
+COMMAND_STREAM_URL = "http://127.0.0.1:5001/execute/stream"
+COMMAND_LIVE_LINES = 40   # output lines shown live per command
+COMMAND_OUTPUT_HEAD = 6000  # chars from the start + end of a command's output that go to the model
+COMMAND_OUTPUT_TAIL = 6000
+
+async def send_command_to_server(cmd_text: str, timeout=COMMAND_JOB_TIMEOUT):
+    """
+    Submit the command as a job ("async": true) and poll it till it's done, so the
+    server can run several commands at once. Blocked / not-whitelisted replies and
+    older servers without jobs answer /execute directly, that dict is returned as is.
+    """
+    payload = {"command": cmd_text, "force": False, "async": True, "timeout": timeout}
+    try:
+        async with aiohttp.ClientSession() as ses:
+            async with ses.post(COMMAND_SERVER_URL, json=payload, timeout=30) as r:
+                text = await r.text()
+                try:
+                    j = json.loads(text)
+                except Exception:
+                    return {"status": "error", "output": text}
+            if not isinstance(j, dict) or "job_id" not in j:
+                return j
+            return await wait_for_job(ses, j["job_id"], timeout)
+    except Exception as e:
+        return {"status": "error", "output": str(e)}
+
+async def wait_for_job(ses, job_id, timeout):
+    """Poll /jobs/<id>/output until the job is finished; returns an /execute-style dict."""
+    url = f"{COMMAND_JOBS_URL}/{job_id}/output"
+    offsets = {"stdout_offset": 0, "stderr_offset": 0}
+    out, err = [], []
+    deadline = time.monotonic() + timeout + 30  # server kills it at `timeout`, this is just a safety net
+    delay = 0.1
+    while True:
+        async with ses.get(url, params=offsets, timeout=15) as r:
+            j = await r.json()
+        if j.get("status") != "success":
+            return {"status": "error", "output": j.get("message") or json.dumps(j, ensure_ascii=False)}
+        for name, parts in (("stdout", out), ("stderr", err)):
+            if j.get(f"{name}_skipped"):
+                parts.append(f"\n… [{j[f'{name}_skipped']} bytes expired on the server] …\n")
+            parts.append(j[name])
+        offsets = {"stdout_offset": j["stdout_offset"], "stderr_offset": j["stderr_offset"]}
+        # A big output comes in pieces: keep reading (without waiting) till the offsets reach the sizes
+        more = any(j[f"{name}_offset"] < j.get(f"{name}_bytes", 0) for name in ("stdout", "stderr"))
+        if j["done"] and not more:
+            break
+        if time.monotonic() > deadline:
+            j["error"] = f"job {job_id} still running after {timeout}s"
+            break
+        if not more:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    return command_result("".join(out), "".join(err), j.get("exit_code"), j.get("error"))
+
+def command_result(out, err, exit_code, error=None):
+    """stdout/stderr text of a job or stream -> the dict /execute would have answered."""
+    output = out.strip()
+    stderr = err.strip()
+    if stderr:
+        output += f"\nSTDERR: {stderr}"
+    if error:
+        output += f"\n[{error}]"
+    elif exit_code and not output:
+        output = f"[exit code {exit_code}]"
+    return {"status": "error" if error else "success", "output": output.strip(), "exit_code": exit_code}
+
+async def stream_command_from_server(cmd_text, on_line=None, timeout=COMMAND_JOB_TIMEOUT):
+    """
+    Run the command via /execute/stream; await on_line(stream, text) for every stdout /
+    stderr line as the server reads it, then return the /execute-style dict. Plain JSON
+    answers (blocked, not whitelisted, GUI commands) are returned as is, and a server
+    without the stream endpoint falls back to send_command_to_server.
+    """
+    payload = {"command": cmd_text, "force": False, "timeout": timeout}
+    out, err = [], []
+    end = {}
+    try:
+        async with aiohttp.ClientSession() as ses:
+            # No total timeout: the server sends a keep-alive comment at least every 15s
+            stream_timeout = aiohttp.ClientTimeout(total=None, sock_read=60)
+            async with ses.post(COMMAND_STREAM_URL, json=payload, timeout=stream_timeout) as r:
+                if r.status == 404:
+                    return await send_command_to_server(cmd_text, timeout)
+                if r.content_type != "text/event-stream":
+                    text = await r.text()
+                    try:
+                        return json.loads(text)
+                    except Exception:
+                        return {"status": "error", "output": text}
+                event = None
+                async for raw in r.content:
+                    line = raw.decode(errors="replace").rstrip("\r\n")
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                        continue
+                    if not line.startswith("data:"):
+                        continue
+                    data = json.loads(line[5:])
+                    if event in ("stdout", "stderr"):
+                        # Long lines come in pieces marked "partial"
+                        (out if event == "stdout" else err).append(data["text"] + ("" if data.get("partial") else "\n"))
+                        if on_line:
+                            await on_line(event, data["text"])
+                    elif event in ("exit", "error"):
+                        end = data
+                        break
+    except Exception as e:
+        if not out and not err:
+            return {"status": "error", "output": str(e)}
+        end = {"message": f"stream broke off: {e}"}
+
+    error = end.get("message")
+    if end.get("timed_out"):
+        error = f"Command timed out after {timeout} seconds"
+    elif not end:
+        error = "stream ended without an exit status"
+    result = command_result("".join(out), "".join(err), end.get("exit_code"), error)
+    if end.get("dropped_bytes"):
+        result["output"] += f"\n[output cut: only the first {end['bytes'] - end['dropped_bytes']} of {end['bytes']} bytes were sent]"
+    return result
+
+def clip_output(text, head=COMMAND_OUTPUT_HEAD, tail=COMMAND_OUTPUT_TAIL):
+    """Keep the start and end of a long command output so it can't blow up the prompt."""
+    if len(text) <= head + tail:
+        return text
+    return f"{text[:head]}\n… [{len(text) - head - tail} characters cut] …\n{text[-tail:]}"
+
+def live_output_printer(cmd_text, show):
+    """on_line callback that shows a command's output in the terminal while it runs; show is an async print."""
+    shown = 0
+    label = cmd_text if len(cmd_text) <= 24 else cmd_text[:23] + "…"
+
+    async def on_line(stream, text):
+        nonlocal shown
+        shown += 1
+        if shown <= COMMAND_LIVE_LINES:
+            color = Fore.YELLOW if stream == "stderr" else ""
+            await show(f"{Style.DIM}{label} │{Style.RESET_ALL} {color}{text}{Style.RESET_ALL}")
+        elif shown == COMMAND_LIVE_LINES + 1:
+            await show(f"{Style.DIM}{label} │ … (baaki output model ko jayega){Style.RESET_ALL}")
+    return on_line
@@ -8,6 +8,7 @@ import subprocess
 import os
 import time
 import atexit
+from command_policy import PolicyFile
 
 app = Flask(__name__)
 CORS(app)
@@ -25,53 +26,43 @@ def cleanup_on_exit():
     print("\n[AI-Core] Command Server shutting down...")
     print("[AI-Core] Offline.")
 
-# ---------------- FILE HELPERS ----------------
-def load_patterns(file_path):
-    """Load non-empty lines from a text file."""
-    if not os.path.exists(file_path):
-        return []
-    with open(file_path, "r") as f:
-        return [line.strip() for line in f if line.strip()]
+# ---------------- POLICY FILES ----------------
+# Compiled once, reloaded only when the file changes (see command_policy.py)
+whitelist = PolicyFile(WHITELIST_FILE)
+blacklist = PolicyFile(BLACKLIST_FILE)
 
 # ---------------- WHITELIST ----------------
 def check_whitelist(command_str):
-    whitelist = load_patterns(WHITELIST_FILE)
-    if not whitelist:
+    patterns = whitelist.current()
+    if not patterns:
         print(f"⚠️ Whitelist missing or empty: {WHITELIST_FILE}")
         return False
 
-    for pattern in whitelist:
-        if pattern.endswith("*"):
-            if command_str.startswith(pattern[:-1]):
-                print(f"✅ Whitelist match (pattern): {pattern}")
-                return True
-        elif command_str == pattern:
-            print(f"✅ Whitelist match (exact): {pattern}")
-            return True
+    pattern = patterns.match(command_str)
+    if pattern is not None:
+        print(f"✅ Whitelist match: {pattern}")
+        return True
     return False
 
 def add_to_whitelist(command):
-    with open(WHITELIST_FILE, "a") as f:
-        f.write(command.strip() + "\n")
-    print(f"Added to whitelist: {command}")
+    if whitelist.add(command):
+        print(f"Added to whitelist: {command}")
+    else:
+        print(f"Already in whitelist: {command}")
 
 # ---------------- BLACKLIST ----------------
 def check_blacklist(command_str):
-    blacklist = load_patterns(BLACKLIST_FILE)
-    for pattern in blacklist:
-        if pattern.endswith("*"):
-            if command_str.startswith(pattern[:-1]):
-                print(f"🚫 Blacklist match (pattern): {pattern}")
-                return True
-        elif command_str == pattern:
-            print(f"🚫 Blacklist match (exact): {pattern}")
-            return True
+    pattern = blacklist.match(command_str)
+    if pattern is not None:
+        print(f"🚫 Blacklist match: {pattern}")
+        return True
     return False
 
 def add_to_blacklist(command):
-    with open(BLACKLIST_FILE, "a") as f:
-        f.write(command.strip() + "\n")
-    print(f"Added to blacklist: {command}")
+    if blacklist.add(command):
+        print(f"Added to blacklist: {command}")
+    else:
+        print(f"Already in blacklist: {command}")
 
 # ---------------- ROUTES ----------------
 @app.route("/healthcheck", methods=["GET"])
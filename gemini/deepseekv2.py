@@ -28,6 +28,8 @@ from pathlib import Path
 from zoneinfo import ZoneInfo
 from colorama import Fore, Style, init
 
+from command_client import clip_output, live_output_printer, stream_command_from_server
+
 init(autoreset=True)
 
 # ---------------- CONFIG ----------------
@@ -42,7 +44,7 @@ OPENROUTER_ENDPOINT = "https://openrouter.ai/api/v1/chat/completions"
 
 # Local servers (change if needed)
 LOG_SERVER_URL = "http://127.0.0.1:5002/get_log_updates"
-COMMAND_SERVER_URL = "http://127.0.0.1:5001/execute"
+PARALLEL_COMMANDS = False   # True: start all commands of a reply at once (only if they don't depend on each other)
 
 # User + timezone
 USER_NAME = "Mohit"
@@ -181,34 +183,22 @@ async def fetch_logs_structured():
     return structure_logs(raw)
 
 # ---------------- Command server integration ----------------
-async def send_command_to_server(cmd_text: str, timeout=30):
-    payload = {"command": cmd_text, "force": False}
-    try:
-        async with aiohttp.ClientSession() as ses:
-            async with ses.post(COMMAND_SERVER_URL, json=payload, timeout=timeout) as r:
-                text = await r.text()
-                try:
-                    j = json.loads(text)
-                    return j
-                except Exception:
-                    return {"status": "error", "output": text}
-    except Exception as e:
-        return {"status": "error", "output": str(e)}
-
-async def run_command_and_forward_output(cmd_text: str):
+async def run_command_and_forward_output(cmd_text: str, resp=None):
     """
     Send command to command server, get output, immediately send that output as a
     user message to the model (so model can analyze). Then fetch model reply and store/display it.
+    resp: the server's answer if the command was already run (see extract_and_handle_commands).
     """
     # call command server
-    resp = await send_command_to_server(cmd_text)
+    if resp is None:
+        resp = await stream_command_from_server(cmd_text, live_output_printer(cmd_text, safe_print))
     # normalize output
     if isinstance(resp, dict):
         out = resp.get("output") or resp.get("message") or resp.get("error") or json.dumps(resp, ensure_ascii=False)
     else:
         out = str(resp)
 
-    out_text = str(out).strip()
+    out_text = clip_output(str(out).strip())
     ts = now_ts()
     user_block = f"[{ts}] System command output for `{cmd_text}`\n$ {cmd_text}\n{out_text}"
     # save as a special role in raw file so it's persisted
@@ -230,20 +220,26 @@ async def run_command_and_forward_output(cmd_text: str):
 # ---------------- Command extractor & handling ----------------
 async def extract_and_handle_commands(assistant_text: str):
     """
-    Find command blocks and execute them immediately (multiline ok).
+    Find command blocks and execute them in order (multiline ok).
     For each command found:
-      - run it via command server
+      - run it via command server (after the previous one is done, so
+        `cd`/`mkdir` then `ls` work; PARALLEL_COMMANDS starts them all at once)
       - send its output to model as user message
       - fetch model reply and continue
     """
     matches = list(CMD_RE.finditer(assistant_text))
     if not matches:
         return []
+    cmds = [m.group("cmd").strip() for m in matches]
+    runs = None
+    if PARALLEL_COMMANDS:
+        # All of them start right away (in parallel on the server),
+        # the outputs still go to the model one by one, in order
+        runs = [asyncio.create_task(stream_command_from_server(cmd, live_output_printer(cmd, safe_print))) for cmd in cmds]
     res = []
-    for m in matches:
-        cmd = m.group("cmd").strip()
+    for i, cmd in enumerate(cmds):
         try:
-            await run_command_and_forward_output(cmd)
+            await run_command_and_forward_output(cmd, await runs[i] if runs else None)
             res.append({"command": cmd, "status": "executed"})
         except Exception as e:
             # If command run fails, append a notice to pending_command_outputs (fallback)
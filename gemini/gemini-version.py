@@ -16,13 +16,15 @@ from pathlib import Path
 from zoneinfo import ZoneInfo
 from colorama import Fore, Style, init
 
+from command_client import clip_output, live_output_printer, stream_command_from_server
+
 init(autoreset=True)
 
 # ---------------- CONFIG ----------------
 # Ye backend endpoints hain. Backend (api.py) background mein chalna zaroori hai!
 GEMINI_ENDPOINT = "http://127.0.0.1:8000/api/ask"
 LOG_SERVER_URL = "http://127.0.0.1:5002/get_log_updates"
-COMMAND_SERVER_URL = "http://127.0.0.1:5001/execute"
+PARALLEL_COMMANDS = False   # True: start all commands of a reply at once (only if they don't depend on each other)
 
 USER_NAME = "Mohit"
 LOCAL_TZ = ZoneInfo("Asia/Kolkata")
@@ -130,25 +132,14 @@ async def fetch_logs_structured():
     return structured
 
 # ---------------- COMMAND SERVER INTEGRATION ----------------
-async def send_command_to_server(cmd_text, timeout=30):
-    payload = {"command": cmd_text, "force": False}
-    try:
-        async with aiohttp.ClientSession() as ses:
-            async with ses.post(COMMAND_SERVER_URL, json=payload, timeout=timeout) as r:
-                try:
-                    return await r.json()
-                except Exception:
-                    t = await r.text()
-                    return {"status":"error","output": t}
-    except Exception as e:
-        return {"status":"error","output": str(e)}
-
-async def run_command_and_forward_output(cmd_text):
-    resp = await send_command_to_server(cmd_text)
+async def run_command_and_forward_output(cmd_text, resp=None):
+    if resp is None:
+        resp = await stream_command_from_server(cmd_text, live_output_printer(cmd_text, safe_print))
     if isinstance(resp, dict):
         out_text = resp.get("output") or resp.get("message") or resp.get("error") or json.dumps(resp, ensure_ascii=False)
     else:
         out_text = str(resp)
+    out_text = clip_output(out_text)
 
     ts = now_ts()
     user_block = f"[{ts}] System command output for `{cmd_text}`\n$ {cmd_text}\n{out_text}"
@@ -169,11 +160,16 @@ async def extract_and_handle_commands(assistant_text):
     matches = list(CMD_RE.finditer(assistant_text))
     if not matches:
         return []
+    cmds = [m.group("cmd").strip() for m in matches]
+    # Ek ke baad ek chalte hain (next command pichle ke baad); PARALLEL_COMMANDS = sab ek saath,
+    # outputs model ko phir bhi order mein jaate hain
+    runs = None
+    if PARALLEL_COMMANDS:
+        runs = [asyncio.create_task(stream_command_from_server(cmd, live_output_printer(cmd, safe_print))) for cmd in cmds]
     results = []
-    for m in matches:
-        cmd = m.group("cmd").strip()
+    for i, cmd in enumerate(cmds):
         try:
-            await run_command_and_forward_output(cmd)
+            await run_command_and_forward_output(cmd, await runs[i] if runs else None)
             results.append({"command": cmd, "status": "executed"})
         except Exception as e:
             block = f"$ {cmd}\n[Command execution failed: {e}]"
@@ -9,6 +9,7 @@ import os
 import json
 import time
 import atexit
+from command_policy import PolicyFile
 
 app = Flask(__name__)
 CORS(app)
@@ -36,26 +37,19 @@ def cleanup_on_exit():
     print("[AI-Core] Autonomous state will reset on next launch.")
     print("[AI-Core] Offline.")
 
-# --- Whitelist Logic (No Change) ---
+# --- Whitelist Logic (compiled, reloaded when the file changes) ---
+whitelist = PolicyFile(WHITELIST_FILE)
+
 def check_whitelist(command_str):
-    if not os.path.exists(WHITELIST_FILE): return False
-    with open(WHITELIST_FILE, "r") as f:
-        for pattern in f:
-            pattern = pattern.strip()
-            if not pattern: continue
-            if pattern.endswith('*'):
-                base_pattern = pattern[:-1]
-                if command_str.startswith(base_pattern):
-                    print(f"Whitelist match (Pattern): '{pattern}' -> '{command_str}'")
-                    return True
-            if command_str == pattern:
-                print(f"Whitelist match (Exact): '{command_str}'")
-                return True
+    pattern = whitelist.match(command_str)
+    if pattern is not None:
+        print(f"Whitelist match: '{pattern}' -> '{command_str}'")
+        return True
     return False
 
 def add_to_whitelist(command):
-    with open(WHITELIST_FILE, "a") as f:
-        f.write(command + "\n")
+    # Duplicates are skipped
+    return whitelist.add(command)
 
 # --- Log Tailing Logic (Signature-based - No Change) ---
 
@@ -7,6 +7,7 @@ import shlex
 import os
 import atexit
 import time
+from command_policy import PolicyFile
 
 app = Flask(__name__)
 CORS(app)
@@ -25,30 +26,23 @@ def cleanup_on_exit():
     print("\n[AI-Core] Command Server shutting down...")
     print("[AI-Core] Offline.")
 
-# --- Whitelist Logic (Same as before) ---
+# --- Whitelist Logic (compiled, reloaded when the file changes) ---
+whitelist = PolicyFile(WHITELIST_FILE)
+
 def check_whitelist(command_str):
-    if not os.path.exists(WHITELIST_FILE):
+    if not whitelist.exists():
         # (FIX) Print error agar file nahi mili
         print(f"❌ CRITICAL ERROR: Whitelist file not found at {WHITELIST_FILE}")
         return False
-    with open(WHITELIST_FILE, "r") as f:
-        for pattern in f:
-            pattern = pattern.strip()
-            if not pattern: continue
-            if pattern.endswith('*'):
-                base_pattern = pattern[:-1]
-                if command_str.startswith(base_pattern):
-                    print(f"Whitelist match (Pattern): '{pattern}' -> '{command_str}'")
-                    return True
-            if command_str == pattern:
-                print(f"Whitelist match (Exact): '{command_str}'")
-                return True
+    pattern = whitelist.match(command_str)
+    if pattern is not None:
+        print(f"Whitelist match: '{pattern}' -> '{command_str}'")
+        return True
     return False
 
 def add_to_whitelist(command):
-    # (FIX) Absolute path use karo
-    with open(WHITELIST_FILE, "a") as f:
-        f.write(command + "\n")
+    # (FIX) Absolute path use karo. Duplicates are skipped.
+    return whitelist.add(command)
 
 # --- Endpoints ---
 @app.route('/healthcheck', methods=['GET'])